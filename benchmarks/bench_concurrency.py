@@ -0,0 +1,77 @@
+"""
+Бенчмарк пула записи NotionTransfer: страниц в секунду в зависимости от размера пула
+
+Запуск:
+    python -m benchmarks.bench_concurrency --pages 500 --latency 0.05 --pools 1 2 4 8 16
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.mock_notion import MockNotion, start_mock_server, base_url
+
+
+class SilentMessage:
+    """Заглушка сообщения Telegram, игнорирующая отчеты о прогрессе"""
+
+    async def reply_text(self, text: str, **kwargs):
+        return self
+
+    async def edit_text(self, text: str, **kwargs):
+        return self
+
+
+async def measure(mock: MockNotion, pool: int) -> float:
+    from notion.transfer import NotionTransfer
+
+    mock.created.clear()
+    mock.databases["dest"].clear()
+    transfer = NotionTransfer(
+        "origin-token", "dest-token", "origin", "dest",
+        concurrency=pool,
+        progress_file=Path(tempfile.mkdtemp()) / "progress.json"
+    )
+
+    started = time.perf_counter()
+    await transfer.run(SilentMessage())
+    elapsed = time.perf_counter() - started
+
+    pages = len(mock.databases["origin"])
+    assert len(mock.created) == pages, f"created {len(mock.created)} of {pages}"
+    return pages / elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа мок-сервера, с")
+    parser.add_argument("--pools", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    mock = MockNotion(pages=args.pages, latency=args.latency)
+    runner = await start_mock_server(mock)
+    # Адрес API задается до первого импорта модулей notion
+    os.environ["NOTION_BASE_URL"] = base_url(runner)
+    # Бенчмарк измеряет пул записи, а не лимит частоты запросов
+    os.environ.setdefault("NOTION_RATE_LIMIT", "100000")
+    os.environ.setdefault("NOTION_RATE_BURST", "100000")
+    from notion.api import close_session
+
+    try:
+        print(f"{'pool':>6} {'pages/sec':>10}")
+        for pool in args.pools:
+            rate = await measure(mock, pool)
+            print(f"{pool:>6} {rate:>10.1f}")
+    finally:
+        await close_session()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
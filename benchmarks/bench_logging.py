@@ -0,0 +1,111 @@
+"""
+Бенчмарк логирования: задержка вызова logger.info при медленном выводе
+
+Сравнивает прежнюю схему (FileHandler и консоль пишут прямо в потоке
+вызова) с очередью utils.logger (запись в фоновом потоке). Медленный диск
+или терминал имитируется задержкой каждой записи в поток вывода.
+
+Запуск:
+    python -m benchmarks.bench_logging --records 2000 --delays 0 0.0005 0.002
+"""
+import argparse
+import io
+import logging
+import statistics
+import sys
+import time
+from logging.handlers import QueueListener
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config.settings import LOG_FORMAT
+from utils import logger as queued_logging
+
+
+class SlowStream(io.StringIO):
+    """Поток вывода, каждая запись в который занимает delay секунд"""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        return super().write(text)
+
+
+def slow_handlers(delay: float) -> List[logging.Handler]:
+    """Файл и консоль прежней схемы, оба с медленным выводом"""
+    handlers = []
+    for fmt in (LOG_FORMAT, "%(message)s"):
+        handler = logging.StreamHandler(SlowStream(delay))
+        handler.setFormatter(logging.Formatter(fmt))
+        handlers.append(handler)
+    return handlers
+
+
+def measure(logger: logging.Logger, records: int) -> List[float]:
+    """Задержки вызовов logger.info, в секундах"""
+    payload = {"update_id": 1, "message": {"chat": {"id": 1}, "text": "x" * 200}}
+    latencies = []
+    for i in range(records):
+        started = time.perf_counter()
+        logger.info(f"Received webhook data: {payload} #{i}")
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def direct(delay: float, records: int) -> List[float]:
+    logger = logging.getLogger(f"bench.direct.{delay}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    for handler in slow_handlers(delay):
+        logger.addHandler(handler)
+    return measure(logger, records)
+
+
+def queued(delay: float, records: int) -> List[float]:
+    logger = logging.getLogger(f"bench.queued.{delay}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = queued_logging._QueueHandler(queued_logging._queue)
+    logger.addHandler(handler)
+    listener = QueueListener(queued_logging._queue, *slow_handlers(delay))
+    listener.start()
+    try:
+        return measure(logger, records)
+    finally:
+        # Время записи очереди в фоне в задержку вызовов не входит
+        listener.stop()
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--delays", type=float, nargs="+", default=[0, 0.0005, 0.002],
+                        help="задержка одной записи в вывод, с")
+    args = parser.parse_args()
+
+    # Общий поток utils.logger в бенчмарке не нужен
+    queued_logging.stop_logging()
+
+    print(f"{'write delay':>12} {'mode':>8} {'mean us':>9} {'p50 us':>8} {'p99 us':>8}")
+    for delay in args.delays:
+        for name, run in (("direct", direct), ("queued", queued)):
+            latencies = run(delay, args.records)
+            print(
+                f"{delay * 1000:>10.1f}ms {name:>8} {statistics.mean(latencies) * 1e6:>9.1f} "
+                f"{percentile(latencies, 50) * 1e6:>8.1f} {percentile(latencies, 99) * 1e6:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Микробенчмарк накладных расходов на страницу в конвейере переноса
+
+Сравнивает создание модели pydantic NotionPage для каждой страницы (прежний
+путь) с легкой записью PageRecord, в том числе с проверкой моделью
+(VALIDATE_PAGES), и показывает долю этих расходов в преобразовании
+свойств планом переноса. Страницы - результаты запроса широкой базы в
+формате API. Отчет: время на страницу и память, которую удерживает
+результат для одной страницы (пока страница ждет в очереди записи).
+
+Запуск:
+    python -m benchmarks.bench_page_record --rows 100000 --properties 50
+"""
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_query_payload import VALUE_FACTORIES, wide_schema
+from benchmarks.mock_notion import _read_value
+from notion.models import NotionPage, PageRecord
+from notion.schema import compile_plan
+
+
+def make_results(rows: int, properties: int) -> List[Dict[str, Any]]:
+    """Страницы в формате ответа запроса базы"""
+    schema = wide_schema(properties)
+    # Значения повторяются по кругу: содержимое свойств на стоимость записи не влияет
+    variants = []
+    for i in range(64):
+        values = {"Name": {"title": [{"type": "text", "text": {"content": f"Page {i}"}}]}}
+        for name, config in schema.items():
+            if config["type"] != "title":
+                values[name] = VALUE_FACTORIES[config["type"]](i)
+        variants.append({name: _read_value(name, value, schema) for name, value in values.items()})
+    return [
+        {
+            "object": "page",
+            "id": f"00000000-0000-0000-0000-{i:012d}",
+            "created_time": "2024-01-01T00:00:00.000Z",
+            "last_edited_time": "2024-01-01T00:00:00.000Z",
+            "properties": variants[i % len(variants)]
+        }
+        for i in range(rows)
+    ]
+
+
+def measure(results: List[Dict[str, Any]], build: Callable[[Dict[str, Any]], Any]) -> Dict[str, float]:
+    """Время на страницу и память, удерживаемая результатом"""
+    gc.collect()
+    started = time.perf_counter()
+    for result in results:
+        build(result)
+    seconds = time.perf_counter() - started
+
+    # Память - отдельным проходом, tracemalloc замедляет выполнение
+    sample = results[:min(len(results), 10000)]
+    tracemalloc.start()
+    kept = [build(result) for result in sample]
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return {"ns": seconds / len(results) * 1e9, "retained": retained / len(sample)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--properties", type=int, default=50)
+    args = parser.parse_args()
+
+    results = make_results(args.rows, args.properties)
+    schema = wide_schema(args.properties)
+    plan = compile_plan(schema, schema)
+
+    def pydantic_page(result: Dict[str, Any]) -> NotionPage:
+        return NotionPage(id=result["id"], properties=result["properties"])
+
+    def lean_page(result: Dict[str, Any]) -> PageRecord:
+        return PageRecord.from_result(result, validate=False)
+
+    def validated_page(result: Dict[str, Any]) -> PageRecord:
+        return PageRecord.from_result(result, validate=True)
+
+    modes = (
+        ("NotionPage", pydantic_page),
+        ("PageRecord", lean_page),
+        ("validated", validated_page),
+        ("plan.apply", lambda result: plan.apply(result["properties"]))
+    )
+    print(f"{args.rows} rows x {args.properties} properties")
+    print(f"{'mode':>11} {'ns/row':>9} {'ms/100k':>9} {'kept B/row':>11}")
+    for name, build in modes:
+        result = measure(results, build)
+        print(f"{name:>11} {result['ns']:>9.0f} {result['ns'] / 10:>9.0f} {result['retained']:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
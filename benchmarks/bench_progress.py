@@ -0,0 +1,102 @@
+"""
+Бенчмарк TransferProgress: время и память набора перенесенных страниц
+
+Сравнивает прежнее представление (список строк UUID с линейным поиском)
+с упакованными 128-битными ID в множестве.
+
+Запуск:
+    python -m benchmarks.bench_progress --pages 100000 --legacy-pages 10000
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from notion.models import TransferProgress
+
+
+def legacy_run(ids):
+    """Прежний алгоритм: проверка `in` по списку и добавление"""
+    transferred = []
+    for page_id in ids:
+        if page_id not in transferred:
+            transferred.append(page_id)
+    for page_id in ids:
+        assert page_id in transferred
+    return transferred
+
+
+def legacy_dump(transferred):
+    return json.dumps({"transferred_pages": transferred}, indent=2)
+
+
+def packed_run(ids):
+    progress = TransferProgress()
+    for page_id in ids:
+        if not progress.is_transferred(page_id):
+            progress.add_transferred_page(page_id)
+    for page_id in ids:
+        assert progress.is_transferred(page_id)
+    return progress
+
+
+def packed_dump(progress):
+    return json.dumps(progress.model_dump())
+
+
+def legacy_load(ids):
+    """Состояние прежнего формата после загрузки из JSON: собственные копии строк"""
+    return [str(uuid.UUID(page_id)) for page_id in ids]
+
+
+def measure(name, run, load, dump, ids):
+    per_page = "n/a"
+    if run is not None:
+        started = time.perf_counter()
+        run(ids)
+        per_page = f"{(time.perf_counter() - started) / len(ids) * 1e6:.2f}"
+
+    # Учитывается только память, которую удерживает само состояние
+    tracemalloc.start()
+    state = load(ids)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    serialized = dump(state)
+    dump_time = time.perf_counter() - started
+    print(
+        f"{name:>8} {len(ids):>8} {per_page:>10} "
+        f"{retained / 2**20:>12.1f} {len(serialized) / 2**20:>9.2f} {dump_time:>9.3f}"
+    )
+    return state
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100_000)
+    parser.add_argument(
+        "--legacy-pages", type=int, default=10_000,
+        help="размер для прежнего представления (O(n^2), 100k занимает минуты)"
+    )
+    args = parser.parse_args()
+
+    ids = [str(uuid.uuid4()) for _ in range(args.pages)]
+    print(f"{'variant':>8} {'pages':>8} {'us/page':>10} {'retained MiB':>12} {'json MiB':>9} {'dump, s':>9}")
+    measure("legacy", legacy_run, legacy_load, legacy_dump, ids[:args.legacy_pages])
+    measure("legacy", None, legacy_load, legacy_dump, ids)
+    measure("packed", packed_run, packed_run, packed_dump, ids[:args.legacy_pages])
+    progress = measure("packed", packed_run, packed_run, packed_dump, ids)
+
+    started = time.perf_counter()
+    TransferProgress(**json.loads(json.dumps(progress.model_dump())))
+    print(f"packed round trip (dump + load): {time.perf_counter() - started:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Бенчмарк облегченных запросов к базе: полный ответ, filter_properties
+и чтение только ID на широкой базе (50 свойств)
+
+Каждый режим читает всю базу последовательными запросами query_database
+через NotionAPI. Отчет: байт ответов, время чтения, p50/p99 задержки
+запроса и объем результатов, которые остаются в памяти вызывающего кода.
+Пропускная способность мок-сервера ограничена (--bandwidth), чтобы размер
+ответа влиял на задержку, как при работе с api.notion.com.
+
+Запуск:
+    python -m benchmarks.bench_query_payload --pages 2000 --properties 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("NOTION_RATE_LIMIT", "100000")
+os.environ.setdefault("NOTION_RATE_BURST", "100000")
+
+from benchmarks.mock_notion import MockNotion, TITLE_SCHEMA, start_mock_server, base_url
+
+# Типы свойств широкой базы и значения в формате записи
+VALUE_FACTORIES = {
+    "rich_text": lambda i: {"rich_text": [{"type": "text", "text": {"content": f"Описание строки {i} " * 3}}]},
+    "number": lambda i: {"number": i * 1.5},
+    "select": lambda i: {"select": {"name": f"Option {i % 7}"}},
+    "multi_select": lambda i: {"multi_select": [{"name": f"Tag {i % 5}"}, {"name": f"Tag {i % 3 + 5}"}]},
+    "date": lambda i: {"date": {"start": f"2024-01-{i % 28 + 1:02d}"}},
+    "checkbox": lambda i: {"checkbox": i % 2 == 0},
+    "url": lambda i: {"url": f"https://example.com/items/{i}"},
+    "email": lambda i: {"email": f"user{i}@example.com"}
+}
+
+
+def wide_schema(properties: int) -> Dict[str, Any]:
+    schema = dict(TITLE_SCHEMA)
+    types = list(VALUE_FACTORIES)
+    for n in range(properties - 1):
+        prop_type = types[n % len(types)]
+        name = f"Prop {n:02d}"
+        schema[name] = {"id": f"p{n:03d}", "name": name, "type": prop_type, prop_type: {}}
+    return schema
+
+
+def fill(mock: MockNotion, database_id: str, pages: int, properties: int) -> None:
+    schema = wide_schema(properties)
+    mock.add_database(database_id, 0, schema=schema)
+    for i in range(pages):
+        values = {"Name": {"title": [{"type": "text", "text": {"content": f"Page {i}"}}]}}
+        for name, config in schema.items():
+            if config["type"] != "title":
+                values[name] = VALUE_FACTORIES[config["type"]](i)
+        mock._add_page(database_id, values, created_time=f"2024-01-01T00:{i // 60 % 60:02d}:00.000Z")
+
+
+async def scan(api: Any, database_id: str, **options: Any) -> Dict[str, Any]:
+    """Чтение всей базы последовательными запросами"""
+    latencies: List[float] = []
+    kept = 0
+    pages = 0
+    cursor = None
+    started = time.perf_counter()
+    while True:
+        request_started = time.perf_counter()
+        response = await api.query_database(database_id, cursor, **options)
+        latencies.append(time.perf_counter() - request_started)
+        results = response["results"]
+        pages += len(results)
+        kept += len(json.dumps(results, ensure_ascii=False).encode("utf-8"))
+        if not response.get("has_more"):
+            break
+        cursor = response["next_cursor"]
+    latencies.sort()
+    return {
+        "pages": pages,
+        "seconds": time.perf_counter() - started,
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+        "kept": kept
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--properties", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка ответа мок-сервера, с")
+    parser.add_argument("--bandwidth", type=float, default=10e6, help="пропускная способность, байт/с (0 - без ограничения)")
+    args = parser.parse_args()
+
+    mock = MockNotion(pages=0, latency=args.latency, bandwidth=args.bandwidth)
+    fill(mock, "wide", args.pages, args.properties)
+    runner = await start_mock_server(mock)
+    os.environ["NOTION_BASE_URL"] = base_url(runner)
+
+    from notion.api import NotionAPI, TITLE_PROPERTY_ID, close_session
+
+    api = NotionAPI("bench")
+    modes = (
+        ("full", {}),
+        ("title", {"filter_properties": [TITLE_PROPERTY_ID]}),
+        ("ids_only", {"ids_only": True})
+    )
+    print(f"{args.pages} pages x {args.properties} properties, latency {args.latency * 1000:.0f} ms, "
+          f"bandwidth {args.bandwidth / 1e6:.1f} MB/s")
+    print(f"{'mode':>9} {'requests':>9} {'wire MB':>9} {'kept MB':>9} {'seconds':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    try:
+        for name, options in modes:
+            requests, sent = mock.requests, mock.bytes_sent
+            result = await scan(api, "wide", **options)
+            assert result["pages"] == args.pages
+            print(
+                f"{name:>9} {mock.requests - requests:>9} {(mock.bytes_sent - sent) / 1e6:>9.2f} "
+                f"{result['kept'] / 1e6:>9.2f} {result['seconds']:>8.2f} "
+                f"{result['p50'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f}"
+            )
+    finally:
+        await close_session()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
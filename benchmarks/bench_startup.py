@@ -0,0 +1,173 @@
+"""
+Бенчмарк холодного старта: время от запуска процесса main.py до первого
+ответа 200 на /webhook и до первого ответа бота в чат
+
+Bot API заменяется локальным сервером (TELEGRAM_API_URL), поэтому сеть
+и настоящий токен не нужны. Сценарий "registered" - обычный перезапуск,
+когда вебхук уже указывает на WEBHOOK_URL; "new" - первая регистрация.
+
+Запуск:
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+ROOT = Path(__file__).resolve().parent.parent
+BOT_TOKEN = "123456:bench"
+WEBHOOK_URL = "https://bench.example.com/webhook"
+
+
+class MockBotAPI:
+    """Минимальная замена Telegram Bot API для запуска бота"""
+
+    def __init__(self, webhook_url: str = ""):
+        self.webhook_url = webhook_url
+        self.calls: Dict[str, int] = {}
+        self.first_message = asyncio.Event()
+        self.message_id = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if request.content_type == "application/json":
+            data = await request.json()
+        else:
+            data = dict(await request.post())
+        return web.json_response({"ok": True, "result": self.result(method, data)})
+
+    def result(self, method: str, data: Dict[str, Any]) -> Any:
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        if method == "getWebhookInfo":
+            return {"url": self.webhook_url, "has_custom_certificate": False, "pending_update_count": 0}
+        if method == "setWebhook":
+            self.webhook_url = data.get("url", "")
+            return True
+        if method == "deleteWebhook":
+            self.webhook_url = ""
+            return True
+        if method in ("sendMessage", "editMessageText"):
+            self.first_message.set()
+            self.message_id += 1
+            return {
+                "message_id": self.message_id,
+                "date": int(time.time()),
+                "chat": {"id": int(data.get("chat_id", 1)), "type": "private"},
+                "text": data.get("text", "")
+            }
+        return True
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_update(update_id: int) -> Dict[str, Any]:
+    user = {"id": 42, "is_bot": False, "first_name": "Bench"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": 42, "type": "private"},
+            "from": user,
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}]
+        }
+    }
+
+
+async def run_once(registered: bool, timeout: float) -> Dict[str, Optional[float]]:
+    """Один запуск main.py; времена в секундах от запуска процесса"""
+    port = free_port()
+    api = MockBotAPI(WEBHOOK_URL if registered else "")
+    runner = web.AppRunner(api.make_app())
+    await runner.setup()
+    api_port = free_port()
+    await web.TCPSite(runner, "127.0.0.1", api_port).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            PORT=str(port),
+            WEBHOOK_URL=WEBHOOK_URL,
+            TELEGRAM_BOT_TOKEN=BOT_TOKEN,
+            TELEGRAM_API_URL=f"http://127.0.0.1:{api_port}/bot",
+            STATE_DB_PATH=str(Path(tmp) / "state.db"),
+            LOG_LEVEL="WARNING"
+        )
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "main.py", cwd=ROOT, env=env,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+        )
+        result: Dict[str, Optional[float]] = {"webhook_200": None, "first_reply": None}
+        try:
+            url = f"http://127.0.0.1:{port}/webhook"
+            update_id = 0
+            async with aiohttp.ClientSession() as session:
+                while time.perf_counter() - started < timeout:
+                    update_id += 1
+                    try:
+                        async with session.post(url, json=start_update(update_id)) as response:
+                            if response.status == 200:
+                                result["webhook_200"] = time.perf_counter() - started
+                                break
+                    except aiohttp.ClientConnectionError:
+                        pass
+                    await asyncio.sleep(0.005)
+            if result["webhook_200"] is not None:
+                remaining = timeout - (time.perf_counter() - started)
+                await asyncio.wait_for(api.first_message.wait(), max(remaining, 0.1))
+                result["first_reply"] = time.perf_counter() - started
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            process.terminate()
+            await process.wait()
+            await runner.cleanup()
+    result["set_webhook_calls"] = api.calls.get("setWebhook", 0)
+    return result
+
+
+def describe(values: List[Optional[float]]) -> str:
+    measured = [v for v in values if v is not None]
+    if not measured:
+        return f"{'-':>10} {'-':>10}"
+    return f"{statistics.median(measured) * 1000:>10.0f} {max(measured) * 1000:>10.0f}"
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    print(f"{'scenario':>10} {'event':>12} {'median ms':>10} {'max ms':>10} {'setWebhook':>10}")
+    for name, registered in (("new", False), ("registered", True)):
+        results = [await run_once(registered, args.timeout) for _ in range(args.runs)]
+        calls = sum(r["set_webhook_calls"] for r in results)
+        for event in ("webhook_200", "first_reply"):
+            print(f"{name:>10} {event:>12} {describe([r[event] for r in results])} {calls:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,424 @@
+"""
+Локальная замена API Notion для бенчмарков
+
+Реализует только те эндпоинты v1, которые использует бот, и хранит данные
+в памяти. Задержка ответа настраивается, чтобы имитировать сетевой
+round trip до api.notion.com, а пропускная способность - время передачи
+больших ответов; доля ответов 429 (с Retry-After) и 5xx задается для
+проверки повторных попыток.
+"""
+import asyncio
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+from aiohttp import web
+
+TITLE_SCHEMA = {"Name": {"id": "title", "name": "Name", "type": "title", "title": {}}}
+
+# Типы свойств, которые API отклоняет в запросах записи
+READ_ONLY_TYPES = {
+    "formula", "rollup", "created_time", "created_by", "last_edited_time",
+    "last_edited_by", "unique_id", "button", "verification"
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _read_value(name: str, value: Dict[str, Any], schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Преобразование значения свойства из формата записи в формат чтения"""
+    prop_type = schema.get(name, {}).get("type") or next(iter(value))
+    data = value.get(prop_type)
+    if prop_type in ("title", "rich_text"):
+        data = [
+            dict(part, plain_text=part.get("plain_text") or part.get("text", {}).get("content", ""))
+            for part in data or []
+        ]
+    return {"id": schema.get(name, {}).get("id", name), "type": prop_type, prop_type: data}
+
+
+def _matches(page: Dict[str, Any], query_filter: Optional[Dict[str, Any]]) -> bool:
+    """Проверка страницы фильтром запроса (поддерживается подмножество фильтров API)"""
+    if not query_filter:
+        return True
+    if "and" in query_filter:
+        return all(_matches(page, part) for part in query_filter["and"])
+    if "or" in query_filter:
+        return any(_matches(page, part) for part in query_filter["or"])
+    if "timestamp" in query_filter:
+        field = query_filter["timestamp"]
+        value = page[field]
+        condition = query_filter[field]
+        if "on_or_after" in condition and value < condition["on_or_after"]:
+            return False
+        if "after" in condition and value <= condition["after"]:
+            return False
+        if "before" in condition and value >= condition["before"]:
+            return False
+        return True
+    prop = page["properties"].get(query_filter.get("property"))
+    if "relation" in query_filter:
+        return bool((prop or {}).get("relation")) == query_filter["relation"].get("is_not_empty", False)
+    for kind in ("rich_text", "title"):
+        if kind in query_filter:
+            text = "".join(part.get("plain_text", "") for part in (prop or {}).get(kind) or [])
+            if query_filter[kind].get("is_not_empty"):
+                return bool(text)
+            if "equals" in query_filter[kind]:
+                return text == query_filter[kind]["equals"]
+    return True
+
+
+def _page_view(page: Dict[str, Any], property_ids: Optional[Set[str]] = None) -> Dict[str, Any]:
+    """
+    Страница в ответе запроса базы: как и API, отдает не более 25 связей свойства
+    и только свойства из filter_properties, если они заданы
+    """
+    properties = {}
+    for name, prop in page["properties"].items():
+        if property_ids is not None and prop["id"] not in property_ids:
+            continue
+        if prop["type"] == "relation":
+            prop = dict(prop, relation=prop["relation"][:25], has_more=len(prop["relation"]) > 25)
+        properties[name] = prop
+    return dict(page, properties=properties)
+
+
+class MockNotion:
+    """Состояние и обработчики мок-сервера Notion"""
+
+    def __init__(
+        self,
+        pages: int = 1000,
+        latency: float = 0.05,
+        blocks_per_page: int = 0,
+        rate_limit_ratio: float = 0.0,
+        retry_after: float = 1.0,
+        error_ratio: float = 0.0,
+        seed: int = 0,
+        bandwidth: float = 0.0
+    ):
+        self.latency = latency
+        # Байт в секунду на передачу ответа (0 - без ограничения)
+        self.bandwidth = bandwidth
+        self.bytes_sent = 0
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.error_ratio = error_ratio
+        self.faults = {"rate_limited": 0, "server_error": 0}
+        self._random = random.Random(seed)
+        self.databases: Dict[str, List[Dict[str, Any]]] = {}
+        self.schemas: Dict[str, Dict[str, Any]] = {}
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self.blocks: Dict[str, List[Dict[str, Any]]] = {}
+        self.created: List[Dict[str, Any]] = []
+        self.requests = 0
+        self.add_database("origin", pages, blocks_per_page)
+        self.add_database("dest", 0)
+
+    def add_database(
+        self,
+        database_id: str,
+        pages: int,
+        blocks_per_page: int = 0,
+        schema: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Создание базы с заданным количеством страниц и блоков в каждой"""
+        self.schemas[database_id] = dict(schema or TITLE_SCHEMA)
+        self.databases[database_id] = []
+        started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for i in range(pages):
+            created = (started + timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:00.000Z")
+            self._add_page(database_id, {
+                "Name": {"title": [{"type": "text", "text": {"content": f"Page {i}"}}]}
+            }, created_time=created)
+        for page in self.databases[database_id]:
+            self.blocks[page["id"]] = [
+                self._make_block({
+                    "type": "paragraph",
+                    "paragraph": {"rich_text": [{"type": "text", "text": {"content": f"Line {i}"}}]}
+                })
+                for i in range(blocks_per_page)
+            ]
+
+    def _add_page(
+        self,
+        database_id: str,
+        properties: Dict[str, Any],
+        created_time: Optional[str] = None
+    ) -> Dict[str, Any]:
+        schema = self.schemas[database_id]
+        created_time = created_time or _now()
+        page = {
+            "object": "page",
+            "id": str(uuid.uuid4()),
+            "parent": {"type": "database_id", "database_id": database_id},
+            "created_time": created_time,
+            "last_edited_time": created_time,
+            "properties": {
+                name: _read_value(name, value, schema) for name, value in properties.items()
+            }
+        }
+        self.databases[database_id].append(page)
+        self.pages[page["id"]] = page
+        self.blocks[page["id"]] = []
+        return page
+
+    def _make_block(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Создание блока из тела запроса вместе с вложенными блоками"""
+        block_type = payload["type"]
+        data = dict(payload.get(block_type, {}))
+        children = data.pop("children", [])
+        block = {
+            "object": "block",
+            "id": str(uuid.uuid4()),
+            "type": block_type,
+            block_type: data,
+            "has_children": bool(children)
+        }
+        self.blocks[block["id"]] = [self._make_block(child) for child in children]
+        return block
+
+    async def _delay(self) -> None:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    @web.middleware
+    async def _wire(self, request: web.Request, handler) -> web.StreamResponse:
+        """Учет отправленных байт и время передачи ответа при ограниченной пропускной способности"""
+        response = await handler(request)
+        size = len(response.body or b"") if isinstance(response, web.Response) else 0
+        self.bytes_sent += size
+        if self.bandwidth and size:
+            await asyncio.sleep(size / self.bandwidth)
+        return response
+
+    @web.middleware
+    async def _faults(self, request: web.Request, handler) -> web.StreamResponse:
+        """Случайные ответы 429 и 503 вместо обработки запроса"""
+        if self.rate_limit_ratio or self.error_ratio:
+            roll = self._random.random()
+            if roll < self.rate_limit_ratio:
+                await self._delay()
+                self.faults["rate_limited"] += 1
+                return web.json_response(
+                    {"object": "error", "status": 429, "code": "rate_limited"},
+                    status=429,
+                    headers={"Retry-After": str(self.retry_after)}
+                )
+            if roll < self.rate_limit_ratio + self.error_ratio:
+                await self._delay()
+                self.faults["server_error"] += 1
+                return web.json_response(
+                    {"object": "error", "status": 503, "code": "service_unavailable"},
+                    status=503
+                )
+        return await handler(request)
+
+    @staticmethod
+    def _validation_error(schema: Dict[str, Any], properties: Dict[str, Any]) -> Optional[web.Response]:
+        """Ошибка 400, как у API, для неизвестных свойств и свойств только для чтения"""
+        for name, value in properties.items():
+            config = schema.get(name)
+            if config is None or config["type"] in READ_ONLY_TYPES or config["type"] not in value:
+                return web.json_response(
+                    {"object": "error", "status": 400, "code": "validation_error",
+                     "message": f"{name} is not a writable property"},
+                    status=400
+                )
+        return None
+
+    @staticmethod
+    def _not_found() -> web.Response:
+        return web.json_response(
+            {"object": "error", "status": 404, "code": "object_not_found"},
+            status=404
+        )
+
+    async def retrieve_database(self, request: web.Request) -> web.Response:
+        await self._delay()
+        database_id = request.match_info["database_id"]
+        if database_id not in self.schemas:
+            return self._not_found()
+        return web.json_response({
+            "object": "database",
+            "id": database_id,
+            "title": [{"type": "text", "plain_text": database_id}],
+            "properties": self.schemas[database_id]
+        })
+
+    async def get_me(self, request: web.Request) -> web.Response:
+        await self._delay()
+        return web.json_response({
+            "object": "user",
+            "id": "00000000-0000-0000-0000-000000000001",
+            "type": "bot",
+            "name": "Mock Integration",
+            "bot": {}
+        })
+
+    async def update_database(self, request: web.Request) -> web.Response:
+        await self._delay()
+        database_id = request.match_info["database_id"]
+        if database_id not in self.schemas:
+            return self._not_found()
+        body = await request.json()
+        for name, config in body.get("properties", {}).items():
+            prop_type = next(iter(config))
+            self.schemas[database_id][name] = {"id": uuid.uuid4().hex[:4], "name": name, "type": prop_type, prop_type: {}}
+        return await self.retrieve_database(request)
+
+    async def query_database(self, request: web.Request) -> web.Response:
+        await self._delay()
+        body = await request.json()
+        pages = self.databases.get(request.match_info["database_id"])
+        if pages is None:
+            return self._not_found()
+        if body.get("filter"):
+            pages = [page for page in pages if _matches(page, body["filter"])]
+        for sort in reversed(body.get("sorts") or []):
+            pages = sorted(
+                pages,
+                key=lambda page: page[sort["timestamp"]],
+                reverse=sort.get("direction") == "descending"
+            )
+        start = int(body.get("start_cursor") or 0)
+        end = start + min(int(body.get("page_size", 100)), 100)
+        has_more = end < len(pages)
+        property_ids = set(request.query.getall("filter_properties", [])) or None
+        return web.json_response({
+            "object": "list",
+            "results": [_page_view(page, property_ids) for page in pages[start:end]],
+            "has_more": has_more,
+            "next_cursor": str(end) if has_more else None
+        })
+
+    async def create_page(self, request: web.Request) -> web.Response:
+        await self._delay()
+        body = await request.json()
+        database_id = body.get("parent", {}).get("database_id")
+        if database_id not in self.databases:
+            return self._not_found()
+        if error := self._validation_error(self.schemas[database_id], body.get("properties", {})):
+            return error
+        page = self._add_page(database_id, body.get("properties", {}))
+        self.created.append(page)
+        self.blocks[page["id"]] = [self._make_block(child) for child in body.get("children", [])]
+        return web.json_response(page)
+
+    async def update_page(self, request: web.Request) -> web.Response:
+        await self._delay()
+        page = self.pages.get(request.match_info["page_id"])
+        if page is None:
+            return self._not_found()
+        body = await request.json()
+        schema = self.schemas[page["parent"]["database_id"]]
+        if error := self._validation_error(schema, body.get("properties", {})):
+            return error
+        for name, value in body.get("properties", {}).items():
+            page["properties"][name] = _read_value(name, value, schema)
+        page["last_edited_time"] = _now()
+        return web.json_response(page)
+
+    async def get_page_property(self, request: web.Request) -> web.Response:
+        await self._delay()
+        page = self.pages.get(request.match_info["page_id"])
+        prop = next(
+            (prop for prop in (page or {}).get("properties", {}).values()
+             if prop["id"] == request.match_info["property_id"]),
+            None
+        )
+        if prop is None:
+            return self._not_found()
+        items = [
+            {"object": "property_item", "type": prop["type"], prop["type"]: value}
+            for value in prop[prop["type"]] or []
+        ]
+        start = int(request.query.get("start_cursor") or 0)
+        end = start + 25
+        has_more = end < len(items)
+        return web.json_response({
+            "object": "list",
+            "results": items[start:end],
+            "has_more": has_more,
+            "next_cursor": str(end) if has_more else None
+        })
+
+    async def get_block_children(self, request: web.Request) -> web.Response:
+        await self._delay()
+        blocks = self.blocks.get(request.match_info["block_id"])
+        if blocks is None:
+            return self._not_found()
+        start = int(request.query.get("start_cursor") or 0)
+        end = start + min(int(request.query.get("page_size", 100)), 100)
+        has_more = end < len(blocks)
+        return web.json_response({
+            "object": "list",
+            "results": blocks[start:end],
+            "has_more": has_more,
+            "next_cursor": str(end) if has_more else None
+        })
+
+    async def append_block_children(self, request: web.Request) -> web.Response:
+        await self._delay()
+        body = await request.json()
+        parent = self.blocks.setdefault(request.match_info["block_id"], [])
+        created = [self._make_block(child) for child in body.get("children", [])]
+        parent.extend(created)
+        return web.json_response({"object": "list", "results": created, "has_more": False})
+
+    async def delete_block(self, request: web.Request) -> web.Response:
+        await self._delay()
+        block_id = request.match_info["block_id"]
+        for blocks in self.blocks.values():
+            for block in blocks:
+                if block["id"] == block_id:
+                    blocks.remove(block)
+                    return web.json_response(dict(block, archived=True))
+        return self._not_found()
+
+    def make_app(self) -> web.Application:
+        """Создание aiohttp-приложения мок-сервера"""
+        app = web.Application(middlewares=[self._wire, self._faults])
+        app.router.add_get("/v1/users/me", self.get_me)
+        app.router.add_get("/v1/databases/{database_id}", self.retrieve_database)
+        app.router.add_patch("/v1/databases/{database_id}", self.update_database)
+        app.router.add_post("/v1/databases/{database_id}/query", self.query_database)
+        app.router.add_post("/v1/pages", self.create_page)
+        app.router.add_patch("/v1/pages/{page_id}", self.update_page)
+        app.router.add_get("/v1/pages/{page_id}/properties/{property_id}", self.get_page_property)
+        app.router.add_get("/v1/blocks/{block_id}/children", self.get_block_children)
+        app.router.add_patch("/v1/blocks/{block_id}/children", self.append_block_children)
+        app.router.add_delete("/v1/blocks/{block_id}", self.delete_block)
+        return app
+
+
+async def start_mock_server(
+    mock: MockNotion,
+    host: str = "127.0.0.1",
+    port: int = 0
+) -> web.AppRunner:
+    """
+    Запуск мок-сервера
+
+    Args:
+        mock: Состояние мок-сервера
+        host: Адрес
+        port: Порт (0 - любой свободный)
+
+    Returns:
+        web.AppRunner: Запущенный runner, его адрес доступен через runner.addresses
+    """
+    runner = web.AppRunner(mock.make_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def base_url(runner: web.AppRunner) -> str:
+    """Базовый URL API для запущенного мок-сервера"""
+    host, port = runner.addresses[0][:2]
+    return f"http://{host}:{port}/v1"
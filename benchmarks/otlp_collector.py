@@ -0,0 +1,78 @@
+"""
+Локальная замена коллектора OpenTelemetry для проверки экспорта трассировки
+
+Принимает OTLP/HTTP JSON на /v1/traces, хранит участки в памяти и выводит
+сводку по каждому полученному экспорту.
+
+Запуск:
+    python -m benchmarks.otlp_collector --port 4318
+    OTEL_EXPORTER_OTLP_ENDPOINT=http://127.0.0.1:4318 python -m notion.transfer
+"""
+import argparse
+import asyncio
+from collections import Counter
+from typing import Any, Dict, List
+from aiohttp import web
+
+
+class MockCollector:
+    """Состояние и обработчик мок-коллектора"""
+
+    def __init__(self, verbose: bool = False):
+        self.verbose = verbose
+        self.spans: List[Dict[str, Any]] = []
+
+    async def traces(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        received = [
+            span
+            for resource in body.get("resourceSpans", [])
+            for scope in resource.get("scopeSpans", [])
+            for span in scope.get("spans", [])
+        ]
+        self.spans.extend(received)
+        if self.verbose:
+            counts = Counter(span["name"] for span in received)
+            print(f"received {len(received)} spans: " + ", ".join(f"{name}={n}" for name, n in counts.most_common()))
+        return web.json_response({"partialSuccess": {}})
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=256 * 1024 * 1024)
+        app.router.add_post("/v1/traces", self.traces)
+        return app
+
+
+async def start_collector(collector: MockCollector, host: str = "127.0.0.1", port: int = 0) -> web.AppRunner:
+    """
+    Запуск мок-коллектора
+
+    Args:
+        collector: Состояние коллектора
+        host: Адрес
+        port: Порт (0 - любой свободный)
+
+    Returns:
+        web.AppRunner: Запущенный runner, его адрес доступен через runner.addresses
+    """
+    runner = web.AppRunner(collector.make_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    args = parser.parse_args()
+
+    runner = await start_collector(MockCollector(verbose=True), args.host, args.port)
+    print(f"OTLP collector listening on http://{args.host}:{args.port}/v1/traces")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,193 @@
+"""
+Набор бенчмарков переноса на локальном мок-сервере Notion
+
+Для каждого размера базы мок-сервер запускается в этом процессе, а перенос
+выполняется в отдельном дочернем процессе без Telegram, поэтому пиковая
+память (RSS) относится только к переносу. Отчет: страниц в секунду,
+p50/p99 задержки запросов к API, пиковый RSS и время записи прогресса
+(журнал и снимки) в доле от общего времени.
+
+Запуск:
+    python -m benchmarks.run_benchmarks --sizes 1000 10000 100000 --latency 0.02
+    python -m benchmarks.run_benchmarks --sizes 1000 --rate-limit-ratio 0.01 --error-ratio 0.005
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.mock_notion import MockNotion, start_mock_server, base_url
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль q (0..100) по методу ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_worker(args: argparse.Namespace) -> None:
+    """Перенос в дочернем процессе; результат записывается в JSON-файл"""
+    from notion.api import close_session
+    from notion.transfer import NotionTransfer
+    from utils.journal import ProgressJournal
+    from utils.metrics import NOTION_REQUEST_SECONDS, NOTION_RETRIES
+
+    # Исходные значения задержек нужны для перцентилей, гистограммы для этого грубы
+    latencies: List[float] = []
+    observe = NOTION_REQUEST_SECONDS.observe
+
+    def record_latency(value: float, **labels: str) -> None:
+        latencies.append(value)
+        observe(value, **labels)
+
+    NOTION_REQUEST_SECONDS.observe = record_latency
+
+    # Время записи прогресса: журнал, fsync и перезапись снимка
+    checkpoint = {"seconds": 0.0}
+    for name in ("append", "compact", "close"):
+        method = getattr(ProgressJournal, name)
+
+        def timed(self, *a, _method=method, **kw):
+            started = time.perf_counter()
+            try:
+                return _method(self, *a, **kw)
+            finally:
+                checkpoint["seconds"] += time.perf_counter() - started
+
+        setattr(ProgressJournal, name, timed)
+
+    progress_file = Path(tempfile.mkdtemp()) / "progress.json"
+    transfer = NotionTransfer(
+        "origin-token", "dest-token", "origin", "dest",
+        concurrency=args.concurrency,
+        read_shards=args.shards,
+        progress_file=progress_file
+    )
+    started = time.perf_counter()
+    await transfer.run()
+    elapsed = time.perf_counter() - started
+    await close_session()
+
+    journal_bytes = sum(
+        path.stat().st_size
+        for path in (progress_file, progress_file.with_suffix(".jsonl"))
+        if path.exists()
+    )
+    result = {
+        "elapsed": elapsed,
+        "stats": transfer._stats,
+        "requests": len(latencies),
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "retries": {key[0]: value for key, value in NOTION_RETRIES._values.items()},
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "checkpoint_seconds": checkpoint["seconds"],
+        "checkpoint_bytes": journal_bytes
+    }
+    Path(args.result).write_text(json.dumps(result))
+
+
+async def run_size(args: argparse.Namespace, pages: int) -> Dict[str, Any]:
+    """Один замер: мок-сервер с базой из pages страниц и перенос в дочернем процессе"""
+    mock = MockNotion(
+        pages=pages,
+        latency=args.latency,
+        blocks_per_page=args.blocks,
+        rate_limit_ratio=args.rate_limit_ratio,
+        retry_after=args.retry_after,
+        error_ratio=args.error_ratio
+    )
+    runner = await start_mock_server(mock)
+    result_file = Path(tempfile.mkdtemp()) / "result.json"
+    env = dict(
+        os.environ,
+        NOTION_BASE_URL=base_url(runner),
+        # Бенчмарк измеряет перенос, а не настроенный лимит частоты запросов
+        NOTION_RATE_LIMIT=str(args.rate_limit),
+        NOTION_RATE_BURST=str(args.rate_limit)
+    )
+    output = None if args.verbose else asyncio.subprocess.DEVNULL
+    try:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "benchmarks.run_benchmarks", "--worker",
+            "--result", str(result_file),
+            "--concurrency", str(args.concurrency),
+            "--shards", str(args.shards),
+            cwd=str(Path(__file__).resolve().parent.parent),
+            env=env,
+            stdout=output,
+            stderr=output
+        )
+        await process.wait()
+    finally:
+        await runner.cleanup()
+
+    if process.returncode != 0 or not result_file.exists():
+        raise RuntimeError(f"Перенос {pages} страниц завершился с кодом {process.returncode}")
+    result = json.loads(result_file.read_text())
+    result["pages"] = pages
+    result["transferred"] = len(mock.databases["dest"])
+    result["faults"] = mock.faults
+    return result
+
+
+HEADER = (
+    f"{'pages':>8} {'pages/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>8} "
+    f"{'ckpt s':>8} {'ckpt %':>7} {'ckpt KB':>8} {'429/5xx':>9} {'retries':>8} {'ok':>4}"
+)
+
+
+def format_row(r: Dict[str, Any]) -> str:
+    faults = f"{r['faults']['rate_limited']}/{r['faults']['server_error']}"
+    return (
+        f"{r['pages']:>8} {r['pages'] / r['elapsed']:>9.1f} {r['p50'] * 1000:>8.1f} "
+        f"{r['p99'] * 1000:>8.1f} {r['peak_rss_mb']:>8.1f} {r['checkpoint_seconds']:>8.2f} "
+        f"{r['checkpoint_seconds'] / r['elapsed'] * 100:>6.1f}% {r['checkpoint_bytes'] / 1024:>8.0f} "
+        f"{faults:>9} {sum(r['retries'].values()):>8.0f} "
+        f"{'yes' if r['transferred'] == r['pages'] else 'NO':>4}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка ответа мок-сервера, с")
+    parser.add_argument("--blocks", type=int, default=0, help="блоков содержимого в каждой странице")
+    parser.add_argument("--concurrency", type=int, default=16, help="размер пула записи")
+    parser.add_argument("--shards", type=int, default=1, help="диапазонов параллельного чтения")
+    parser.add_argument("--rate-limit", type=float, default=100000, help="лимит клиента, запросов в секунду")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After в ответах 429, с")
+    parser.add_argument("--error-ratio", type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument("--json", help="сохранить результаты в файл")
+    parser.add_argument("--verbose", action="store_true", help="показывать логи переноса")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        await run_worker(args)
+        return
+
+    results = []
+    print(HEADER)
+    for pages in args.sizes:
+        results.append(await run_size(args, pages))
+        print(format_row(results[-1]), flush=True)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
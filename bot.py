@@ -0,0 +1,971 @@
+from typing import Optional
+from telegram import Update, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, ConversationHandler, CallbackQueryHandler, filters
+import re
+import aiohttp
+
+from config.settings import TELEGRAM_API_URL
+from notion.api import NotionAPI, close_session
+from notion.preflight import DryRunReport, PreflightError, dry_run
+from notion.transfer import NotionTransfer
+from utils.jobs import JobManager, JobLimitError, JobConflictError, ChatReply
+from utils.persistence import SQLitePersistence
+from utils.logger import setup_logger
+from utils.metrics import ACTIVE_JOBS, LoopLagMonitor
+
+logger = setup_logger(__name__)
+
+# Состояния диалога
+(LANGUAGE_SELECT, MAIN_MENU, TRANSFER_START, ORIGIN_TOKEN, DEST_TOKEN, 
+ ORIGIN_DB, DEST_DB, CONFIRMATION, FAQ, HELP) = range(10)
+
+# Параметры переноса в context.user_data (токены шифруются хранилищем состояния)
+TRANSFER_KEYS = ("origin_token", "dest_token", "origin_db", "dest_db")
+# Данные диалога переноса, которые очищаются вместе с параметрами
+DIALOG_KEYS = TRANSFER_KEYS + ("expected_pages",)
+
+# Фоновые переносы
+jobs = JobManager()
+
+# Замер задержки цикла событий для /metrics
+loop_lag = LoopLagMonitor()
+
+def escape_markdown_v2(text: str) -> str:
+    """Экранирование специальных символов для MarkdownV2"""
+    special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
+    for char in special_chars:
+        text = text.replace(char, f'\\{char}')
+    return text
+
+# Тексты на разных языках
+TEXTS = {
+    'ru': {
+        'welcome': (
+            "👋 Привет! Я бот для переноса данных между базами Notion.\n\n"
+            "Я помогу вам:\n"
+            "📋 Перенести все записи из одной базы в другую\n"
+            "🔄 Сохранить структуру и свойства данных\n"
+            "📊 Отслеживать прогресс в реальном времени\n\n"
+            "Выберите язык интерфейса:"
+        ),
+        'main_menu': "🏠 Главное меню",
+        'select_action': "Выберите действие:",
+        'start_transfer': "🚀 Начать перенос",
+        'how_to_get_tokens': "🔑 Как получить токены",
+        'how_to_get_db_ids': "📝 Как получить ID базы",
+        'faq': "❓ FAQ",
+        'about': "ℹ️ О боте",
+        'help': "🆘 Помощь",
+        'cancel': "❌ Отмена",
+        'back': "⬅️ Назад",
+        'origin_token_prompt': (
+            "🔑 Отправьте токен исходного аккаунта Notion\n\n"
+            "Как получить токен:\n"
+            "1. Перейдите на https://www.notion.so/my-integrations\n"
+            "2. Нажмите 'New integration'\n"
+            "3. Заполните форму и получите токен"
+        ),
+        'dest_token_prompt': "🔑 Теперь отправьте токен целевого аккаунта Notion",
+        'origin_db_prompt': (
+            "📁 Отправьте ID исходной базы данных\n\n"
+            "ID базы можно найти в её URL:\n"
+            "notion.so/workspace/[ID-БАЗЫ]?v=..."
+        ),
+        'dest_db_prompt': "📁 Отправьте ID целевой базы данных",
+        'faq_text': (
+            "*Часто задаваемые вопросы:*\n\n"
+            "*В: Как получить токен Notion?*\n"
+            "О: Перейдите в [Notion Integrations](https://www.notion.so/my-integrations), "
+            "создайте новую интеграцию и скопируйте токен.\n\n"
+            "*В: Где найти ID базы данных?*\n"
+            "О: Откройте базу данных в браузере и скопируйте ID из URL:\n"
+            "`notion.so/workspace/{ID-БАЗЫ}?v=...`\n\n"
+            "*В: Какие данные переносятся?*\n"
+            "О: Все записи базы данных с сохранением структуры и свойств.\n\n"
+            "*В: Можно ли отменить перенос?*\n"
+            "О: Да, используйте команду /cancel\\_transfer в любой момент."
+        ),
+        'about_text': (
+            "*О боте:*\n\n"
+            "Notion Transfer Bot помогает переносить данные между базами Notion\\. "
+            "Бот использует официальный API Notion и поддерживает:\n\n"
+            "✅ Перенос всех записей\n"
+            "✅ Сохранение структуры\n"
+            "✅ Отслеживание прогресса\n"
+            "✅ Восстановление после ошибок\n\n"
+            "Версия: 1\\.0\\.0\n"
+            "Разработчик: @Creatman\\_it"
+        ),
+        'help_text': (
+            "*Помощь:*\n\n"
+            "🔹 /start \\- Начать работу\n"
+            "🔹 /cancel \\- Отменить текущую операцию\n"
+            "🔹 /status \\- Состояние переноса\n"
+            "🔹 /cancel\\_transfer \\- Остановить перенос\n"
+            "🔹 /help \\- Показать это сообщение\n\n"
+            "При возникновении проблем:\n"
+            "1\\. Проверьте правильность токенов\n"
+            "2\\. Убедитесь, что ID баз указаны верно\n"
+            "3\\. Проверьте права доступа интеграций\n\n"
+            "Нужна помощь? Напишите @Creatman\\_it"
+        ),
+        'tokens_help_text': (
+            "*Как получить токены Notion:*\n\n"
+            "1. Перейдите на [страницу интеграций](https://www.notion.so/my-integrations)\n"
+            "2. Нажмите 'Create new integration'\n"
+            "3. Заполните форму:\n"
+            "   - Name: любое понятное название\n"
+            "   - Associated workspace: выберите рабочее пространство\n"
+            "4. Нажмите 'Submit'\n"
+            "5. Скопируйте 'Internal Integration Token'\n\n"
+            "❗️ Важно: создайте отдельные интеграции для исходного и целевого рабочих пространств\n\n"
+            "После получения токенов:\n"
+            "1. Откройте базу данных в Notion\n"
+            "2. Нажмите '⋮' -> 'Add connections'\n"
+            "3. Выберите созданную интеграцию"
+        ),
+        'db_help_text': (
+            "*Как найти ID базы данных:*\n\n"
+            "1. Откройте базу данных в браузере\n"
+            "2. Скопируйте часть URL после последнего '/'\n"
+            "   Пример: notion.so/workspace/*ID-БАЗЫ*?v=...\n\n"
+            "❗️ ID базы - это длинная строка символов\n"
+            "Пример: a1b2c3d4e5f6g7h8i9j0\n\n"
+            "Убедитесь, что:\n"
+            "✅ База открыта как полноэкранная страница\n"
+            "✅ URL содержит '?v=' после ID\n"
+            "✅ Интеграция имеет доступ к базе"
+        ),
+        'transfer_confirm': "Вы уверены, что хотите начать перенос?",
+        'yes': "✅ Да",
+        'no': "❌ Нет",
+        'return_menu': "🏠 Вернуться в меню",
+        'transfer_started': "Перенос запущен в фоне. Прогресс будет приходить в этот чат.\n"
+                            "/status - состояние, /cancel_transfer - остановить",
+        'job_limit_user': "⏳ У вас уже выполняется перенос. Дождитесь его завершения или остановите: /cancel_transfer",
+        'job_limit_global': "⏳ Сейчас выполняется слишком много переносов. Попробуйте позже.",
+        'job_conflict': "⏳ Перенос между этими базами уже выполняется. Дождитесь его завершения.",
+        'status_none': "Нет выполняющихся переносов",
+        'status_job': "🔄 Перенос {job_id}: {done}/{total} страниц ({percent:.1f}%), этап: {phase}",
+        'status_job_count': "🔄 Перенос {job_id}: обработано страниц: {done}, этап: {phase}",
+        'phase_pages': "перенос страниц",
+        'phase_relations': "восстановление связей",
+        'transfer_cancelled': "⏹ Остановлено переносов: {count}. Прогресс сохранен, перенос можно продолжить.",
+        'session_expired': "⌛ Данные для переноса устарели после перезапуска бота. Начните заново: /start",
+        'token_rejected': "❌ Notion отклонил токен. Проверьте токен и начните заново: /start",
+        'db_not_shared': (
+            "❌ База не найдена или не подключена к интеграции «{integration}».\n"
+            "Откройте базу в Notion, нажмите '⋮' -> 'Add connections', выберите интеграцию "
+            "и отправьте ID еще раз."
+        ),
+        'db_check_failed': "⚠️ Не удалось проверить доступ к базе: Notion не отвечает. Отправьте ID еще раз позже.",
+        'dry_run_started': "🔍 Проверяю доступ к базам и оцениваю объем переноса...",
+        'dry_run_pending': "⏳ Проверка еще идет, результат появится в сообщении выше.",
+        'dry_run_report': (
+            "📋 Предварительная проверка\n"
+            "Страниц: {pages}\n"
+            "Запросов к API: ≈{requests} (чтение {reads}, запись {writes})\n"
+            "Ожидаемое время: {eta}"
+        ),
+        'dry_run_more': "более {count}",
+        'dry_run_at_least': "не менее {eta}",
+        'dry_run_content': "Содержимое: ≈{blocks:.0f} блоков и ≈{size:.1f} КБ на страницу (по {sampled} стр.)",
+        'dry_run_dropped': "Не переносятся свойства: {names}",
+        'dry_run_failed': "⚠️ Не удалось выполнить предварительную проверку, оценка недоступна.",
+        'empty': "❌ В исходной базе нет страниц, переносить нечего. Отправьте ID другой исходной базы.",
+        'same_database': "❌ Исходная и целевая база совпадают. Отправьте ID другой целевой базы.",
+        'minutes': "{minutes} мин",
+        'hours': "{hours} ч {minutes} мин",
+        'under_minute': "меньше минуты"
+    },
+    'en': {
+        'welcome': (
+            "👋 Hi! I'm a bot for transferring data between Notion databases.\n\n"
+            "I'll help you:\n"
+            "📋 Transfer all records from one database to another\n"
+            "🔄 Preserve data structure and properties\n"
+            "📊 Track progress in real-time\n\n"
+            "👋 Привет! Я бот для переноса данных между базами Notion.\n\n"
+            "Я помогу вам:\n"
+            "📋 Перенести все записи из одной базы в другую\n"
+            "🔄 Сохранить структуру и свойства данных\n"
+            "📊 Отслеживать прогресс в реальном времени\n\n"
+            "Choose interface language / Выберите язык интерфейса:"
+        ),
+        'main_menu': "🏠 Main Menu",
+        'select_action': "Select an action:",
+        'start_transfer': "🚀 Start Transfer",
+        'how_to_get_tokens': "🔑 How to Get Tokens",
+        'how_to_get_db_ids': "📝 How to Get DB IDs",
+        'faq': "❓ FAQ",
+        'about': "ℹ️ About",
+        'help': "🆘 Help",
+        'cancel': "❌ Cancel",
+        'back': "⬅️ Back",
+        'origin_token_prompt': (
+            "🔑 Send the source Notion account token\n\n"
+            "How to get the token:\n"
+            "1. Go to https://www.notion.so/my-integrations\n"
+            "2. Click 'New integration'\n"
+            "3. Fill the form and get the token"
+        ),
+        'dest_token_prompt': "🔑 Now send the target account token",
+        'origin_db_prompt': (
+            "📁 Send the source database ID\n\n"
+            "You can find the ID in its URL:\n"
+            "notion.so/workspace/[DATABASE-ID]?v=..."
+        ),
+        'dest_db_prompt': "📁 Send the target database ID",
+        'faq_text': (
+            "*Frequently Asked Questions:*\n\n"
+            "*Q: How to get a Notion token?*\n"
+            "A: Go to [Notion Integrations](https://www.notion.so/my-integrations), "
+            "create a new integration and copy the token.\n\n"
+            "*Q: Where to find database ID?*\n"
+            "A: Open the database in browser and copy ID from URL:\n"
+            "`notion.so/workspace/{DATABASE-ID}?v=...`\n\n"
+            "*Q: What data is transferred?*\n"
+            "A: All database records with preserved structure and properties.\n\n"
+            "*Q: Can I cancel the transfer?*\n"
+            "A: Yes, use /cancel\\_transfer command at any time."
+        ),
+        'about_text': (
+            "*About:*\n\n"
+            "Notion Transfer Bot helps transfer data between Notion databases\\. "
+            "The bot uses official Notion API and supports:\n\n"
+            "✅ All records transfer\n"
+            "✅ Structure preservation\n"
+            "✅ Progress tracking\n"
+            "✅ Error recovery\n\n"
+            "Version: 1\\.0\\.0\n"
+            "Developer: @Creatman\\_it"
+        ),
+        'help_text': (
+            "*Help:*\n\n"
+            "🔹 /start \\- Start working\n"
+            "🔹 /cancel \\- Cancel current operation\n"
+            "🔹 /status \\- Transfer status\n"
+            "🔹 /cancel\\_transfer \\- Stop the transfer\n"
+            "🔹 /help \\- Show this message\n\n"
+            "If you encounter problems:\n"
+            "1\\. Check if tokens are correct\n"
+            "2\\. Make sure database IDs are valid\n"
+            "3\\. Verify integration permissions\n\n"
+            "Need help? Contact @Creatman\\_it"
+        ),
+        'tokens_help_text': (
+            "*How to get Notion tokens:*\n\n"
+            "1. Go to [integrations page](https://www.notion.so/my-integrations)\n"
+            "2. Click 'Create new integration'\n"
+            "3. Fill the form:\n"
+            "   - Name: any clear name\n"
+            "   - Associated workspace: select workspace\n"
+            "4. Click 'Submit'\n"
+            "5. Copy 'Internal Integration Token'\n\n"
+            "❗️ Important: create separate integrations for source and target workspaces\n\n"
+            "After getting tokens:\n"
+            "1. Open database in Notion\n"
+            "2. Click '⋮' -> 'Add connections'\n"
+            "3. Select created integration"
+        ),
+        'db_help_text': (
+            "*How to find database ID:*\n\n"
+            "1. Open database in browser\n"
+            "2. Copy part of URL after last '/'\n"
+            "   Example: notion.so/workspace/*DATABASE-ID*?v=...\n\n"
+            "❗️ Database ID is a long string of characters\n"
+            "Example: a1b2c3d4e5f6g7h8i9j0\n\n"
+            "Make sure that:\n"
+            "✅ Database is opened as full-page\n"
+            "✅ URL contains '?v=' after ID\n"
+            "✅ Integration has access to database"
+        ),
+        'transfer_confirm': "Are you sure you want to start the transfer?",
+        'yes': "✅ Yes",
+        'no': "❌ No",
+        'return_menu': "🏠 Return to menu",
+        'transfer_started': "Transfer started in the background. Progress will be posted to this chat.\n"
+                            "/status - state, /cancel_transfer - stop",
+        'job_limit_user': "⏳ You already have a transfer running. Wait for it to finish or stop it: /cancel_transfer",
+        'job_limit_global': "⏳ Too many transfers are running right now. Please try again later.",
+        'job_conflict': "⏳ A transfer between these databases is already running. Wait for it to finish.",
+        'status_none': "No transfers running",
+        'status_job': "🔄 Transfer {job_id}: {done}/{total} pages ({percent:.1f}%), stage: {phase}",
+        'status_job_count': "🔄 Transfer {job_id}: pages processed: {done}, stage: {phase}",
+        'phase_pages': "copying pages",
+        'phase_relations': "restoring relations",
+        'transfer_cancelled': "⏹ Transfers stopped: {count}. Progress is saved, the transfer can be resumed.",
+        'session_expired': "⌛ Transfer details expired after a bot restart. Please start over: /start",
+        'token_rejected': "❌ Notion rejected the token. Check it and start over: /start",
+        'db_not_shared': (
+            "❌ The database was not found or is not connected to the \"{integration}\" integration.\n"
+            "Open the database in Notion, click '⋮' -> 'Add connections', select the integration "
+            "and send the ID again."
+        ),
+        'db_check_failed': "⚠️ Could not check database access: Notion is not responding. Send the ID again later.",
+        'dry_run_started': "🔍 Checking database access and estimating the transfer...",
+        'dry_run_pending': "⏳ The check is still running, the result will appear in the message above.",
+        'dry_run_report': (
+            "📋 Pre-flight check\n"
+            "Pages: {pages}\n"
+            "API requests: ~{requests} ({reads} reads, {writes} writes)\n"
+            "Estimated time: {eta}"
+        ),
+        'dry_run_more': "more than {count}",
+        'dry_run_at_least': "at least {eta}",
+        'dry_run_content': "Content: ~{blocks:.0f} blocks and ~{size:.1f} KB per page (from {sampled} pages)",
+        'dry_run_dropped': "Properties not transferred: {names}",
+        'dry_run_failed': "⚠️ The pre-flight check failed, no estimate is available.",
+        'empty': "❌ The source database has no pages, nothing to transfer. Send the ID of another source database.",
+        'same_database': "❌ The source and target databases are the same. Send the ID of another target database.",
+        'minutes': "{minutes} min",
+        'hours': "{hours} h {minutes} min",
+        'under_minute': "under a minute"
+    }
+}
+
+# Глобальная переменная для хранения объекта приложения (создается в build_application)
+app: Optional[Application] = None
+
+def get_language_keyboard():
+    """Создание клавиатуры выбора языка"""
+    keyboard = [
+        [
+            InlineKeyboardButton("🇷🇺 Русский", callback_data="lang_ru"),
+            InlineKeyboardButton("🇬🇧 English", callback_data="lang_en")
+        ]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+def get_main_menu_keyboard(lang: str):
+    """Создание клавиатуры главного меню"""
+    texts = TEXTS[lang]
+    keyboard = [
+        [InlineKeyboardButton(texts['start_transfer'], callback_data="transfer")],
+        [
+            InlineKeyboardButton(texts['how_to_get_tokens'], callback_data="tokens_help"),
+            InlineKeyboardButton(texts['how_to_get_db_ids'], callback_data="db_help")
+        ],
+        [
+            InlineKeyboardButton(texts['faq'], callback_data="faq"),
+            InlineKeyboardButton(texts['about'], callback_data="about")
+        ],
+        [InlineKeyboardButton(texts['help'], callback_data="help")],
+        [InlineKeyboardButton("🇬🇧 English" if lang == "ru" else "🇷🇺 Русский", 
+                            callback_data="switch_lang")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+def get_navigation_keyboard(lang: str):
+    """Создание клавиатуры навигации"""
+    texts = TEXTS[lang]
+    keyboard = [
+        [InlineKeyboardButton(texts['return_menu'], callback_data="back_to_menu")],
+        [InlineKeyboardButton("🇬🇧 English" if lang == "ru" else "🇷🇺 Русский", 
+                            callback_data="switch_lang")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+def get_confirmation_keyboard(lang: str):
+    """Создание клавиатуры подтверждения"""
+    texts = TEXTS[lang]
+    keyboard = [
+        [
+            InlineKeyboardButton(texts['yes'], callback_data="confirm_yes"),
+            InlineKeyboardButton(texts['no'], callback_data="confirm_no")
+        ],
+        [InlineKeyboardButton(texts['return_menu'], callback_data="back_to_menu")],
+        [InlineKeyboardButton("🇬🇧 English" if lang == "ru" else "🇷🇺 Русский", 
+                            callback_data="switch_lang")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Начало диалога"""
+    try:
+        logger.info(f"Starting conversation with user {update.effective_user.id}")
+        welcome_text = (
+            "👋 Hi! I'm a bot for transferring data between Notion databases.\n\n"
+            "I'll help you:\n"
+            "📋 Transfer all records from one database to another\n"
+            "🔄 Preserve data structure and properties\n"
+            "📊 Track progress in real-time\n\n"
+            "👋 Привет! Я бот для переноса данных между базами Notion.\n\n"
+            "Я помогу вам:\n"
+            "📋 Перенести все записи из одной базы в другую\n"
+            "🔄 Сохранить структуру и свойства данных\n"
+            "📊 Отслеживать прогресс в реальном времени\n\n"
+            "Choose interface language / Выберите язык интерфейса:"
+        )
+        
+        # Очищаем данные пользователя при новом старте
+        for key in DIALOG_KEYS:
+            context.user_data.pop(key, None)
+        if 'language' in context.user_data:
+            del context.user_data['language']
+        
+        await update.message.reply_text(
+            welcome_text,
+            reply_markup=get_language_keyboard()
+        )
+        return LANGUAGE_SELECT
+    except Exception as e:
+        logger.error(f"Error in start handler: {str(e)}", exc_info=True)
+        raise
+
+async def language_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Обработка выбора языка"""
+    query = update.callback_query
+    await query.answer()
+    
+    lang = query.data.split('_')[1]
+    context.user_data['language'] = lang
+    
+    await query.edit_message_text(
+        text=TEXTS[lang]['select_action'],
+        reply_markup=get_main_menu_keyboard(lang)
+    )
+    return MAIN_MENU
+
+async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Обработка действий из главного меню"""
+    query = update.callback_query
+    await query.answer()
+    
+    lang = context.user_data.get('language', 'ru')
+    texts = TEXTS[lang]
+    
+    action = query.data
+    if action == "switch_lang":
+        # Переключение языка
+        new_lang = "en" if lang == "ru" else "ru"
+        context.user_data['language'] = new_lang
+        await query.edit_message_text(
+            text=TEXTS[new_lang]['select_action'],
+            reply_markup=get_main_menu_keyboard(new_lang)
+        )
+        return MAIN_MENU
+    elif action == "transfer":
+        await query.edit_message_text(
+            texts['origin_token_prompt'],
+            reply_markup=get_navigation_keyboard(lang)
+        )
+        return ORIGIN_TOKEN
+    elif action == "back_to_menu":
+        await query.edit_message_text(
+            text=texts['select_action'],
+            reply_markup=get_main_menu_keyboard(lang)
+        )
+        return MAIN_MENU
+    elif action in ["tokens_help", "db_help", "faq", "about", "help"]:
+        text = texts[f'{action}_text']
+        try:
+            await query.edit_message_text(
+                text=text,
+                reply_markup=get_navigation_keyboard(lang),
+                parse_mode='MarkdownV2',  # Используем MarkdownV2 вместо Markdown
+                disable_web_page_preview=True
+            )
+        except Exception as e:
+            logger.error(f"Error sending {action} message: {str(e)}")
+            # Если возникла ошибка с форматированием, отправляем без форматирования
+            await query.edit_message_text(
+                text=text.replace('*', '').replace('[', '').replace(']', ''),
+                reply_markup=get_navigation_keyboard(lang),
+                disable_web_page_preview=True
+            )
+        return MAIN_MENU
+    
+    return MAIN_MENU
+
+async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Отмена операции"""
+    user = update.message.from_user
+    lang = context.user_data.get('language', 'ru')
+    logger.info(f"Пользователь {user.id} отменил операцию")
+    
+    await update.message.reply_text(
+        TEXTS[lang]['cancel'],
+        reply_markup=ReplyKeyboardRemove()
+    )
+    return ConversationHandler.END
+
+def validate_notion_token(token: str) -> bool:
+    """Проверка формата токена Notion"""
+    # Формат токена: secret_XXXXX, где X - буквы и цифры, длина 50+ символов
+    pattern = r'^secret_[a-zA-Z0-9]{48,}$'
+    return bool(re.match(pattern, token))
+
+async def check_database_access(token: str, database_id: str, lang: str) -> Optional[str]:
+    """
+    Проверка доступа интеграции к базе данных
+
+    Описание базы сохраняется в общий кэш NotionAPI, поэтому перенос
+    читает схему без повторного запроса.
+
+    Args:
+        token: Токен интеграции
+        database_id: ID базы данных
+        lang: Язык сообщения об ошибке
+
+    Returns:
+        Optional[str]: Текст ошибки для пользователя или None, если база доступна
+    """
+    api = NotionAPI(token)
+    try:
+        await api.retrieve_database(database_id)
+        return None
+    except aiohttp.ClientResponseError as e:
+        logger.warning(f"Ошибка проверки доступа к базе {database_id}: {str(e)}")
+        return await access_error(api, e.status, lang)
+    except Exception as e:
+        logger.warning(f"Ошибка проверки доступа к базе {database_id}: {str(e)}")
+        return TEXTS[lang]['db_check_failed']
+
+async def access_error(api: NotionAPI, status: Optional[int], lang: str) -> str:
+    """
+    Текст ошибки доступа к базе по статусу ответа API
+
+    Args:
+        api: Клиент интеграции, которой не хватает доступа
+        status: HTTP-статус ответа
+        lang: Язык сообщения
+
+    Returns:
+        str: Текст ошибки для пользователя
+    """
+    if status == 401:
+        return TEXTS[lang]['token_rejected']
+    if status in (400, 403, 404):
+        # Название интеграции подсказывает, к какой интеграции подключить базу
+        try:
+            integration = (await api.get_me()).get("name") or "?"
+        except Exception:
+            integration = "?"
+        return TEXTS[lang]['db_not_shared'].format(integration=integration)
+    return TEXTS[lang]['db_check_failed']
+
+def format_duration(seconds: float, lang: str) -> str:
+    """Длительность в минутах или часах для сообщений"""
+    texts = TEXTS[lang]
+    minutes = round(seconds / 60)
+    if minutes < 1:
+        return texts['under_minute']
+    if minutes < 60:
+        return texts['minutes'].format(minutes=minutes)
+    return texts['hours'].format(hours=minutes // 60, minutes=minutes % 60)
+
+def format_dry_run(report: DryRunReport, lang: str) -> str:
+    """Сообщение с результатом предварительной проверки переноса"""
+    texts = TEXTS[lang]
+    eta = format_duration(report.eta_seconds, lang)
+    lines = [texts['dry_run_report'].format(
+        pages=texts['dry_run_more'].format(count=report.pages) if report.capped else report.pages,
+        requests=report.requests,
+        reads=report.read_requests,
+        writes=report.write_requests,
+        eta=texts['dry_run_at_least'].format(eta=eta) if report.capped else eta
+    )]
+    if report.sampled:
+        lines.append(texts['dry_run_content'].format(
+            blocks=report.blocks_per_page,
+            size=report.content_bytes_per_page / 1024,
+            sampled=report.sampled
+        ))
+    if report.dropped:
+        lines.append(texts['dry_run_dropped'].format(names=", ".join(report.dropped)))
+    return "\n".join(lines)
+
+async def get_origin_token(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Получение токена исходного аккаунта"""
+    if not update.message:  # Если это callback query
+        query = update.callback_query
+        await query.answer()
+        
+        lang = context.user_data.get('language', 'ru')
+        if query.data == "switch_lang":
+            new_lang = "en" if lang == "ru" else "ru"
+            context.user_data['language'] = new_lang
+            await query.edit_message_text(
+                TEXTS[new_lang]['origin_token_prompt'],
+                reply_markup=get_navigation_keyboard(new_lang)
+            )
+            return ORIGIN_TOKEN
+        return await menu_callback(update, context)
+    
+    lang = context.user_data.get('language', 'ru')
+    token = update.message.text.strip()
+    
+    if not validate_notion_token(token):
+        error_msg = "❌ Invalid Notion token format. Token should start with 'secret_' and be at least 50 characters long.\n\n" if lang == 'en' else "❌ Неверный формат токена Notion. Токен должен начинаться с 'secret_' и быть длиной не менее 50 символов.\n\n"
+        error_msg += TEXTS[lang]['origin_token_prompt']
+        await update.message.reply_text(
+            error_msg,
+            reply_markup=get_navigation_keyboard(lang)
+        )
+        return ORIGIN_TOKEN
+    
+    context.user_data["origin_token"] = token
+    
+    await update.message.reply_text(
+        TEXTS[lang]['dest_token_prompt'],
+        reply_markup=get_navigation_keyboard(lang)
+    )
+    return DEST_TOKEN
+
+async def get_dest_token(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Получение токена целевого аккаунта"""
+    if not update.message:  # Если это callback query
+        query = update.callback_query
+        await query.answer()
+        
+        lang = context.user_data.get('language', 'ru')
+        if query.data == "switch_lang":
+            new_lang = "en" if lang == "ru" else "ru"
+            context.user_data['language'] = new_lang
+            await query.edit_message_text(
+                TEXTS[new_lang]['dest_token_prompt'],
+                reply_markup=get_navigation_keyboard(new_lang)
+            )
+            return DEST_TOKEN
+        return await menu_callback(update, context)
+    
+    lang = context.user_data.get('language', 'ru')
+    token = update.message.text.strip()
+    
+    if not validate_notion_token(token):
+        error_msg = "❌ Invalid Notion token format. Token should start with 'secret_' and be at least 50 characters long.\n\n" if lang == 'en' else "❌ Неверный формат токена Notion. Токен должен начинаться с 'secret_' и быть длиной не менее 50 символов.\n\n"
+        error_msg += TEXTS[lang]['dest_token_prompt']
+        await update.message.reply_text(
+            error_msg,
+            reply_markup=get_navigation_keyboard(lang)
+        )
+        return DEST_TOKEN
+    
+    context.user_data["dest_token"] = token
+    
+    await update.message.reply_text(
+        TEXTS[lang]['origin_db_prompt'],
+        reply_markup=get_navigation_keyboard(lang)
+    )
+    return ORIGIN_DB
+
+async def get_origin_db(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Получение ID исходной базы данных"""
+    if not update.message:  # Если это callback query
+        query = update.callback_query
+        await query.answer()
+        
+        lang = context.user_data.get('language', 'ru')
+        if query.data == "switch_lang":
+            new_lang = "en" if lang == "ru" else "ru"
+            context.user_data['language'] = new_lang
+            await query.edit_message_text(
+                TEXTS[new_lang]['origin_db_prompt'],
+                reply_markup=get_navigation_keyboard(new_lang)
+            )
+            return ORIGIN_DB
+        return await menu_callback(update, context)
+    
+    lang = context.user_data.get('language', 'ru')
+    database_id = update.message.text.strip()
+    if "origin_token" not in context.user_data:
+        await update.message.reply_text(TEXTS[lang]['session_expired'])
+        return ConversationHandler.END
+    
+    error = await check_database_access(context.user_data["origin_token"], database_id, lang)
+    if error:
+        await update.message.reply_text(error, reply_markup=get_navigation_keyboard(lang))
+        return ORIGIN_DB
+    
+    context.user_data["origin_db"] = database_id
+    
+    await update.message.reply_text(
+        TEXTS[lang]['dest_db_prompt'],
+        reply_markup=get_navigation_keyboard(lang)
+    )
+    return DEST_DB
+
+async def get_dest_db(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Получение ID целевой базы данных"""
+    if not update.message:  # Если это callback query
+        query = update.callback_query
+        await query.answer()
+        
+        lang = context.user_data.get('language', 'ru')
+        if query.data == "switch_lang":
+            new_lang = "en" if lang == "ru" else "ru"
+            context.user_data['language'] = new_lang
+            await query.edit_message_text(
+                TEXTS[new_lang]['dest_db_prompt'],
+                reply_markup=get_navigation_keyboard(new_lang)
+            )
+            return DEST_DB
+        return await menu_callback(update, context)
+    
+    lang = context.user_data.get('language', 'ru')
+    database_id = update.message.text.strip()
+    if any(key not in context.user_data for key in ("origin_token", "dest_token", "origin_db")):
+        await update.message.reply_text(TEXTS[lang]['session_expired'])
+        return ConversationHandler.END
+    
+    # Предварительная проверка: доступ к обеим базам, число страниц и оценка времени
+    status_message = await update.message.reply_text(TEXTS[lang]['dry_run_started'])
+    context.user_data.pop("expected_pages", None)
+    params = dict(context.user_data, dest_db=database_id)
+    transfer = NotionTransfer(**{key: params[key] for key in TRANSFER_KEYS})
+    try:
+        report = await dry_run(transfer)
+    except PreflightError as e:
+        # Перенос заведомо не удастся: подтверждение не предлагается
+        if e.reason == "access":
+            api = transfer.origin_api if e.side == "origin" else transfer.dest_api
+            text = await access_error(api, e.status, lang)
+        else:
+            text = TEXTS[lang][e.reason]
+        await status_message.edit_text(text, reply_markup=get_navigation_keyboard(lang))
+        return ORIGIN_DB if e.side == "origin" or e.reason == "empty" else DEST_DB
+    except Exception as e:
+        logger.warning(f"Ошибка предварительной проверки переноса: {str(e)}")
+        summary = TEXTS[lang]['dry_run_failed']
+    else:
+        summary = format_dry_run(report, lang)
+        if not report.capped:
+            # Общее число страниц для процента и оставшегося времени в сообщении о ходе переноса
+            context.user_data["expected_pages"] = report.pages
+    
+    context.user_data["dest_db"] = database_id
+    
+    await status_message.edit_text(
+        summary + "\n\n" + TEXTS[lang]['transfer_confirm'],
+        reply_markup=get_confirmation_keyboard(lang)
+    )
+    return CONFIRMATION
+
+async def dry_run_pending(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Ответ на сообщения, пришедшие во время предварительной проверки"""
+    lang = context.user_data.get('language', 'ru')
+    if update.callback_query:
+        await update.callback_query.answer(TEXTS[lang]['dry_run_pending'])
+    else:
+        await update.message.reply_text(TEXTS[lang]['dry_run_pending'])
+
+async def confirm_transfer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Подтверждение переноса"""
+    query = update.callback_query
+    await query.answer()
+    
+    lang = context.user_data.get('language', 'ru')
+    user_id = update.effective_user.id
+    
+    if query.data == "switch_lang":
+        new_lang = "en" if lang == "ru" else "ru"
+        context.user_data['language'] = new_lang
+        await query.edit_message_text(
+            TEXTS[new_lang]['transfer_confirm'],
+            reply_markup=get_confirmation_keyboard(new_lang)
+        )
+        return CONFIRMATION
+    elif query.data == "confirm_yes":
+        if any(key not in context.user_data for key in TRANSFER_KEYS):
+            # Токены не сохраняются без ключа шифрования и теряются при перезапуске
+            await query.edit_message_text(TEXTS[lang]['session_expired'])
+            return ConversationHandler.END
+        
+        # Создание экземпляра класса переноса
+        params = {key: context.user_data[key] for key in TRANSFER_KEYS}
+        transfer = NotionTransfer(**params, expected_pages=context.user_data.get("expected_pages"))
+        
+        # Перенос выполняется в фоновой задаче, обработчик завершается сразу
+        try:
+            await jobs.start(user_id, query.message.chat_id, transfer, transfer.run(query.message), params=params)
+            await query.edit_message_text("🚀 " + TEXTS[lang]['transfer_started'])
+        except JobLimitError:
+            limit_key = 'job_limit_user' if jobs.user_jobs(user_id) else 'job_limit_global'
+            await query.edit_message_text(TEXTS[lang][limit_key])
+        except JobConflictError:
+            await query.edit_message_text(TEXTS[lang]['job_conflict'])
+        
+        # Очистка данных пользователя
+        for key in DIALOG_KEYS:
+            context.user_data.pop(key, None)
+        
+        return ConversationHandler.END
+    else:
+        await query.edit_message_text(
+            text=TEXTS[lang]['select_action'],
+            reply_markup=get_main_menu_keyboard(lang)
+        )
+        return MAIN_MENU
+
+async def status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Состояние переносов пользователя"""
+    lang = context.user_data.get('language', 'ru')
+    user_jobs = jobs.user_jobs(update.effective_user.id)
+    if not user_jobs:
+        await update.message.reply_text(TEXTS[lang]['status_none'])
+        return
+    
+    lines = []
+    for job in user_jobs:
+        # Те же числа, что в сообщении о ходе переноса: страницы текущего прохода
+        done, total = job.transfer.pass_progress()
+        phase = TEXTS[lang]['phase_' + job.transfer.progress.phase]
+        if total:
+            lines.append(TEXTS[lang]['status_job'].format(
+                job_id=job.id,
+                done=done,
+                total=total,
+                percent=min(100.0, done / total * 100),
+                phase=phase
+            ))
+        else:
+            lines.append(TEXTS[lang]['status_job_count'].format(job_id=job.id, done=done, phase=phase))
+    await update.message.reply_text("\n".join(lines))
+
+async def cancel_transfer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Остановка переносов пользователя"""
+    lang = context.user_data.get('language', 'ru')
+    cancelled = await jobs.cancel(update.effective_user.id)
+    if not cancelled:
+        await update.message.reply_text(TEXTS[lang]['status_none'])
+        return
+    await update.message.reply_text(TEXTS[lang]['transfer_cancelled'].format(count=len(cancelled)))
+
+async def resume_job(record: dict) -> None:
+    """Возобновление переноса, сохраненного в хранилище состояния до перезапуска"""
+    params = record["params"]
+    transfer = NotionTransfer(**params)
+    message = ChatReply(app.bot, record["chat_id"])
+    await jobs.start(
+        record["user_id"],
+        record["chat_id"],
+        transfer,
+        transfer.run(message),
+        params=params,
+        job_id=record["id"]
+    )
+
+async def on_startup(app: Application) -> None:
+    """Подключение хранилища к фоновым переносам и возобновление прерванных переносов"""
+    jobs.store = app.persistence
+    jobs.resume = resume_job
+    await jobs.start_supervision()
+    ACTIVE_JOBS.set_function(lambda: len(jobs.active()))
+    loop_lag.start()
+
+async def on_stop(app: Application) -> None:
+    """
+    Остановка фоновых переносов
+
+    Выполняется, пока бот еще работает: переносы отправляют в чат сообщение
+    об остановке, а записи переносов освобождаются до записи хранилища
+    при завершении приложения.
+    """
+    await jobs.shutdown()
+
+async def on_shutdown(app: Application) -> None:
+    """Освобождение ресурсов при остановке бота"""
+    await loop_lag.stop()
+    await close_session()
+
+def build_application(bot_token: str) -> Application:
+    """
+    Создание приложения бота со всеми обработчиками
+
+    Args:
+        bot_token: Токен бота Telegram
+
+    Returns:
+        Application: Приложение (еще не инициализированное)
+    """
+    global app
+
+    # Создание и настройка бота
+    app = (
+        Application.builder()
+        .token(bot_token)
+        .base_url(TELEGRAM_API_URL)
+        .persistence(SQLitePersistence())
+        .post_init(on_startup)
+        .post_stop(on_stop)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
+    
+    # Добавление обработчиков (команды переносов работают в любом состоянии диалога)
+    app.add_handler(CommandHandler("status", status))
+    app.add_handler(CommandHandler("cancel_transfer", cancel_transfer))
+    
+    conv_handler = ConversationHandler(
+        name="transfer_conversation",
+        persistent=True,
+        entry_points=[
+            CommandHandler("start", start),
+            MessageHandler(filters.TEXT & ~filters.COMMAND, start)
+        ],
+        states={
+            LANGUAGE_SELECT: [
+                CallbackQueryHandler(language_callback, pattern=r"^lang_"),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, start)
+            ],
+            MAIN_MENU: [
+                CallbackQueryHandler(menu_callback),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, start)
+            ],
+            ORIGIN_TOKEN: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, get_origin_token),
+                CallbackQueryHandler(get_origin_token, pattern=r"^(back_to_menu|switch_lang)$")
+            ],
+            DEST_TOKEN: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, get_dest_token),
+                CallbackQueryHandler(get_dest_token, pattern=r"^(back_to_menu|switch_lang)$")
+            ],
+            ORIGIN_DB: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, get_origin_db),
+                CallbackQueryHandler(get_origin_db, pattern=r"^(back_to_menu|switch_lang)$")
+            ],
+            DEST_DB: [
+                # Предварительная проверка может идти минутами: обработчик
+                # выполняется в фоновой задаче и не держит очередь обновлений
+                MessageHandler(filters.TEXT & ~filters.COMMAND, get_dest_db, block=False),
+                CallbackQueryHandler(get_dest_db, pattern=r"^(back_to_menu|switch_lang)$")
+            ],
+            CONFIRMATION: [
+                CallbackQueryHandler(confirm_transfer, pattern=r"^(confirm_|back_to_menu|switch_lang)")
+            ],
+            ConversationHandler.WAITING: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, dry_run_pending),
+                CallbackQueryHandler(dry_run_pending)
+            ]
+        },
+        fallbacks=[
+            CommandHandler("cancel", cancel),
+            CommandHandler("start", start),
+            MessageHandler(filters.TEXT & ~filters.COMMAND, start)
+        ]
+    )
+    
+    app.add_handler(conv_handler)
+    
+    # Добавление обработчика ошибок
+    app.add_error_handler(error_handler)
+    
+    return app
+
+async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработчик ошибок"""
+    logger.error(f"Exception while handling an update: {context.error}")
+    
+    if isinstance(context.error, Exception):
+        error_message = "❌ An error occurred. Please try again or contact administrator.\n\n❌ Произошла ошибка. Пожалуйста, попробуйте снова или обратитесь к администратору."
+        if isinstance(update, Update):
+            if update.effective_message:
+                await update.effective_message.reply_text(error_message)
+            elif update.callback_query:
+                await update.callback_query.answer(error_message[:200])  # Telegram ограничивает длину ответа
+    
+    # Логируем детали ошибки
+    logger.error("Update: %s", update)
+    logger.error("Error: %s", context.error, exc_info=True)
+
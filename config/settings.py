@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
+from typing import List
 from dotenv import load_dotenv
-import logging
 
 # Загрузка переменных окружения
 load_dotenv()
@@ -9,23 +9,15 @@ load_dotenv()
 # Базовые пути
 BASE_DIR = Path(__file__).resolve().parent.parent
 LOGS_DIR = BASE_DIR / "logs"
+# Прогресс переносов (снимки и журналы); относительный путь - от каталога проекта
+DATA_DIR = BASE_DIR / os.getenv("DATA_DIR", "data")
 
 # Создание директории для логов, если она не существует
 LOGS_DIR.mkdir(exist_ok=True)
 
-# Проверка наличия .env в .gitignore
-gitignore_path = BASE_DIR / ".gitignore"
-if gitignore_path.exists():
-    with open(gitignore_path, 'r') as f:
-        if '.env' not in f.read():
-            logging.warning(
-                "ВНИМАНИЕ: .env файл не добавлен в .gitignore! "
-                "Это может привести к утечке конфиденциальных данных."
-            )
-
 # Настройки API Notion
 NOTION_API_VERSION = "2022-06-28"
-NOTION_BASE_URL = "https://api.notion.com/v1"
+NOTION_BASE_URL = os.getenv("NOTION_BASE_URL", "https://api.notion.com/v1")
 
 # Токены и ID баз данных с проверкой формата
 ORIGIN_NOTION_TOKEN = os.getenv("ORIGIN_NOTION_TOKEN")
@@ -47,25 +39,118 @@ def validate_database_id(db_id: str) -> bool:
         return False
     return len(db_id) > 30  # Примерная длина ID базы данных Notion
 
-# Валидация конфиденциальных данных
-if not all(validate_token(token) for token in [ORIGIN_NOTION_TOKEN, DEST_NOTION_TOKEN]):
-    logging.warning(
-        "ВНИМАНИЕ: Формат токенов не соответствует ожидаемому! "
-        "Убедитесь, что вы используете правильные токены Notion."
-    )
+def check_environment(transfer: bool = False) -> List[str]:
+    """
+    Проверка окружения: .env в .gitignore и (для переноса из переменных
+    окружения) формат токенов и ID баз
+
+    Выполняется явно при запуске, а не при импорте настроек, чтобы не
+    замедлять холодный старт.
 
-if not all(validate_database_id(db_id) for db_id in [ORIGIN_DATABASE_ID, DEST_DATABASE_ID]):
-    logging.warning(
-        "ВНИМАНИЕ: Формат ID баз данных не соответствует ожидаемому! "
-        "Убедитесь, что вы используете правильные ID."
-    )
+    Args:
+        transfer: Проверять ORIGIN_*/DEST_* переменные переноса
+
+    Returns:
+        List[str]: Предупреждения для вывода в лог
+    """
+    warnings = []
+    gitignore_path = BASE_DIR / ".gitignore"
+    if gitignore_path.exists():
+        with open(gitignore_path, 'r') as f:
+            if '.env' not in f.read():
+                warnings.append(
+                    "ВНИМАНИЕ: .env файл не добавлен в .gitignore! "
+                    "Это может привести к утечке конфиденциальных данных."
+                )
+    if transfer:
+        if not all(validate_token(token) for token in [ORIGIN_NOTION_TOKEN, DEST_NOTION_TOKEN]):
+            warnings.append(
+                "ВНИМАНИЕ: Формат токенов не соответствует ожидаемому! "
+                "Убедитесь, что вы используете правильные токены Notion."
+            )
+        if not all(validate_database_id(db_id) for db_id in [ORIGIN_DATABASE_ID, DEST_DATABASE_ID]):
+            warnings.append(
+                "ВНИМАНИЕ: Формат ID баз данных не соответствует ожидаемому! "
+                "Убедитесь, что вы используете правильные ID."
+            )
+    return warnings
 
 # Настройки повторных попыток
 MAX_RETRIES = 3
 RETRY_DELAY = 1  # в секундах
 RATE_LIMIT_DELAY = 5  # в секундах
 
+# Ограничение частоты запросов к Notion (на один токен интеграции)
+NOTION_RATE_LIMIT = float(os.getenv("NOTION_RATE_LIMIT", "3"))  # запросов в секунду
+NOTION_RATE_BURST = float(os.getenv("NOTION_RATE_BURST", "3"))  # размер корзины токенов
+NOTION_RATE_MIN = 0.5  # нижняя граница скорости после 429, запросов в секунду
+NOTION_RATE_RECOVERY = 0.05  # восстановление скорости, запросов в секунду за секунду
+NOTION_RATE_BACKOFF = 0.5  # множитель скорости при ответе 429
+
+# Кэш описаний баз и пользователя интеграции (общий для диалога и переносов)
+NOTION_CACHE_TTL = float(os.getenv("NOTION_CACHE_TTL", "300"))  # в секундах
+NOTION_CACHE_SIZE = 256  # максимум записей
+
+# Предварительная проверка переноса (после ввода ID баз)
+DRY_RUN_MAX_PAGES = int(os.getenv("DRY_RUN_MAX_PAGES", "2000"))  # максимум страниц для подсчета
+DRY_RUN_SAMPLE_PAGES = 5  # страниц для оценки объема содержимого
+
+# Настройки переноса
+PAGE_SIZE = 100  # максимальный размер страницы выдачи API Notion
+APPEND_BATCH_SIZE = 100  # максимум блоков в одном запросе добавления
+COPY_PAGE_CONTENT = os.getenv("COPY_PAGE_CONTENT", "true").lower() == "true"  # переносить содержимое страниц
+# Свойство целевой базы с ID исходной страницы (пустое значение отключает метку)
+SOURCE_ID_PROPERTY = os.getenv("SOURCE_ID_PROPERTY", "Notion Source ID")
+# Проверять каждую страницу из ответа API моделью pydantic (для отладки, замедляет перенос)
+VALIDATE_PAGES = os.getenv("VALIDATE_PAGES", "false").lower() == "true"
+TRANSFER_CONCURRENCY = int(os.getenv("TRANSFER_CONCURRENCY", "4"))  # размер пула записи страниц
+READ_SHARDS = int(os.getenv("READ_SHARDS", "1"))  # диапазонов created_time, читаемых параллельно
+JOURNAL_FSYNC_EVERY = 100  # записей журнала прогресса между fsync
+JOURNAL_COMPACT_EVERY = 1000  # минимум записей журнала между перезаписью снимка
+
+# Сообщение о ходе переноса
+PROGRESS_UPDATE_INTERVAL = float(os.getenv("PROGRESS_UPDATE_INTERVAL", "5"))  # секунд между правками сообщения
+PROGRESS_EMA_ALPHA = 0.3  # вес нового замера скорости в скользящем среднем
+
+# Ограничения фоновых переносов
+MAX_ACTIVE_JOBS = int(os.getenv("MAX_ACTIVE_JOBS", "10"))  # переносов одновременно на весь бот
+MAX_JOBS_PER_USER = int(os.getenv("MAX_JOBS_PER_USER", "1"))  # переносов одновременно на пользователя
+
+# Хранилище состояния бота (диалоги, данные пользователей, фоновые переносы)
+# Относительный путь отсчитывается от каталога проекта, а не от текущего каталога
+STATE_DB_PATH = BASE_DIR / os.getenv("STATE_DB_PATH", "bot_state.sqlite3")
+# Ключ Fernet для шифрования токенов в хранилище (без ключа токены не сохраняются)
+STATE_ENCRYPTION_KEY = os.getenv("STATE_ENCRYPTION_KEY")
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv("PERSISTENCE_UPDATE_INTERVAL", "5"))  # секунд между записями
+JOB_HEARTBEAT_INTERVAL = 30  # секунд между отметками о выполнении переносов
+JOB_LEASE_TIMEOUT = 90  # через сколько секунд без отметки перенос подхватывает другой экземпляр
+
+# Настройки приема обновлений через вебхук
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "8"))  # обработчиков очереди (шардов по чатам)
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))  # максимум ожидающих обновлений
+UPDATE_DEDUPE_SIZE = 10000  # последних update_id для отбрасывания повторной доставки
+
+# Метрики
+LOOP_LAG_INTERVAL = 1.0  # секунд между замерами задержки цикла событий
+
+# Трассировка этапов переноса (экспорт в коллектор OpenTelemetry по OTLP/HTTP, если задан адрес)
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")  # например, http://localhost:4318
+TRACE_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "notion-transfer-bot")
+TRACE_MAX_SPANS = 50000  # максимум участков одного переноса для экспорта
+
+# Настройки Telegram
+# Адрес Bot API (для собственного сервера Bot API или локальной замены в бенчмарках)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
+# Настройки HTTP-клиента
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))  # максимум соединений в пуле
+HTTP_KEEPALIVE_TIMEOUT = 30  # в секундах
+HTTP_REQUEST_TIMEOUT = 60  # в секундах
+
 # Настройки логирования
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 LOG_FILE = LOGS_DIR / "notion_transfer.log"
-LOG_LEVEL = "INFO" 
\ No newline at end of file
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_JSON = os.getenv("LOG_JSON", "false").lower() == "true"  # структурированные логи (JSON по строке)
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # размер файла лога до ротации
+LOG_BACKUP_COUNT = 5  # сколько старых файлов лога хранить
\ No newline at end of file
@@ -1,20 +1,76 @@
+import asyncio
 import time
-from typing import Dict, Any, Optional
-import requests
+from typing import Dict, Any, Optional, List, Sequence, Tuple, AsyncIterator
+import aiohttp
 from config.settings import (
     NOTION_API_VERSION,
     NOTION_BASE_URL,
     MAX_RETRIES,
     RETRY_DELAY,
-    RATE_LIMIT_DELAY
+    RATE_LIMIT_DELAY,
+    HTTP_POOL_SIZE,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_REQUEST_TIMEOUT,
+    PAGE_SIZE,
+    NOTION_CACHE_SIZE,
+    NOTION_CACHE_TTL
 )
+from notion.ratelimit import get_rate_limiter
+from utils.cache import TTLCache
+from utils.helpers import token_fingerprint
+from utils.metrics import NOTION_REQUEST_SECONDS, NOTION_RATE_LIMITED, NOTION_RETRIES, endpoint_label
+from utils.tracing import span
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Общая для всего процесса HTTP-сессия с пулом keep-alive соединений
+_session: Optional[aiohttp.ClientSession] = None
+
+# ID свойства-заголовка одинаков во всех базах: запрос только его дает самый легкий ответ
+TITLE_PROPERTY_ID = "title"
+# Поля страниц, которые остаются в результатах при чтении только ID
+PAGE_ID_FIELDS = ("id", "created_time", "last_edited_time")
+
+# Общий кэш описаний баз и пользователя интеграции: ключ (отпечаток токена, ресурс)
+_metadata_cache = TTLCache(NOTION_CACHE_SIZE, NOTION_CACHE_TTL, name="metadata")
+
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Получение общей HTTP-сессии процесса
+
+    Сессия создается лениво внутри работающего цикла событий и переиспользуется
+    всеми экземплярами NotionAPI, поэтому TCP+TLS соединения с Notion
+    не устанавливаются заново для каждого запроса.
+
+    Returns:
+        aiohttp.ClientSession: Общая сессия
+    """
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_REQUEST_TIMEOUT)
+        )
+    return _session
+
+
+async def close_session() -> None:
+    """Закрытие общей HTTP-сессии (вызывается при остановке приложения)"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
 class NotionAPI:
-    """Класс для работы с API Notion"""
-    
+    """Асинхронный клиент API Notion"""
+
     def __init__(self, token: str):
         self.token = token
         self.headers = {
@@ -22,8 +78,10 @@ class NotionAPI:
             "Content-Type": "application/json",
             "Notion-Version": NOTION_API_VERSION
         }
-    
-    def _make_request(
+        self.rate_limiter = get_rate_limiter(token)
+        self.fingerprint = token_fingerprint(token)
+
+    async def _make_request(
         self,
         method: str,
         endpoint: str,
@@ -32,74 +90,365 @@ class NotionAPI:
     ) -> Dict[str, Any]:
         """
         Выполнение запроса к API с обработкой ошибок и повторными попытками
-        
+
         Args:
             method: HTTP метод
             endpoint: Endpoint API
             data: Данные для отправки
             params: Параметры запроса
-            
+
         Returns:
             Dict[str, Any]: Ответ от API
         """
         url = f"{NOTION_BASE_URL}/{endpoint}"
+        label = endpoint_label(endpoint.partition("?")[0])
         retries = 0
-        
+
         while retries < MAX_RETRIES:
+            with span("notion.ratelimit_wait"):
+                await self.rate_limiter.acquire()
+            started = time.perf_counter()
+            status = "error"
             try:
-                response = requests.request(
-                    method=method,
-                    url=url,
-                    headers=self.headers,
-                    json=data,
-                    params=params
+                with span("notion.request", method=method, endpoint=label) as request_span:
+                    async with get_session().request(
+                        method,
+                        url,
+                        headers=self.headers,
+                        json=data,
+                        params=params
+                    ) as response:
+                        status = str(response.status)
+                        request_span.set_attribute("http.status_code", response.status)
+                        if response.status == 429:  # Rate limit
+                            # Пауза применяется в общем лимитере токена, а не только к этому запросу
+                            wait_time = float(response.headers.get("Retry-After", RATE_LIMIT_DELAY))
+                            self.rate_limiter.on_rate_limited(wait_time)
+                            NOTION_RATE_LIMITED.inc()
+                            NOTION_RETRIES.inc(reason="rate_limit")
+                            retries += 1
+                            continue
+
+                        response.raise_for_status()
+                        return await response.json()
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            finally:
+                # Пауза перед повтором в задержку запроса не входит
+                NOTION_REQUEST_SECONDS.observe(
+                    time.perf_counter() - started, method=method, endpoint=label, status=status
                 )
-                
-                if response.status_code == 429:  # Rate limit
-                    wait_time = int(response.headers.get("Retry-After", RATE_LIMIT_DELAY))
-                    logger.warning(f"Rate limit hit. Waiting {wait_time} seconds...")
-                    time.sleep(wait_time)
-                    retries += 1
-                    continue
-                
-                response.raise_for_status()
-                return response.json()
-                
-            except requests.exceptions.RequestException as e:
-                logger.error(f"API request failed: {str(e)}")
-                if retries < MAX_RETRIES - 1:
-                    retries += 1
-                    time.sleep(RETRY_DELAY)
-                    continue
-                raise
-    
-    def query_database(
+
+            logger.error(f"API request failed: {str(error)}")
+            if isinstance(error, aiohttp.ClientResponseError) and error.status < 500 and error.status != 409:
+                # Неверный запрос, токен или нет доступа: повтор даст тот же ответ
+                raise error
+            if retries < MAX_RETRIES - 1:
+                NOTION_RETRIES.inc(reason="error")
+                retries += 1
+                await asyncio.sleep(RETRY_DELAY)
+                continue
+            raise error
+
+        raise aiohttp.ClientError(f"Rate limit retries exhausted for {endpoint}")
+
+    async def query_database(
         self,
         database_id: str,
-        start_cursor: Optional[str] = None
+        start_cursor: Optional[str] = None,
+        page_size: int = PAGE_SIZE,
+        query_filter: Optional[Dict[str, Any]] = None,
+        sorts: Optional[List[Dict[str, Any]]] = None,
+        filter_properties: Optional[Sequence[str]] = None,
+        fields: Optional[Sequence[str]] = None,
+        ids_only: bool = False
     ) -> Dict[str, Any]:
         """
         Получение данных из базы данных
-        
+
         Args:
             database_id: ID базы данных
             start_cursor: Курсор для пагинации
-            
+            page_size: Количество страниц в ответе (максимум 100)
+            query_filter: Фильтр запроса в формате API
+            sorts: Сортировка в формате API
+            filter_properties: ID свойств, которые API вернет в страницах
+                (None - все свойства)
+            fields: Поля страниц, которые остаются в результатах после ответа
+                (None - все поля)
+            ids_only: Только ID и время создания/изменения страниц: API
+                возвращает одно свойство-заголовок, а в результатах остаются
+                поля PAGE_ID_FIELDS
+
         Returns:
             Dict[str, Any]: Результаты запроса
         """
+        if ids_only:
+            filter_properties = [TITLE_PROPERTY_ID]
+            fields = fields or PAGE_ID_FIELDS
         endpoint = f"databases/{database_id}/query"
-        data = {"start_cursor": start_cursor} if start_cursor else {}
-        return self._make_request("POST", endpoint, data=data)
-    
-    def create_page(self, page_data: Dict[str, Any]) -> Dict[str, Any]:
+        if filter_properties:
+            # ID свойств в ответах API уже закодированы для URL, поэтому строка запроса собирается как есть
+            endpoint += "?" + "&".join(f"filter_properties={prop_id}" for prop_id in filter_properties)
+        data: Dict[str, Any] = {"page_size": page_size}
+        if start_cursor:
+            data["start_cursor"] = start_cursor
+        if query_filter:
+            data["filter"] = query_filter
+        if sorts:
+            data["sorts"] = sorts
+        response = await self._make_request("POST", endpoint, data=data)
+        if fields:
+            response["results"] = [
+                {field: page[field] for field in fields if field in page}
+                for page in response.get("results", [])
+            ]
+        return response
+
+    async def iter_database_batches(
+        self,
+        database_id: str,
+        start_cursor: Optional[str] = None,
+        page_size: int = PAGE_SIZE,
+        query_filter: Optional[Dict[str, Any]] = None,
+        sorts: Optional[List[Dict[str, Any]]] = None,
+        filter_properties: Optional[Sequence[str]] = None,
+        fields: Optional[Sequence[str]] = None,
+        ids_only: bool = False
+    ) -> AsyncIterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """
+        Потоковое чтение всех страниц базы данных пачками
+
+        Запрос следующей пачки отправляется сразу после получения текущей,
+        поэтому чтение идет параллельно с обработкой пачки вызывающим кодом.
+
+        Args:
+            database_id: ID базы данных
+            start_cursor: Курсор, с которого начинается чтение
+            page_size: Размер пачки
+            query_filter: Фильтр запроса в формате API
+            sorts: Сортировка в формате API
+            filter_properties: ID возвращаемых свойств (см. query_database)
+            fields: Поля страниц в результатах (см. query_database)
+            ids_only: Только ID и время страниц (см. query_database)
+
+        Yields:
+            Tuple[List[Dict[str, Any]], Optional[str]]: Страницы пачки и курсор
+            следующей пачки (None для последней)
+        """
+        def query(cursor: Optional[str]) -> asyncio.Future:
+            return asyncio.ensure_future(self.query_database(
+                database_id, cursor, page_size, query_filter, sorts,
+                filter_properties=filter_properties, fields=fields, ids_only=ids_only
+            ))
+
+        pending = query(start_cursor)
+        try:
+            while pending is not None:
+                with span("read"):
+                    response = await pending
+                next_cursor = response.get("next_cursor") if response.get("has_more") else None
+                pending = query(next_cursor) if next_cursor else None
+                yield response.get("results", []), next_cursor
+        finally:
+            if pending is not None:
+                if not pending.done():
+                    pending.cancel()
+                elif not pending.cancelled():
+                    pending.exception()  # ошибка предвыборки уже не нужна
+
+    async def retrieve_database(self, database_id: str, fresh: bool = False) -> Dict[str, Any]:
+        """
+        Получение описания базы данных (название и схема свойств)
+
+        Описание кэшируется на NOTION_CACHE_TTL, поэтому проверка доступа
+        в диалоге и чтение схемы переносом стоят одного запроса.
+
+        Args:
+            database_id: ID базы данных
+            fresh: Запросить описание заново, минуя кэш
+
+        Returns:
+            Dict[str, Any]: Объект базы данных
+        """
+        endpoint = f"databases/{database_id}"
+        key = (self.fingerprint, endpoint)
+        if fresh:
+            _metadata_cache.invalidate(key)
+        return await _metadata_cache.get_or_load(key, lambda: self._make_request("GET", endpoint))
+
+    async def get_me(self) -> Dict[str, Any]:
+        """
+        Получение пользователя-бота интеграции (проверка токена, название интеграции)
+
+        Returns:
+            Dict[str, Any]: Объект пользователя
+        """
+        return await _metadata_cache.get_or_load(
+            (self.fingerprint, "users/me"),
+            lambda: self._make_request("GET", "users/me")
+        )
+
+    async def update_database(self, database_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Изменение базы данных (например, добавление свойств)
+
+        Args:
+            database_id: ID базы данных
+            data: Изменяемые поля
+
+        Returns:
+            Dict[str, Any]: Обновленный объект базы данных
+        """
+        endpoint = f"databases/{database_id}"
+        result = await self._make_request("PATCH", endpoint, data=data)
+        # Схема изменилась: следующее чтение описания должно получить новую
+        _metadata_cache.invalidate((self.fingerprint, endpoint))
+        return result
+
+    async def create_page(self, page_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Создание новой страницы
-        
+
         Args:
             page_data: Данные страницы
-            
+
         Returns:
             Dict[str, Any]: Созданная страница
         """
-        return self._make_request("POST", "pages", data=page_data) 
\ No newline at end of file
+        return await self._make_request("POST", "pages", data=page_data)
+
+    async def get_block_children(
+        self,
+        block_id: str,
+        start_cursor: Optional[str] = None,
+        page_size: int = PAGE_SIZE
+    ) -> Dict[str, Any]:
+        """
+        Получение одной страницы выдачи дочерних блоков
+
+        Args:
+            block_id: ID блока или страницы
+            start_cursor: Курсор для пагинации
+            page_size: Количество блоков в ответе (максимум 100)
+
+        Returns:
+            Dict[str, Any]: Результаты запроса
+        """
+        params: Dict[str, Any] = {"page_size": page_size}
+        if start_cursor:
+            params["start_cursor"] = start_cursor
+        return await self._make_request("GET", f"blocks/{block_id}/children", params=params)
+
+    async def iter_block_children(self, block_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Потоковое чтение всех дочерних блоков первого уровня
+
+        Args:
+            block_id: ID блока или страницы
+
+        Yields:
+            Dict[str, Any]: Дочерний блок
+        """
+        cursor = None
+        while True:
+            response = await self.get_block_children(block_id, cursor)
+            for block in response.get("results", []):
+                yield block
+            if not response.get("has_more"):
+                break
+            cursor = response.get("next_cursor")
+
+    async def append_block_children(
+        self,
+        block_id: str,
+        children: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Добавление дочерних блоков (не более 100 за запрос)
+
+        Args:
+            block_id: ID блока или страницы
+            children: Добавляемые блоки
+
+        Returns:
+            Dict[str, Any]: Созданные блоки первого уровня
+        """
+        return await self._make_request(
+            "PATCH",
+            f"blocks/{block_id}/children",
+            data={"children": children}
+        )
+
+    async def delete_block(self, block_id: str) -> Dict[str, Any]:
+        """
+        Удаление (перемещение в корзину) блока
+
+        Args:
+            block_id: ID блока
+
+        Returns:
+            Dict[str, Any]: Удаленный блок
+        """
+        return await self._make_request("DELETE", f"blocks/{block_id}")
+
+    async def update_page(self, page_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Изменение свойств страницы
+
+        Args:
+            page_id: ID страницы
+            data: Изменяемые поля (например, properties)
+
+        Returns:
+            Dict[str, Any]: Обновленная страница
+        """
+        return await self._make_request("PATCH", f"pages/{page_id}", data=data)
+
+    async def get_page_property(
+        self,
+        page_id: str,
+        property_id: str,
+        start_cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Получение значения свойства страницы (для relation, people и т.п. - постранично)
+
+        Args:
+            page_id: ID страницы
+            property_id: ID свойства
+            start_cursor: Курсор для пагинации
+
+        Returns:
+            Dict[str, Any]: Элемент свойства или страница списка элементов
+        """
+        params = {"start_cursor": start_cursor} if start_cursor else None
+        return await self._make_request(
+            "GET",
+            f"pages/{page_id}/properties/{property_id}",
+            params=params
+        )
+
+    async def iter_page_property(self, page_id: str, property_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Потоковое чтение всех элементов списочного свойства страницы
+
+        Ответ запроса базы содержит не более 25 элементов relation, полный
+        список доступен только через этот эндпоинт.
+
+        Args:
+            page_id: ID страницы
+            property_id: ID свойства
+
+        Yields:
+            Dict[str, Any]: Элемент свойства (property_item)
+        """
+        cursor = None
+        while True:
+            response = await self.get_page_property(page_id, property_id, cursor)
+            for item in response.get("results", []):
+                yield item
+            if not response.get("has_more"):
+                break
+            cursor = response.get("next_cursor")
@@ -0,0 +1,181 @@
+import asyncio
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from config.settings import APPEND_BATCH_SIZE
+from notion.api import NotionAPI
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Блоки, которые API не позволяет создать копированием
+UNSUPPORTED_BLOCK_TYPES = {"child_page", "child_database", "link_preview", "unsupported"}
+
+# Блоки, которые создаются только вместе со своими дочерними блоками
+INLINE_CHILDREN_TYPES = {"table", "column_list", "column"}
+
+
+class BlockNode(NamedTuple):
+    """Блок исходной страницы, подготовленный к созданию, с дочерними блоками"""
+    type: str
+    data: Dict[str, Any]
+    children: List["BlockNode"]
+
+
+def _copyable(block: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Подготовка содержимого блока к созданию
+
+    Args:
+        block: Блок из ответа API
+
+    Returns:
+        Optional[Tuple[str, Dict[str, Any]]]: Тип и данные блока или None,
+        если блок нельзя скопировать
+    """
+    block_type = block.get("type")
+    if not block_type or block_type in UNSUPPORTED_BLOCK_TYPES:
+        return None
+    data = dict(block.get(block_type) or {})
+    if block_type == "synced_block" and data.get("synced_from"):
+        # Ссылка на синхронизированный блок другой страницы
+        return None
+    if data.get("type") == "file":
+        # Файлы, загруженные в Notion, нельзя передать по временной ссылке
+        return None
+    return block_type, data
+
+
+def block_payload(node: BlockNode) -> Dict[str, Any]:
+    """
+    Тело блока для запроса создания
+
+    Args:
+        node: Узел дерева блоков
+
+    Returns:
+        Dict[str, Any]: Блок в формате API
+    """
+    data = node.data
+    if node.type in INLINE_CHILDREN_TYPES and node.children:
+        data = dict(data, children=[block_payload(child) for child in node.children])
+    return {"object": "block", "type": node.type, node.type: data}
+
+
+def needs_attach(node: BlockNode) -> bool:
+    """Есть ли у узла дочерние блоки, которые добавляются отдельными запросами"""
+    if node.type in INLINE_CHILDREN_TYPES:
+        return any(needs_attach(child) for child in node.children)
+    return bool(node.children)
+
+
+async def fetch_block_tree(api: NotionAPI, block_id: str) -> List[BlockNode]:
+    """
+    Рекурсивное чтение дерева блоков
+
+    Дочерние поддеревья одного уровня читаются параллельно.
+
+    Args:
+        api: Клиент API исходного аккаунта
+        block_id: ID страницы или блока
+
+    Returns:
+        List[BlockNode]: Дочерние блоки с вложенными поддеревьями
+    """
+    blocks = []
+    async for block in api.iter_block_children(block_id):
+        if copyable := _copyable(block):
+            blocks.append((block, copyable))
+
+    nested = [block["id"] for block, _ in blocks if block.get("has_children")]
+    subtrees = dict(zip(
+        nested,
+        await asyncio.gather(*(fetch_block_tree(api, child_id) for child_id in nested))
+    ))
+    return [
+        BlockNode(block_type, data, subtrees.get(block["id"], []))
+        for block, (block_type, data) in blocks
+    ]
+
+
+async def append_block_tree(api: NotionAPI, parent_id: str, nodes: List[BlockNode]) -> None:
+    """
+    Воссоздание дерева блоков в целевом аккаунте
+
+    Блоки одного родителя добавляются последовательно пачками по
+    APPEND_BATCH_SIZE, чтобы сохранить порядок; поддеревья созданных блоков
+    заполняются параллельно со следующими пачками.
+
+    Args:
+        api: Клиент API целевого аккаунта
+        parent_id: ID страницы или блока, в который добавляются блоки
+        nodes: Добавляемые блоки
+    """
+    tasks = []
+    try:
+        for start in range(0, len(nodes), APPEND_BATCH_SIZE):
+            batch = nodes[start:start + APPEND_BATCH_SIZE]
+            response = await api.append_block_children(
+                parent_id,
+                [block_payload(node) for node in batch]
+            )
+            tasks.append(asyncio.ensure_future(
+                _attach_children(api, response.get("results", []), batch)
+            ))
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _attach_children(
+    api: NotionAPI,
+    created: List[Dict[str, Any]],
+    nodes: List[BlockNode]
+) -> None:
+    """
+    Добавление дочерних блоков к только что созданным блокам
+
+    Args:
+        api: Клиент API целевого аккаунта
+        created: Созданные блоки из ответа API (в порядке nodes)
+        nodes: Исходные узлы
+    """
+    tasks = []
+    for block, node in zip(created, nodes):
+        if not needs_attach(node):
+            continue
+        if node.type in INLINE_CHILDREN_TYPES:
+            tasks.append(_attach_inline(api, block["id"], node))
+        else:
+            tasks.append(append_block_tree(api, block["id"], node.children))
+    await asyncio.gather(*tasks)
+
+
+async def _attach_inline(api: NotionAPI, block_id: str, node: BlockNode) -> None:
+    """
+    Дозаполнение блока, созданного вместе с дочерними блоками
+
+    API возвращает только блоки первого уровня, поэтому ID вложенных блоков
+    читаются из целевого аккаунта.
+
+    Args:
+        api: Клиент API целевого аккаунта
+        block_id: ID созданного блока
+        node: Исходный узел
+    """
+    created = [block async for block in api.iter_block_children(block_id)]
+    await _attach_children(api, created, node.children)
+
+
+async def clear_block_children(api: NotionAPI, block_id: str) -> None:
+    """
+    Удаление всех дочерних блоков страницы или блока
+
+    Вложенные блоки удаляются вместе с родителем, поэтому удаляется только
+    первый уровень.
+
+    Args:
+        api: Клиент API целевого аккаунта
+        block_id: ID страницы или блока
+    """
+    children = [block["id"] async for block in api.iter_block_children(block_id)]
+    await asyncio.gather(*(api.delete_block(child_id) for child_id in children))
@@ -1,28 +1,394 @@
-from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field
+import base64
+import itertools
+import sys
+import uuid
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional, Any, Set, Iterable, Iterator, Tuple
+from pydantic import BaseModel, ConfigDict, Field, field_validator, field_serializer
+from config.settings import VALIDATE_PAGES
+
+
+def normalize_id(notion_id: str) -> str:
+    """ID объекта Notion без дефисов в нижнем регистре: одна запись ID - одна строка"""
+    return notion_id.replace("-", "").lower()
+
+
+def page_id_to_int(page_id: str) -> int:
+    """Упаковка UUID страницы Notion (с дефисами или без) в 128-битное число"""
+    return int(page_id.replace("-", ""), 16)
+
+
+def int_to_page_id(value: int) -> str:
+    """Обратное преобразование числа в UUID страницы с дефисами"""
+    return str(uuid.UUID(int=value))
+
+
+class PageIdSet:
+    """
+    Компактное множество ID страниц Notion
+
+    ID хранятся 128-битными числами в двух отсортированных массивах по 8 байт
+    (старшая и младшая половины), то есть 16 байт на страницу вместо ~90 байт
+    строки UUID в списке. Новые ID сначала попадают в обычное множество и
+    периодически сливаются в массивы, поэтому добавление и проверка
+    недавних ID выполняются за O(1), остальных - бинарным поиском.
+    """
+
+    __slots__ = ("_hi", "_lo", "_recent")
+
+    def __init__(self, values: Iterable[int] = ()):
+        self._hi = array("Q")
+        self._lo = array("Q")
+        self._recent: Set[int] = set(values)
+        self._merge()
+
+    def _merge(self) -> None:
+        """Слияние недавно добавленных ID в отсортированные массивы"""
+        if not self._recent:
+            return
+        merged = sorted(
+            itertools.chain(((hi << 64) | lo for hi, lo in zip(self._hi, self._lo)), self._recent)
+        )
+        self._hi = array("Q", (value >> 64 for value in merged))
+        self._lo = array("Q", (value & _LOW_MASK for value in merged))
+        self._recent = set()
+
+    def add(self, value: int) -> None:
+        if value in self:
+            return
+        self._recent.add(value)
+        if len(self._recent) > max(_MERGE_MIN, len(self._hi) // 4):
+            self._merge()
+
+    def __contains__(self, value: int) -> bool:
+        if value in self._recent:
+            return True
+        hi, lo = value >> 64, value & _LOW_MASK
+        i = bisect_left(self._hi, hi)
+        while i < len(self._hi) and self._hi[i] == hi:
+            if self._lo[i] == lo:
+                return True
+            i += 1
+        return False
+
+    def __len__(self) -> int:
+        return len(self._hi) + len(self._recent)
+
+    def __iter__(self) -> Iterator[int]:
+        yield from ((hi << 64) | lo for hi, lo in zip(self._hi, self._lo))
+        yield from self._recent
+
+    def pack(self) -> str:
+        """
+        Сериализация в строку base64 (массивы старших и младших половин, little-endian)
+
+        Returns:
+            str: Упакованные ID
+        """
+        self._merge()
+        hi, lo = array("Q", self._hi), array("Q", self._lo)
+        if sys.byteorder == "big":
+            hi.byteswap()
+            lo.byteswap()
+        return base64.b64encode(hi.tobytes() + lo.tobytes()).decode("ascii")
+
+    @classmethod
+    def unpack(cls, packed: str) -> "PageIdSet":
+        """Обратное преобразование строки pack()"""
+        raw = base64.b64decode(packed)
+        half = len(raw) // 2
+        result = cls()
+        result._hi.frombytes(raw[:half])
+        result._lo.frombytes(raw[half:])
+        if sys.byteorder == "big":
+            result._hi.byteswap()
+            result._lo.byteswap()
+        return result
+
+
+class PageIdMap:
+    """
+    Компактное отображение ID исходных страниц в ID созданных страниц
+
+    Устроено так же, как PageIdSet: пары 128-битных ID хранятся в
+    отсортированных по ключу массивах (32 байта на страницу), недавние
+    пары - в обычном словаре.
+    """
+
+    __slots__ = ("_khi", "_klo", "_vhi", "_vlo", "_recent")
+
+    def __init__(self, items: Iterable[Tuple[int, int]] = ()):
+        self._khi = array("Q")
+        self._klo = array("Q")
+        self._vhi = array("Q")
+        self._vlo = array("Q")
+        self._recent: Dict[int, int] = dict(items)
+        self._merge()
+
+    def _merge(self) -> None:
+        """Слияние недавно добавленных пар в отсортированные массивы"""
+        if not self._recent:
+            return
+        merged = dict(self._items_sorted())
+        merged.update(self._recent)
+        keys = sorted(merged)
+        self._khi = array("Q", (key >> 64 for key in keys))
+        self._klo = array("Q", (key & _LOW_MASK for key in keys))
+        self._vhi = array("Q", (merged[key] >> 64 for key in keys))
+        self._vlo = array("Q", (merged[key] & _LOW_MASK for key in keys))
+        self._recent = {}
+
+    def _items_sorted(self) -> Iterator[Tuple[int, int]]:
+        for khi, klo, vhi, vlo in zip(self._khi, self._klo, self._vhi, self._vlo):
+            yield (khi << 64) | klo, (vhi << 64) | vlo
+
+    def _index(self, key: int) -> int:
+        """Индекс ключа в массивах или -1"""
+        hi, lo = key >> 64, key & _LOW_MASK
+        i = bisect_left(self._khi, hi)
+        while i < len(self._khi) and self._khi[i] == hi:
+            if self._klo[i] == lo:
+                return i
+            i += 1
+        return -1
+
+    def get(self, key: int) -> Optional[int]:
+        if key in self._recent:
+            return self._recent[key]
+        i = self._index(key)
+        if i < 0:
+            return None
+        return (self._vhi[i] << 64) | self._vlo[i]
+
+    def __setitem__(self, key: int, value: int) -> None:
+        i = self._index(key)
+        if i >= 0:
+            self._vhi[i], self._vlo[i] = value >> 64, value & _LOW_MASK
+            return
+        self._recent[key] = value
+        if len(self._recent) > max(_MERGE_MIN, len(self._khi) // 4):
+            self._merge()
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._recent or self._index(key) >= 0
+
+    def __len__(self) -> int:
+        return len(self._khi) + len(self._recent)
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        yield from self._items_sorted()
+        yield from self._recent.items()
+
+    def pack(self) -> str:
+        """Сериализация в строку base64 (четыре массива половин ID, little-endian)"""
+        self._merge()
+        parts = [array("Q", part) for part in (self._khi, self._klo, self._vhi, self._vlo)]
+        if sys.byteorder == "big":
+            for part in parts:
+                part.byteswap()
+        return base64.b64encode(b"".join(part.tobytes() for part in parts)).decode("ascii")
+
+    @classmethod
+    def unpack(cls, packed: str) -> "PageIdMap":
+        """Обратное преобразование строки pack()"""
+        raw = base64.b64decode(packed)
+        quarter = len(raw) // 4
+        result = cls()
+        for i, part in enumerate((result._khi, result._klo, result._vhi, result._vlo)):
+            part.frombytes(raw[i * quarter:(i + 1) * quarter])
+            if sys.byteorder == "big":
+                part.byteswap()
+        return result
+
+
+_LOW_MASK = (1 << 64) - 1
+_MERGE_MIN = 4096
+
 
 class NotionPage(BaseModel):
-    """Модель страницы Notion"""
+    """
+    Модель страницы Notion для проверки ответа API
+
+    В конвейере переноса используется только при VALIDATE_PAGES, страницы
+    передаются как PageRecord.
+    """
     id: str
     properties: Dict[str, Any]
     children: Optional[List[Dict[str, Any]]] = Field(default_factory=list)
 
+
+class PageRecord(NamedTuple):
+    """
+    Страница из ответа запроса базы внутри конвейера переноса
+
+    Хранит ссылки на данные ответа без копирования и проверки: свойства
+    читаются планом переноса и в записи не изменяются.
+    """
+    id: str
+    properties: Dict[str, Any]
+
+    @classmethod
+    def from_result(cls, result: Dict[str, Any], validate: bool = VALIDATE_PAGES) -> "PageRecord":
+        """
+        Запись страницы из результата запроса базы
+
+        Args:
+            result: Страница из ответа API
+            validate: Проверить страницу моделью NotionPage
+
+        Returns:
+            PageRecord: Запись страницы
+
+        Raises:
+            pydantic.ValidationError: Страница не прошла проверку (только при validate)
+        """
+        if validate:
+            page = NotionPage.model_validate(result)
+            return cls(page.id, page.properties)
+        return cls(result["id"], result["properties"])
+
+
 class TransferProgress(BaseModel):
     """Модель для отслеживания прогресса переноса"""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     total_pages: int = 0
-    transferred_pages: List[str] = Field(default_factory=list)
+    transferred_pages: PageIdSet = Field(default_factory=PageIdSet)
+    id_map: PageIdMap = Field(default_factory=PageIdMap)  # исходный ID -> ID созданной страницы
     failed_pages: Dict[str, str] = Field(default_factory=dict)
     current_cursor: Optional[str] = None
+    read_pages: int = 0  # страниц в полностью обработанных пачках до current_cursor
+    run_started_at: Optional[str] = None  # начало текущего (незавершенного) прохода, ISO 8601
+    sync_since: Optional[str] = None  # нижняя граница last_edited_time текущего прохода синхронизации
+    last_synced_at: Optional[str] = None  # начало последнего успешно завершенного прохода
+    phase: str = "pages"  # этап прохода: "pages" - создание страниц, "relations" - связи
+    # Страницы, созданные или обновленные после последнего успешного прохода (их связи нужно записать)
+    written_pages: PageIdSet = Field(default_factory=PageIdSet)
+    # Диапазоны created_time при параллельном чтении: after, before, cursor, read, done
+    shards: List[Dict[str, Any]] = Field(default_factory=list)
+
+    @field_validator("transferred_pages", "written_pages", mode="before")
+    @classmethod
+    def _unpack_transferred_pages(cls, value: Any) -> Any:
+        """Чтение упакованного набора ID или списка строк UUID из старых файлов прогресса"""
+        if isinstance(value, str):
+            return PageIdSet.unpack(value)
+        if isinstance(value, (list, tuple, set)):
+            return PageIdSet(page_id_to_int(item) if isinstance(item, str) else item for item in value)
+        return value
+
+    @field_validator("id_map", mode="before")
+    @classmethod
+    def _unpack_id_map(cls, value: Any) -> Any:
+        if isinstance(value, str):
+            return PageIdMap.unpack(value)
+        return value
+
+    @field_serializer("transferred_pages", "written_pages", "id_map")
+    def _pack_page_ids(self, value: Any) -> str:
+        return value.pack()
+
+    def add_transferred_page(self, page_id: str, dest_page_id: Optional[str] = None) -> None:
+        """
+        Добавление успешно перенесенной страницы
+
+        Args:
+            page_id: ID исходной страницы
+            dest_page_id: ID созданной страницы, если известен
+        """
+        source = page_id_to_int(page_id)
+        self.transferred_pages.add(source)
+        self.written_pages.add(source)
+        if dest_page_id:
+            self.id_map[source] = page_id_to_int(dest_page_id)
+        # Ошибка предыдущей попытки больше не актуальна
+        self.failed_pages.pop(page_id, None)
+
+    def add_created_page(self, page_id: str, dest_page_id: str) -> None:
+        """
+        Страница создана, но ее содержимое еще не перенесено целиком
 
-    def add_transferred_page(self, page_id: str) -> None:
-        """Добавление успешно перенесенной страницы"""
-        if page_id not in self.transferred_pages:
-            self.transferred_pages.append(page_id)
+        Соответствие ID сохраняется, чтобы при повторе дописать содержимое
+        в ту же страницу, а не создавать ее заново.
+        """
+        source = page_id_to_int(page_id)
+        self.id_map[source] = page_id_to_int(dest_page_id)
+        self.written_pages.add(source)
+
+    def is_written(self, page_id: str) -> bool:
+        """Создана или обновлена ли страница после последнего успешного прохода"""
+        return page_id_to_int(page_id) in self.written_pages
+
+    def dest_page_id(self, page_id: str) -> Optional[str]:
+        """ID созданной страницы для исходной или None"""
+        dest = self.id_map.get(page_id_to_int(page_id))
+        return int_to_page_id(dest) if dest is not None else None
+
+    def is_transferred(self, page_id: str) -> bool:
+        """Проверка, перенесена ли страница"""
+        return page_id_to_int(page_id) in self.transferred_pages
 
     def add_failed_page(self, page_id: str, error: str) -> None:
         """Добавление страницы с ошибкой"""
         self.failed_pages[page_id] = error
 
+    def apply_record(self, record: Dict[str, Any]) -> None:
+        """
+        Применение записи журнала прогресса
+
+        Args:
+            record: Запись журнала (см. utils.journal.ProgressJournal)
+        """
+        op = record.get("op")
+        if op == "ok":
+            self.add_transferred_page(record["id"], record.get("dest"))
+        elif op == "created":
+            self.add_created_page(record["id"], record["dest"])
+        elif op == "updated":
+            self.written_pages.add(page_id_to_int(record["id"]))
+        elif op == "linked":
+            # Связи страницы записаны после ошибки в предыдущем проходе
+            self.failed_pages.pop(record["id"], None)
+        elif op == "fail":
+            self.add_failed_page(record["id"], record.get("error", ""))
+        elif op == "batch":
+            shard = record.get("shard")
+            if shard is None:
+                self.current_cursor = record.get("cursor")
+                self.read_pages = record.get("read", self.read_pages)
+            elif shard < len(self.shards):
+                # Записи о диапазонах, которых нет в снимке, пропускаются: они остались
+                # от прежнего разбиения (сбой между записью снимка и очисткой журнала),
+                # а следующие за ними записи run/phase/shards все равно заменяют разбиение
+                state = self.shards[shard]
+                state["cursor"] = record.get("cursor")
+                state["read"] = record.get("read", state["read"])
+                state["done"] = state["cursor"] is None
+                self.read_pages = sum(item["read"] for item in self.shards)
+        elif op == "shards":
+            self.shards = [dict(shard) for shard in record["shards"]]
+        elif op == "run":
+            self.run_started_at = record.get("started")
+            self.sync_since = record.get("since")
+            self.shards = []
+        elif op == "phase":
+            # Каждый этап читает исходную базу с начала
+            self.phase = record["phase"]
+            self.current_cursor = None
+            self.read_pages = 0
+            self.shards = []
+        elif op == "synced":
+            self.last_synced_at = record.get("at")
+            self.written_pages = PageIdSet()
+            self.run_started_at = None
+            self.sync_since = None
+
+    @property
+    def in_pass(self) -> bool:
+        """Начат ли и не завершен ли проход чтения исходной базы"""
+        return self.current_cursor is not None or any(not shard["done"] for shard in self.shards)
+
     @property
     def progress_percentage(self) -> float:
         """Процент выполнения"""
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import math
+from contextlib import aclosing
+from typing import Any, Awaitable, Dict, List, NamedTuple, Optional, Tuple
+import aiohttp
+from config.settings import DRY_RUN_MAX_PAGES, DRY_RUN_SAMPLE_PAGES, PAGE_SIZE
+from notion.blocks import BlockNode, fetch_block_tree
+from notion.models import normalize_id
+from notion.transfer import NotionTransfer
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class PreflightError(Exception):
+    """
+    Перенос заведомо завершится ошибкой, запускать его не нужно
+
+    Attributes:
+        reason: "access" (нет доступа к базе), "empty" (в исходной базе нет
+            страниц) или "same_database" (исходная и целевая база совпадают)
+        side: "origin" или "dest" для ошибок доступа
+        status: HTTP-статус ответа API для ошибок доступа
+    """
+
+    def __init__(self, reason: str, side: Optional[str] = None, status: Optional[int] = None):
+        super().__init__(reason if side is None else f"{reason} ({side}, HTTP {status})")
+        self.reason = reason
+        self.side = side
+        self.status = status
+
+
+class DryRunReport(NamedTuple):
+    """Оценка переноса до запуска"""
+    pages: int
+    capped: bool  # страниц больше DRY_RUN_MAX_PAGES, pages - нижняя граница
+    sampled: int  # страниц, по которым оценено содержимое
+    blocks_per_page: float
+    content_bytes_per_page: float
+    read_requests: int
+    write_requests: int
+    eta_seconds: float
+    dropped: List[str]  # свойства, которые не переносятся
+
+    @property
+    def requests(self) -> int:
+        return self.read_requests + self.write_requests
+
+
+async def dry_run(
+    transfer: NotionTransfer,
+    max_pages: int = DRY_RUN_MAX_PAGES,
+    sample_pages: int = DRY_RUN_SAMPLE_PAGES
+) -> DryRunReport:
+    """
+    Предварительная проверка переноса без записи в целевую базу
+
+    Доступ к обеим базам проверяется параллельно (описания баз берутся из
+    кэша NotionAPI), затем исходная база читается облегченными запросами
+    (только ID) не дальше max_pages страниц, а объем содержимого
+    оценивается по нескольким страницам, равномерно выбранным из прочитанных.
+    Число запросов и время - оценка сверху при текущей скорости лимитеров.
+
+    Args:
+        transfer: Подготовленный (не запущенный) перенос
+        max_pages: Максимум страниц, которые читаются для подсчета
+        sample_pages: Сколько страниц прочитать целиком для оценки содержимого
+
+    Returns:
+        DryRunReport: Оценка переноса
+
+    Raises:
+        PreflightError: Перенос заведомо завершится ошибкой
+    """
+    if (
+        transfer.origin_api.fingerprint == transfer.dest_api.fingerprint
+        and normalize_id(transfer.origin_db) == normalize_id(transfer.dest_db)
+    ):
+        raise PreflightError("same_database")
+
+    origin, dest = await asyncio.gather(
+        _check_access(transfer.origin_api.retrieve_database(transfer.origin_db), "origin"),
+        _check_access(transfer.dest_api.retrieve_database(transfer.dest_db), "dest")
+    )
+    plan = transfer.build_plan(origin, dest)
+
+    page_ids: List[str] = []
+    capped = False
+    # aclosing отменяет предвыборку следующей пачки при выходе по лимиту
+    async with aclosing(transfer.origin_api.iter_database_batches(transfer.origin_db, ids_only=True)) as batches:
+        async for results, next_cursor in batches:
+            page_ids.extend(result["id"] for result in results)
+            if next_cursor and len(page_ids) >= max_pages:
+                capped = True
+                break
+    if not page_ids:
+        raise PreflightError("empty")
+    pages = len(page_ids)
+
+    blocks_per_page = 0.0
+    content_bytes = 0.0
+    content_requests = 0.0
+    sample: List[str] = []
+    if transfer.copy_content and sample_pages > 0:
+        step = pages / min(sample_pages, pages)
+        sample = [page_ids[int(i * step)] for i in range(min(sample_pages, pages))]
+        trees = await asyncio.gather(*(fetch_block_tree(transfer.origin_api, page_id) for page_id in sample))
+        stats = [_tree_stats(tree) for tree in trees]
+        blocks_per_page = sum(blocks for blocks, _, _ in stats) / len(stats)
+        content_bytes = sum(size for _, size, _ in stats) / len(stats)
+        content_requests = sum(requests for _, _, requests in stats) / len(stats)
+
+    # Чтение: пачки запроса базы и дерево блоков каждой страницы; запись:
+    # создание страницы и примерно столько же запросов добавления блоков
+    queries = math.ceil(pages / PAGE_SIZE)
+    read_requests = queries + math.ceil(pages * content_requests)
+    write_requests = pages + math.ceil(pages * max(content_requests - 1, 0))
+    if plan.relations:
+        # Второй проход: чтение страниц со связями и запись связей (не больше числа страниц)
+        read_requests += queries
+        write_requests += pages
+
+    origin_rate = transfer.origin_api.rate_limiter.rate
+    dest_rate = transfer.dest_api.rate_limiter.rate
+    if transfer.origin_api.rate_limiter is transfer.dest_api.rate_limiter:
+        eta = (read_requests + write_requests) / origin_rate
+    else:
+        eta = max(read_requests / origin_rate, write_requests / dest_rate)
+
+    logger.info(
+        f"Предварительная проверка {transfer.origin_db} -> {transfer.dest_db}: "
+        f"{'>' if capped else ''}{pages} страниц, ~{read_requests + write_requests} запросов, ~{eta:.0f} с"
+    )
+    return DryRunReport(
+        pages=pages,
+        capped=capped,
+        sampled=len(sample),
+        blocks_per_page=blocks_per_page,
+        content_bytes_per_page=content_bytes,
+        read_requests=read_requests,
+        write_requests=write_requests,
+        eta_seconds=eta,
+        dropped=sorted(plan.dropped)
+    )
+
+
+async def _check_access(request: Awaitable[Dict[str, Any]], side: str) -> Dict[str, Any]:
+    """Результат запроса описания базы; ошибка клиента означает, что доступа нет"""
+    try:
+        return await request
+    except aiohttp.ClientResponseError as e:
+        if e.status in (400, 401, 403, 404):
+            raise PreflightError("access", side, e.status) from e
+        raise
+
+
+def _tree_stats(nodes: List[BlockNode]) -> Tuple[int, int, int]:
+    """
+    Блоков в дереве, их размер в байтах и число запросов чтения дерева
+
+    Каждый уровень с дочерними блоками читается отдельными запросами
+    по PAGE_SIZE блоков.
+    """
+    blocks = len(nodes)
+    size = 0
+    requests = max(1, math.ceil(len(nodes) / PAGE_SIZE))
+    for node in nodes:
+        size += len(json.dumps(node.data, ensure_ascii=False).encode("utf-8"))
+        if node.children:
+            child_blocks, child_size, child_requests = _tree_stats(node.children)
+            blocks += child_blocks
+            size += child_size
+            requests += child_requests
+    return blocks, size, requests
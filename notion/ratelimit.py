@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import Dict
+from config.settings import (
+    NOTION_RATE_LIMIT,
+    NOTION_RATE_BURST,
+    NOTION_RATE_MIN,
+    NOTION_RATE_RECOVERY,
+    NOTION_RATE_BACKOFF
+)
+from utils.helpers import token_fingerprint
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class TokenBucket:
+    """
+    Асинхронный token bucket с адаптивной скоростью
+
+    Каждый запрос забирает один токен. Ответ 429 уменьшает скорость
+    пополнения в NOTION_RATE_BACKOFF раз и приостанавливает выдачу токенов
+    на Retry-After секунд, после чего скорость линейно восстанавливается
+    до исходной.
+    """
+
+    def __init__(
+        self,
+        rate: float = NOTION_RATE_LIMIT,
+        capacity: float = NOTION_RATE_BURST,
+        min_rate: float = NOTION_RATE_MIN,
+        recovery: float = NOTION_RATE_RECOVERY
+    ):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min(min_rate, rate)
+        self.recovery = recovery
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        """Пополнение токенов и восстановление скорости за прошедшее время"""
+        elapsed = now - self.updated
+        if elapsed <= 0:
+            return
+        self.rate = min(self.max_rate, self.rate + self.recovery * elapsed)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        """Ожидание разрешения на один запрос (в порядке очереди)"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_rate_limited(self, retry_after: float) -> None:
+        """
+        Обратная связь от ответа 429
+
+        Args:
+            retry_after: Значение заголовка Retry-After в секундах
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(self.min_rate, self.rate * NOTION_RATE_BACKOFF)
+        self.tokens = 0
+        self.blocked_until = max(self.blocked_until, now + retry_after)
+        logger.warning(
+            f"Rate limit hit. Pausing {retry_after:.1f}s, rate lowered to {self.rate:.2f} req/s"
+        )
+
+
+# Общие для процесса лимитеры: переносы с одной интеграцией делят один бюджет
+_buckets: Dict[str, TokenBucket] = {}
+
+
+def get_rate_limiter(token: str) -> TokenBucket:
+    """
+    Получение общего лимитера запросов для токена интеграции
+
+    Args:
+        token: Токен интеграции Notion
+
+    Returns:
+        TokenBucket: Лимитер, общий для всех клиентов с этим токеном
+    """
+    key = token_fingerprint(token)
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = _buckets[key] = TokenBucket()
+    return bucket
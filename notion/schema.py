@@ -0,0 +1,359 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from notion.models import normalize_id
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Свойства, значения которых вычисляет Notion: записать их через API нельзя
+READ_ONLY_TYPES = {
+    "formula",
+    "rollup",
+    "created_time",
+    "created_by",
+    "last_edited_time",
+    "last_edited_by",
+    "unique_id",
+    "button",
+    "verification"
+}
+
+# Свойства со ссылками на пользователей рабочего пространства
+PEOPLE_TYPES = {"people", "created_by", "last_edited_by"}
+
+TEXT_TYPES = {"title", "rich_text"}
+OPTION_TYPES = {"select", "multi_select", "status"}
+
+# Значение, которое не нужно передавать в целевую базу
+SKIP = object()
+
+Converter = Callable[[Any], Any]
+
+
+class PropertyStep(NamedTuple):
+    """Шаг плана: перенос одного свойства исходной базы"""
+    source: str
+    source_type: str
+    dest: str
+    dest_type: str
+    convert: Converter
+
+
+class SchemaPlan:
+    """
+    Скомпилированный план переноса свойств между двумя схемами
+
+    Все решения о пропуске, переименовании и преобразовании типов принимаются
+    один раз при компиляции, apply() только выполняет готовые шаги.
+    """
+
+    def __init__(
+        self,
+        steps: List[PropertyStep],
+        dropped: Dict[str, str],
+        relations: Optional[List[PropertyStep]] = None
+    ):
+        self.steps = steps
+        self.dropped = dropped
+        # Связи внутри переносимой базы: заполняются вторым проходом после создания страниц
+        self.relations = relations or []
+
+    def apply(self, properties: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Преобразование свойств исходной страницы в свойства для целевой базы
+
+        Args:
+            properties: Свойства страницы из ответа API
+
+        Returns:
+            Dict[str, Any]: Свойства в формате запроса создания/обновления
+        """
+        result = {}
+        for source, source_type, dest, dest_type, convert in self.steps:
+            prop = properties.get(source)
+            if prop is None:
+                continue
+            value = convert(prop.get(source_type))
+            if value is not SKIP:
+                result[dest] = {dest_type: value}
+        return result
+
+
+def plain_text(parts: Optional[List[Dict[str, Any]]]) -> str:
+    """Текст rich text без форматирования"""
+    return "".join(part.get("plain_text", "") for part in parts or [])
+
+
+def _text_value(text: str) -> List[Dict[str, Any]]:
+    """Rich text из строки (с учетом ограничения API в 2000 символов на часть)"""
+    return [
+        {"type": "text", "text": {"content": text[i:i + 2000]}}
+        for i in range(0, len(text), 2000)
+    ]
+
+
+def _rich_text(parts: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Rich text для записи: упоминания пользователей и страниц заменяются текстом,
+    так как их ID не существуют в другом рабочем пространстве
+    """
+    result = []
+    for part in parts or []:
+        annotations = part.get("annotations")
+        if part.get("type") == "text":
+            item = {"type": "text", "text": part["text"]}
+        elif part.get("type") == "equation":
+            item = {"type": "equation", "equation": part["equation"]}
+        else:
+            item = {"type": "text", "text": {"content": part.get("plain_text", "")}}
+        if annotations:
+            item["annotations"] = annotations
+        result.append(item)
+    return result
+
+
+def _computed_value(source_type: str, value: Any) -> Any:
+    """Значение вычисляемого свойства (formula, rollup, unique_id и т.п.) в простом виде"""
+    if value is None:
+        return None
+    if source_type in ("formula", "rollup"):
+        inner = value.get("type")
+        inner_value = value.get(inner)
+        if inner == "array":
+            return ", ".join(
+                str(_computed_value(item.get("type"), item.get(item.get("type"))) or "")
+                for item in inner_value or []
+            )
+        return inner_value
+    if source_type == "unique_id":
+        prefix = value.get("prefix")
+        return f"{prefix}-{value.get('number')}" if prefix else value.get("number")
+    if source_type in ("created_time", "last_edited_time"):
+        return {"start": value}
+    return value
+
+
+def _to_text(source_type: str, value: Any) -> str:
+    """Текстовое представление значения любого типа"""
+    if value is None:
+        return ""
+    if source_type in TEXT_TYPES:
+        return plain_text(value)
+    if source_type in ("select", "status"):
+        return value.get("name", "")
+    if source_type == "multi_select":
+        return ", ".join(option.get("name", "") for option in value)
+    if source_type == "date":
+        return value.get("start", "") + (f" → {value['end']}" if value.get("end") else "")
+    if source_type in PEOPLE_TYPES:
+        people = value if isinstance(value, list) else [value]
+        return ", ".join(person.get("name") or person.get("id", "") for person in people)
+    if source_type == "files":
+        return ", ".join(item.get("name", "") for item in value)
+    if source_type == "relation":
+        return ", ".join(item.get("id", "") for item in value)
+    if source_type == "checkbox":
+        return "true" if value else "false"
+    if source_type in ("formula", "rollup", "unique_id", "created_time", "last_edited_time"):
+        computed = _computed_value(source_type, value)
+        if isinstance(computed, dict):
+            return computed.get("start") or ""
+        return "" if computed is None else str(computed)
+    return str(value)
+
+
+def _to_number(text: str) -> Any:
+    try:
+        return float(text.replace(",", ".").replace(" ", "")) if text else None
+    except ValueError:
+        return SKIP
+
+
+def _option_name(name: str, options: Dict[str, str], strict: bool) -> Optional[str]:
+    """
+    Название варианта в целевой базе
+
+    Совпадение ищется без учета регистра. Для status (strict) неизвестный
+    вариант не передается: API не создает новые статусы.
+    """
+    if not name:
+        return None
+    if name.lower() in options:
+        return options[name.lower()]
+    return None if strict else name[:100]
+
+
+def _compile_converter(
+    source_type: str,
+    dest_type: str,
+    dest_config: Dict[str, Any],
+    same_workspace: bool
+) -> Optional[Converter]:
+    """
+    Функция преобразования значения исходного типа в значение целевого
+
+    Returns:
+        Optional[Converter]: Функция или None, если перенос невозможен
+    """
+    if dest_type in OPTION_TYPES:
+        options = {
+            option["name"].lower(): option["name"]
+            for option in (dest_config.get(dest_type) or {}).get("options", [])
+        }
+        strict = dest_type == "status"
+
+        def names(value: Any) -> List[str]:
+            if value is None:
+                return []
+            if source_type == "multi_select":
+                return [option.get("name", "") for option in value]
+            if source_type in ("select", "status"):
+                return [value.get("name", "")]
+            text = _to_text(source_type, value)
+            return [part.strip() for part in text.split(",")] if dest_type == "multi_select" else [text]
+
+        if dest_type == "multi_select":
+            return lambda value: [
+                {"name": name}
+                for name in (_option_name(item, options, strict) for item in names(value))
+                if name
+            ]
+
+        def single(value: Any) -> Any:
+            found = [name for name in (_option_name(item, options, strict) for item in names(value)) if name]
+            if found:
+                return {"name": found[0]}
+            return SKIP if strict else None
+
+        return single
+
+    if dest_type in TEXT_TYPES:
+        if source_type in TEXT_TYPES:
+            return _rich_text
+        return lambda value: _text_value(_to_text(source_type, value))
+
+    if dest_type == "people":
+        if source_type not in PEOPLE_TYPES or not same_workspace:
+            return None
+        return lambda value: [
+            {"id": person["id"]}
+            for person in (value if isinstance(value, list) else [value] if value else [])
+        ]
+
+    if dest_type == "relation":
+        # Связи переносятся только между одними и теми же базами
+        if source_type != "relation":
+            return None
+        return lambda value: [{"id": item["id"]} for item in value or []]
+
+    if dest_type == "files":
+        if source_type != "files":
+            return None
+        # Файлы, загруженные в Notion, доступны по временной ссылке: переносятся только внешние
+        return lambda value: [
+            {"name": item.get("name", ""), "type": "external", "external": item["external"]}
+            for item in value or []
+            if item.get("type") == "external"
+        ]
+
+    if source_type == dest_type:
+        return lambda value: value
+
+    if dest_type == "number":
+        if source_type in ("formula", "rollup", "unique_id"):
+            def number(value: Any) -> Any:
+                computed = _computed_value(source_type, value)
+                if isinstance(computed, (int, float)) and not isinstance(computed, bool):
+                    return computed
+                return _to_number(_to_text(source_type, value))
+            return number
+        return lambda value: _to_number(_to_text(source_type, value))
+
+    if dest_type == "checkbox":
+        if source_type in ("formula", "rollup"):
+            return lambda value: bool(_computed_value(source_type, value))
+        return lambda value: _to_text(source_type, value).strip().lower() in ("true", "yes", "1", "да")
+
+    if dest_type == "date":
+        if source_type in ("formula", "rollup", "created_time", "last_edited_time"):
+            def date(value: Any) -> Any:
+                computed = _computed_value(source_type, value)
+                return computed if isinstance(computed, dict) else None
+            return date
+        return None
+
+    if dest_type in ("url", "email", "phone_number"):
+        return lambda value: _to_text(source_type, value) or None
+
+    return None
+
+
+def compile_plan(
+    origin_schema: Dict[str, Any],
+    dest_schema: Dict[str, Any],
+    rename: Optional[Dict[str, str]] = None,
+    same_workspace: bool = False,
+    self_relation: Optional[Tuple[str, str]] = None
+) -> SchemaPlan:
+    """
+    Компиляция плана переноса свойств
+
+    Свойства сопоставляются по имени (с учетом rename), заголовок исходной
+    базы всегда переносится в заголовок целевой.
+
+    Args:
+        origin_schema: Свойства исходной базы (поле properties объекта базы)
+        dest_schema: Свойства целевой базы
+        rename: Переименование свойств: имя в исходной базе -> имя в целевой
+        same_workspace: Обе базы в одном рабочем пространстве (ID пользователей совпадают)
+        self_relation: ID исходной и целевой баз переноса: связи исходной базы
+            с самой собой, которым в целевой соответствует связь целевой базы
+            с самой собой, откладываются до второго прохода (SchemaPlan.relations)
+
+    Returns:
+        SchemaPlan: План переноса
+    """
+    rename = rename or {}
+    dest_title = next(
+        (name for name, config in dest_schema.items() if config.get("type") == "title"),
+        None
+    )
+    steps = []
+    relations = []
+    dropped = {}
+    if self_relation:
+        self_relation = (normalize_id(self_relation[0]), normalize_id(self_relation[1]))
+
+    for name, config in origin_schema.items():
+        source_type = config.get("type")
+        dest_name = dest_title if source_type == "title" else rename.get(name, name)
+        dest_config = dest_schema.get(dest_name) if dest_name else None
+
+        if dest_config is None:
+            dropped[name] = "нет в целевой базе"
+            continue
+        dest_type = dest_config.get("type")
+        if dest_type in READ_ONLY_TYPES:
+            dropped[name] = f"свойство {dest_type} только для чтения"
+            continue
+        if dest_type == "relation" and source_type == "relation":
+            source_db = normalize_id((config.get("relation") or {}).get("database_id") or "")
+            dest_db = normalize_id((dest_config.get("relation") or {}).get("database_id") or "")
+            if (source_db, dest_db) == self_relation:
+                relations.append(PropertyStep(name, source_type, dest_name, dest_type, _relation_ids))
+                continue
+            if source_db != dest_db:
+                dropped[name] = "связь с другой базой"
+                continue
+
+        convert = _compile_converter(source_type, dest_type, dest_config, same_workspace)
+        if convert is None:
+            dropped[name] = f"нельзя преобразовать {source_type} в {dest_type}"
+            continue
+        steps.append(PropertyStep(name, source_type, dest_name, dest_type, convert))
+
+    return SchemaPlan(steps, dropped, relations)
+
+
+def _relation_ids(value: Optional[List[Dict[str, Any]]]) -> List[str]:
+    """ID связанных страниц из значения свойства relation"""
+    return [item["id"] for item in value or []]
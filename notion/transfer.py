@@ -0,0 +1,881 @@
+import argparse
+import asyncio
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Deque, Tuple
+from pydantic import ValidationError
+from telegram import Message
+from config.settings import (
+    DATA_DIR,
+    TRANSFER_CONCURRENCY,
+    READ_SHARDS,
+    COPY_PAGE_CONTENT,
+    APPEND_BATCH_SIZE,
+    SOURCE_ID_PROPERTY,
+    ORIGIN_NOTION_TOKEN,
+    DEST_NOTION_TOKEN,
+    ORIGIN_DATABASE_ID,
+    DEST_DATABASE_ID,
+    check_environment
+)
+from notion.api import NotionAPI, close_session
+from notion.blocks import fetch_block_tree, append_block_tree, block_payload, clear_block_children
+from notion.models import PageRecord, TransferProgress, normalize_id
+from notion.schema import SchemaPlan, compile_plan, plain_text
+from utils.logger import setup_logger
+from utils.journal import JournalLockedError, ProgressJournal
+from utils.metrics import PAGES
+from utils.progress import ProgressReporter
+from utils.tracing import Tracer, span
+
+logger = setup_logger(__name__)
+
+
+class NotionTransfer:
+    """
+    Класс для управления процессом переноса данных
+
+    В режиме синхронизации (sync=True) читаются только страницы, измененные
+    с начала последнего успешного прохода: уже перенесенные обновляются
+    запросом PATCH, новые создаются. Содержимое (блоки) обновленных страниц
+    не переносится повторно.
+    """
+
+    def __init__(
+        self,
+        origin_token: str,
+        dest_token: str,
+        origin_db: str,
+        dest_db: str,
+        concurrency: int = TRANSFER_CONCURRENCY,
+        copy_content: bool = COPY_PAGE_CONTENT,
+        source_property: Optional[str] = SOURCE_ID_PROPERTY,
+        progress_file: Optional[Path] = None,
+        sync: bool = False,
+        rename: Optional[Dict[str, str]] = None,
+        read_shards: int = READ_SHARDS,
+        expected_pages: Optional[int] = None
+    ):
+        self.origin_api = NotionAPI(origin_token)
+        self.dest_api = NotionAPI(dest_token)
+        self.origin_db = origin_db
+        self.dest_db = dest_db
+        # Прогресс (соответствие ID, курсоры, отметка синхронизации) относится к паре баз
+        self.progress_file = progress_file or DATA_DIR / (
+            f"transfer_progress_{normalize_id(origin_db)}_{normalize_id(dest_db)}.json"
+        )
+        self.progress = TransferProgress()
+        self.journal = ProgressJournal(self.progress_file)
+        self.concurrency = max(1, concurrency)
+        self.copy_content = copy_content
+        self.source_property = source_property or None
+        self.sync = sync
+        self.rename = rename or {}
+        self.read_shards = max(1, read_shards)
+        # Число страниц исходной базы по предварительной проверке (None - неизвестно)
+        self.expected_pages = expected_pages
+        self.plan: Optional[SchemaPlan] = None
+        # ID свойств для облегченных запросов (filter_properties): метка исходной
+        # страницы в целевой базе и связи исходной базы для второго прохода
+        self.source_property_id: Optional[str] = None
+        self.relation_property_ids: Optional[List[str]] = None
+        self.message: Optional[Message] = None
+        self._stats = {"created": 0, "updated": 0, "linked": 0, "skipped": 0, "failed": 0}
+        self.reporter = ProgressReporter(None)
+        # Прочитано и обработано страниц в текущем проходе; _pass_start - обработано
+        # до возобновления прохода
+        self._pass_start = 0
+        self._pass_read = 0
+        self._pass_done = 0
+
+    def load_saved_progress(self) -> None:
+        """
+        Захват журнала и загрузка сохраненного прогресса: снимок и записи журнала после него
+
+        Raises:
+            JournalLockedError: Перенос между этими базами уже выполняется
+        """
+        self.journal.lock()
+        saved_data, records = self.journal.load()
+        if saved_data or records:
+            self.progress = TransferProgress(**saved_data)
+            for record in records:
+                self.progress.apply_record(record)
+            logger.info(f"Загружен сохраненный прогресс: {self.progress.progress_percentage:.1f}%")
+        # Новый журнал начинается от актуального снимка
+        self.journal.compact(self.progress.model_dump())
+
+    def _record(self, record: Dict[str, Any]) -> None:
+        """
+        Применение изменения прогресса и запись его в журнал
+
+        Args:
+            record: Запись журнала
+        """
+        with span("checkpoint"):
+            self.progress.apply_record(record)
+            self.journal.append(record)
+            if self.journal.needs_compaction(len(self.progress.transferred_pages)):
+                self.journal.compact(self.progress.model_dump())
+
+    async def _prepare_schema(self) -> None:
+        """
+        Чтение схем обеих баз и компиляция плана переноса свойств
+
+        Схемы запрашиваются один раз за проход; дальше свойства каждой страницы
+        преобразуются готовым планом без повторного анализа схем.
+        """
+        origin, dest = await asyncio.gather(
+            self.origin_api.retrieve_database(self.origin_db),
+            self.dest_api.retrieve_database(self.dest_db)
+        )
+        dest_schema = dest.get("properties", {})
+        if self.source_property:
+            await self._prepare_source_property(dest_schema)
+
+        self.plan = self.build_plan(origin, dest)
+        relation_ids = [origin["properties"][step.source].get("id") for step in self.plan.relations]
+        self.relation_property_ids = relation_ids if relation_ids and all(relation_ids) else None
+        if self.plan.dropped:
+            for name, reason in self.plan.dropped.items():
+                logger.warning(f"Свойство '{name}' не переносится: {reason}")
+            await self._notify(
+                "ℹ️ Не переносятся свойства: " + ", ".join(sorted(self.plan.dropped))
+            )
+
+    def build_plan(self, origin: Dict[str, Any], dest: Dict[str, Any]) -> SchemaPlan:
+        """
+        План переноса свойств по описаниям обеих баз
+
+        Используется и переносом, и предварительной проверкой, поэтому оценка
+        называет те же непереносимые свойства, что и сам перенос.
+
+        Args:
+            origin: Описание исходной базы (ответ retrieve_database)
+            dest: Описание целевой базы
+
+        Returns:
+            SchemaPlan: План переноса
+        """
+        # Метка исходной страницы есть только в целевой базе и планом не переносится
+        origin_schema = {
+            name: config
+            for name, config in origin.get("properties", {}).items()
+            if name != self.source_property
+        }
+        return compile_plan(
+            origin_schema,
+            dest.get("properties", {}),
+            rename=self.rename,
+            same_workspace=self.origin_api.token == self.dest_api.token,
+            self_relation=(self.origin_db, self.dest_db)
+        )
+
+    async def _prepare_source_property(self, dest_schema: Dict[str, Any]) -> None:
+        """
+        Проверка и при необходимости создание в целевой базе свойства с ID исходной страницы
+
+        Args:
+            dest_schema: Свойства целевой базы
+        """
+        prop = dest_schema.get(self.source_property)
+        if prop is None:
+            dest = await self.dest_api.update_database(
+                self.dest_db,
+                {"properties": {self.source_property: {"rich_text": {}}}}
+            )
+            logger.info(f"В целевую базу добавлено свойство '{self.source_property}'")
+            self.source_property_id = dest.get("properties", {}).get(self.source_property, {}).get("id")
+        elif prop.get("type") != "rich_text":
+            logger.warning(
+                f"Свойство '{self.source_property}' целевой базы имеет тип {prop.get('type')}, "
+                f"метка исходной страницы не используется"
+            )
+            self.source_property = None
+        else:
+            self.source_property_id = prop.get("id")
+
+    async def _restore_id_map(self) -> None:
+        """
+        Восстановление соответствия ID по метке исходной страницы в целевой базе
+
+        Один постраничный проход по целевой базе находит страницы, созданные
+        до сбоя, но не попавшие в прогресс, поэтому они не создаются повторно.
+        Из свойств страниц запрашивается только метка. Выполняется только при
+        возобновлении прерванного прохода: после успешного прохода соответствие
+        полностью сохранено в прогрессе.
+        """
+        restored = 0
+        async for results, _ in self.dest_api.iter_database_batches(
+            self.dest_db,
+            query_filter={"property": self.source_property, "rich_text": {"is_not_empty": True}},
+            filter_properties=[self.source_property_id] if self.source_property_id else None
+        ):
+            for result in results:
+                source_id = _plain_text(result.get("properties", {}).get(self.source_property))
+                if not source_id or self.progress.dest_page_id(source_id) == result["id"]:
+                    continue
+                try:
+                    self._record({"op": "ok", "id": source_id, "dest": result["id"]})
+                except ValueError:
+                    logger.warning(f"Некорректная метка исходной страницы: {source_id}")
+                    continue
+                restored += 1
+        if restored:
+            logger.info(f"Восстановлено соответствие для {restored} уже созданных страниц")
+
+    def _dest_properties(self, page: PageRecord) -> Dict[str, Any]:
+        """Свойства страницы для целевой базы (по плану переноса) с меткой исходной страницы"""
+        properties = self.plan.apply(page.properties) if self.plan else dict(page.properties)
+        if self.source_property:
+            properties[self.source_property] = {
+                "rich_text": [{"type": "text", "text": {"content": page.id}}]
+            }
+        return properties
+
+    async def update_page(self, page: PageRecord, dest_page_id: str) -> bool:
+        """
+        Обновление свойств ранее перенесенной страницы
+
+        Args:
+            page: Исходная страница
+            dest_page_id: ID страницы в целевой базе
+
+        Returns:
+            bool: Успешно ли обновлена страница
+        """
+        try:
+            with span("transform"):
+                properties = self._dest_properties(page)
+            with span("write"):
+                await self.dest_api.update_page(dest_page_id, {"properties": properties})
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении страницы {page.id}: {str(e)}")
+            return False
+
+    async def transfer_page(self, page: PageRecord, dest_page_id: Optional[str] = None) -> Optional[str]:
+        """
+        Перенос одной страницы вместе с ее содержимым
+
+        Начальные блоки без вложенности передаются сразу в запросе создания
+        страницы, остальное дерево добавляется пачками после создания. Перед
+        добавлением созданная страница записывается в прогресс как страница
+        без содержимого: если добавление прервется, при следующем запуске
+        содержимое этой страницы будет перенесено заново.
+
+        Args:
+            page: Исходная страница
+            dest_page_id: Ранее созданная страница с неполным содержимым
+                (None - создать новую)
+
+        Returns:
+            Optional[str]: ID страницы в целевой базе или None при ошибке
+        """
+        try:
+            with span("transform"):
+                properties = self._dest_properties(page)
+
+            children = []
+            if self.copy_content:
+                with span("content.read"):
+                    children = await fetch_block_tree(self.origin_api, page.id)
+
+            if dest_page_id:
+                # Содержимое предыдущей попытки неполное: оно заменяется целиком
+                with span("write"):
+                    await self.dest_api.update_page(dest_page_id, {"properties": properties})
+                with span("content.write"):
+                    await clear_block_children(self.dest_api, dest_page_id)
+                    await append_block_tree(self.dest_api, dest_page_id, children)
+                return dest_page_id
+
+            page_data = {"parent": {"database_id": self.dest_db}, "properties": properties}
+            inline = 0
+            while inline < min(len(children), APPEND_BATCH_SIZE) and not children[inline].children:
+                inline += 1
+            if inline:
+                page_data["children"] = [block_payload(node) for node in children[:inline]]
+
+            with span("write"):
+                response = await self.dest_api.create_page(page_data)
+            if inline < len(children):
+                self._record({"op": "created", "id": page.id, "dest": response["id"]})
+                with span("content.write"):
+                    await append_block_tree(self.dest_api, response["id"], children[inline:])
+            return response["id"]
+
+        except Exception as e:
+            logger.error(f"Ошибка при переносе страницы {page.id}: {str(e)}")
+            return None
+
+    def _query(self) -> Dict[str, Any]:
+        """Фильтр и сортировка чтения исходной базы для текущего прохода"""
+        filters = []
+        sorts = None
+        if self.sync:
+            sorts = [{"timestamp": "last_edited_time", "direction": "ascending"}]
+            if self.progress.sync_since:
+                filters.append({
+                    "timestamp": "last_edited_time",
+                    "last_edited_time": {"on_or_after": self.progress.sync_since}
+                })
+        if self.progress.phase == "relations" and not self.sync:
+            # При полном переносе второму проходу нужны только страницы со связями;
+            # при синхронизации читаются все измененные, чтобы очистить удаленные связи
+            filters.append({"or": [
+                {"property": step.source, "relation": {"is_not_empty": True}}
+                for step in self.plan.relations
+            ]})
+        query_filter = None
+        if len(filters) == 1:
+            query_filter = filters[0]
+        elif filters:
+            query_filter = {"and": filters}
+        return {"query_filter": query_filter, "sorts": sorts}
+
+    async def _plan_shards(self, query_filter: Optional[Dict[str, Any]]) -> None:
+        """
+        Разбиение исходной базы на диапазоны created_time для параллельного чтения
+
+        Границы делят равными интервалами время между самой старой и самой
+        новой страницей и сохраняются в прогресс, поэтому при возобновлении
+        каждый диапазон продолжается со своего курсора.
+
+        Args:
+            query_filter: Фильтр прохода, к которому добавляются границы диапазонов
+        """
+        oldest, newest = await asyncio.gather(*(
+            self.origin_api.query_database(
+                self.origin_db,
+                page_size=1,
+                query_filter=query_filter,
+                sorts=[{"timestamp": "created_time", "direction": direction}],
+                ids_only=True
+            )
+            for direction in ("ascending", "descending")
+        ))
+        if not oldest.get("results") or not newest.get("results"):
+            return
+        start = _parse_time(oldest["results"][0]["created_time"])
+        end = _parse_time(newest["results"][0]["created_time"])
+        step = (end - start) / self.read_shards
+        # created_time в API округлено до минуты, границы тоже
+        bounds = sorted({
+            (start + step * i).replace(second=0, microsecond=0)
+            for i in range(1, self.read_shards)
+        } - {start.replace(second=0, microsecond=0)})
+        if not bounds:
+            return
+        edges = [None] + [_format_time(bound) for bound in bounds] + [None]
+        self._record({"op": "shards", "shards": [
+            {"after": edges[i], "before": edges[i + 1], "cursor": None, "read": 0, "done": False}
+            for i in range(len(edges) - 1)
+        ]})
+        logger.info(f"Исходная база разбита на {len(edges) - 1} диапазонов по created_time")
+
+    async def _read_pages(self, queue: asyncio.Queue) -> None:
+        """
+        Чтение страниц исходной базы и передача их в очередь записи
+
+        При разбиении на диапазоны (read_shards > 1) диапазоны читаются
+        параллельно в общую очередь; запросы всех диапазонов проходят через
+        общий лимитер токена.
+
+        Args:
+            queue: Очередь страниц для пула записи
+        """
+        query = self._query()
+        if self.read_shards > 1 and not self.progress.in_pass:
+            await self._plan_shards(query["query_filter"])
+
+        if not self.progress.shards:
+            await self._read_stream(queue, query, None)
+            return
+
+        readers = [
+            asyncio.create_task(self._read_stream(queue, query, index))
+            for index, shard in enumerate(self.progress.shards)
+            if not shard["done"]
+        ]
+        try:
+            await asyncio.gather(*readers)
+        finally:
+            for reader in readers:
+                reader.cancel()
+
+    async def _read_stream(
+        self,
+        queue: asyncio.Queue,
+        query: Dict[str, Any],
+        shard: Optional[int]
+    ) -> None:
+        """
+        Чтение одной цепочки курсоров: всей базы или одного диапазона created_time
+
+        Args:
+            queue: Очередь страниц для пула записи
+            query: Фильтр и сортировка прохода (см. _query)
+            shard: Номер диапазона в progress.shards (None - без разбиения)
+        """
+        start_cursor = self.progress.current_cursor
+        query_filter = query["query_filter"]
+        if shard is not None:
+            state = self.progress.shards[shard]
+            start_cursor = state["cursor"]
+            filters = [query_filter] if query_filter else []
+            if state["after"]:
+                filters.append({"timestamp": "created_time", "created_time": {"on_or_after": state["after"]}})
+            if state["before"]:
+                filters.append({"timestamp": "created_time", "created_time": {"before": state["before"]}})
+            query_filter = {"and": filters} if len(filters) > 1 else filters[0]
+
+        relations = self.progress.phase == "relations"
+        stream = _Stream(shard)
+        async for results, next_cursor in self.origin_api.iter_database_batches(
+            self.origin_db,
+            start_cursor=start_cursor,
+            query_filter=query_filter,
+            sorts=query["sorts"],
+            # Второму проходу нужны только свойства-связи
+            filter_properties=self.relation_property_ids if relations else None
+        ):
+            batch = _Batch(results, next_cursor, stream)
+            stream.batches.append(batch)
+            self._pass_read += len(results)
+            if not relations:
+                # Общее количество известно только для уже прочитанных пачек
+                self.progress.total_pages += len(results)
+            if not results:
+                # Пустая пачка (например, пустой диапазон) сразу считается обработанной
+                self._advance(stream)
+
+            for result in results:
+                if relations:
+                    if not self.progress.dest_page_id(result["id"]):
+                        # Страница не создана, связи записать некуда
+                        self._page_done(batch)
+                        continue
+                elif self.progress.is_transferred(result["id"]) and not (
+                    self.sync and self.progress.dest_page_id(result["id"])
+                ):
+                    self._count("skipped")
+                    self._page_done(batch)
+                    continue
+                await queue.put((batch, result))
+
+    async def _write_pages(self, queue: asyncio.Queue) -> None:
+        """
+        Обработчик пула записи: переносит страницы из очереди до получения None
+
+        Args:
+            queue: Очередь страниц
+        """
+        while (item := await queue.get()) is not None:
+            batch, result = item
+            try:
+                page = PageRecord.from_result(result)
+            except ValidationError as e:
+                logger.error(f"Некорректная страница {result.get('id')} в ответе API: {str(e)}")
+                self._count("failed")
+                if result.get("id"):
+                    self._record({"op": "fail", "id": result["id"], "error": "Некорректная страница в ответе API"})
+                self._page_done(batch)
+                continue
+            if self.progress.phase == "relations":
+                with span("links"):
+                    await self._link_page(page)
+                self._page_done(batch)
+                continue
+
+            dest_page_id = self.progress.dest_page_id(page.id)
+            if dest_page_id and self.progress.is_transferred(page.id):
+                # Синхронизация: страница уже перенесена, обновляются свойства
+                if await self.update_page(page, dest_page_id):
+                    self._count("updated")
+                    self._record({"op": "updated", "id": page.id})
+                else:
+                    self._count("failed")
+                    self._record({"op": "fail", "id": page.id, "error": "Ошибка при обновлении страницы"})
+            elif new_page_id := await self.transfer_page(page, dest_page_id):
+                self._count("created")
+                self._record({"op": "ok", "id": page.id, "dest": new_page_id})
+            else:
+                self._count("failed")
+                self._record({"op": "fail", "id": page.id, "error": "Ошибка при создании страницы"})
+
+            self._page_done(batch)
+
+    async def _link_page(self, page: PageRecord) -> None:
+        """
+        Запись связей страницы с ID, переведенными в ID целевой базы
+
+        Связанные страницы, которые не были перенесены, пропускаются. Связи
+        записываются, только если после последнего успешного прохода
+        создана или обновлена сама страница или одна из связанных с ней
+        (или запись ее связей завершилась ошибкой): у остальных страниц
+        связи в целевой базе уже актуальны.
+
+        Args:
+            page: Исходная страница
+        """
+        properties = {}
+        try:
+            changed = self.progress.is_written(page.id) or page.id in self.progress.failed_pages
+            for step in self.plan.relations:
+                prop = page.properties.get(step.source)
+                if prop is None:
+                    continue
+                if prop.get("has_more"):
+                    # В ответе запроса базы только первые 25 связей
+                    source_ids = [
+                        item["relation"]["id"]
+                        async for item in self.origin_api.iter_page_property(page.id, prop["id"])
+                    ]
+                else:
+                    source_ids = step.convert(prop.get("relation"))
+                changed = changed or any(map(self.progress.is_written, source_ids))
+                properties[step.dest] = {"relation": [
+                    {"id": dest_id}
+                    for dest_id in map(self.progress.dest_page_id, source_ids)
+                    if dest_id
+                ]}
+            if not changed:
+                return
+            await self.dest_api.update_page(self.progress.dest_page_id(page.id), {"properties": properties})
+            self._count("linked")
+            if page.id in self.progress.failed_pages:
+                self._record({"op": "linked", "id": page.id})
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении связей страницы {page.id}: {str(e)}")
+            self._count("failed")
+            self._record({"op": "fail", "id": page.id, "error": "Ошибка при обновлении связей"})
+
+    def _page_done(self, batch: "_Batch") -> None:
+        """
+        Отметка об обработке страницы пачки
+
+        Курсор в прогрессе сдвигается только через пачки, все страницы которых
+        (и всех пачек до них в той же цепочке курсоров) уже обработаны, иначе
+        при возобновлении часть страниц была бы потеряна.
+
+        Args:
+            batch: Пачка, к которой относится страница
+        """
+        batch.pending -= 1
+        self._pass_done += 1
+        self._advance(batch.stream)
+        self._report()
+
+    def _advance(self, stream: "_Stream") -> None:
+        """Сдвиг курсора цепочки через полностью обработанные пачки в ее начале"""
+        while stream.batches and stream.batches[0].pending == 0:
+            done = stream.batches.popleft()
+            if stream.shard is None:
+                self._record({
+                    "op": "batch",
+                    "cursor": done.next_cursor,
+                    "read": self.progress.read_pages + done.size
+                })
+            else:
+                self._record({
+                    "op": "batch",
+                    "shard": stream.shard,
+                    "cursor": done.next_cursor,
+                    "read": self.progress.shards[stream.shard]["read"] + done.size
+                })
+
+    def _count(self, outcome: str) -> None:
+        """Учет результата обработки страницы в статистике переноса и метриках"""
+        self._stats[outcome] += 1
+        PAGES.inc(outcome=outcome)
+
+    def _report(self) -> None:
+        """Обновление сообщения о ходе текущего прохода (без ожидания Telegram)"""
+        if self.progress.phase == "relations":
+            details = f"🔗 Связи обновлены: {self._stats['linked']}"
+        else:
+            details = (
+                f"Создано: {self._stats['created']}, обновлено: {self._stats['updated']}, "
+                f"пропущено: {self._stats['skipped']}, ошибок: {self._stats['failed']}"
+            )
+        self.reporter.update(*self.pass_progress(), details)
+
+    def pass_progress(self) -> Tuple[int, Optional[int]]:
+        """
+        Ход текущего прохода
+
+        Returns:
+            Tuple[int, Optional[int]]: Обработано страниц в проходе (вместе
+            с обработанными до возобновления) и их общее число. Общее число
+            известно только для первого прохода полного переноса по оценке
+            предварительной проверки, иначе None.
+        """
+        done = self._pass_start + self._pass_done
+        total = None
+        if self.expected_pages and not self.sync and self.progress.phase == "pages":
+            # В базу могли добавить страницы после предварительной проверки
+            total = max(self.expected_pages, self._pass_start + self._pass_read)
+        return done, total
+
+    async def _notify(self, text: str) -> None:
+        """Отправка сообщения о ходе переноса в чат (или в лог без чата)"""
+        if self.message is not None:
+            with span("telegram"):
+                await self.message.reply_text(text)
+        else:
+            logger.info(text)
+
+    async def _run_pass(self) -> None:
+        """
+        Один проход по исходной базе: чтение пачек и пул обработчиков записи
+
+        Чтение и обработчики выполняются как одна группа задач: ошибка любой
+        из них отменяет остальные и передается дальше, иначе чтение ждало бы
+        места в очереди, которую уже никто не разбирает.
+        """
+        self._pass_start = self.progress.read_pages
+        self._pass_read = 0
+        self._pass_done = 0
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def read() -> None:
+            await self._read_pages(queue)
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        tasks = [asyncio.create_task(read())] + [
+            asyncio.create_task(self._write_pages(queue))
+            for _ in range(self.concurrency)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self, message: Optional[Message] = None) -> None:
+        """
+        Запуск процесса переноса
+
+        Страницы исходной базы читаются потоково пачками по PAGE_SIZE, следующая
+        пачка запрашивается, пока переносится текущая. Запись выполняет пул
+        из concurrency обработчиков. После каждой пачки курсор сохраняется
+        в прогресс, поэтому при возобновлении уже прочитанные пачки пропускаются.
+
+        Связи внутри базы ссылаются на ID исходных страниц, поэтому страницы
+        создаются без них, а вторым проходом тем же пулом обработчиков
+        записываются связи с ID, переведенными через progress.id_map.
+
+        Args:
+            message: Сообщение чата, в который отправляется прогресс
+                (None - только запись в лог)
+        """
+        self.message = message
+        self.reporter = ProgressReporter(message)
+        try:
+            self.load_saved_progress()
+        except JournalLockedError as e:
+            logger.warning(str(e))
+            await self._notify("❌ Перенос между этими базами уже выполняется")
+            return
+        except Exception as e:
+            logger.error(f"Критическая ошибка: {str(e)}")
+            self.journal.close()
+            await self._notify(f"❌ Произошла ошибка: {str(e)}")
+            return
+
+        # Предыдущий проход прерван или завершился с ошибками либо сохраненного
+        # соответствия ID нет: часть страниц могла быть создана без записи в прогресс
+        resuming = (
+            self.progress.in_pass
+            or self.progress.phase != "pages"
+            or self.progress.run_started_at is not None
+            or not self.progress.id_map
+        )
+        tracer = Tracer(f"{self.origin_db} -> {self.dest_db}")
+        trace_token = tracer.activate()
+        cancelled = False
+        try:
+            if not self.progress.in_pass and self.progress.phase == "pages":
+                # Новый проход: чтение начинается с начала базы
+                self.progress.read_pages = 0
+                self._record({
+                    "op": "run",
+                    "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "since": self.progress.last_synced_at if self.sync else None
+                })
+            if self.progress.phase == "pages":
+                self.progress.total_pages = self.progress.read_pages
+            else:
+                self.progress.total_pages = len(self.progress.transferred_pages)
+
+            await self._prepare_schema()
+            if self.source_property and resuming:
+                await self._restore_id_map()
+
+            if self.sync and self.progress.sync_since:
+                await self._notify(f"🔄 Синхронизация изменений с {self.progress.sync_since}...")
+            else:
+                await self._notify("📊 Чтение страниц исходной базы данных...")
+
+            if self.progress.phase == "pages":
+                await self._run_pass()
+            if self.plan.relations:
+                if self.progress.phase == "pages":
+                    self._record({"op": "phase", "phase": "relations"})
+                await self.reporter.close()
+                self.reporter = ProgressReporter(self.message)
+                await self._notify("🔗 Восстановление связей между страницами...")
+                await self._run_pass()
+                self._record({"op": "phase", "phase": "pages"})
+            await self.reporter.close()
+            if not self._stats["failed"]:
+                # Следующая синхронизация начнется с изменений после начала этого прохода
+                self._record({"op": "synced", "at": self.progress.run_started_at})
+
+            if self.sync:
+                await self._notify(
+                    f"{'⚠️' if self._stats['failed'] else '✅'} Синхронизация завершена\n"
+                    f"Создано: {self._stats['created']}\n"
+                    f"Обновлено: {self._stats['updated']}\n"
+                    f"Связей обновлено: {self._stats['linked']} страниц\n"
+                    f"Ошибок: {self._stats['failed']}"
+                )
+                return
+
+            if not self.progress.total_pages:
+                await self._notify("❌ Нет данных в исходной базе данных")
+                return
+
+            # Финальное сообщение
+            if self.progress.failed_pages:
+                await self._notify(
+                    f"⚠️ Перенос завершен с ошибками\n"
+                    f"Успешно перенесено: {len(self.progress.transferred_pages)} страниц\n"
+                    f"Ошибок: {len(self.progress.failed_pages)} страниц"
+                )
+            else:
+                await self._notify("✅ Перенос успешно завершен!")
+
+        except asyncio.CancelledError:
+            cancelled = True
+            logger.info(f"Перенос {self.origin_db} остановлен")
+            try:
+                await self.reporter.close()
+                await self._notify("⏹ Перенос остановлен, прогресс сохранен")
+            except Exception as e:
+                logger.warning(f"Не удалось отправить сообщение об остановке: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"Критическая ошибка: {str(e)}")
+            await self.reporter.close()
+            await self._notify(f"❌ Произошла ошибка: {str(e)}")
+        finally:
+            await self.reporter.close()
+            # Прогресс сохраняется при любом завершении, в том числе при отмене
+            with span("checkpoint"):
+                self.journal.compact(self.progress.model_dump())
+                self.journal.close()
+            tracer.deactivate(trace_token)
+            await self._finish_trace(tracer, notify=not cancelled)
+
+    async def _finish_trace(self, tracer: Tracer, notify: bool) -> None:
+        """
+        Отчет о времени этапов в лог и чат и экспорт трассировки
+
+        Args:
+            tracer: Трассировщик переноса
+            notify: Отправлять ли отчет в чат (не отправляется при отмене)
+        """
+        report = tracer.report()
+        logger.info(f"Перенос {self.origin_db}: {report}")
+        try:
+            if notify and self.message is not None:
+                await self.message.reply_text(report)
+            await tracer.export()
+        except Exception as e:
+            logger.warning(f"Не удалось отправить отчет о производительности: {str(e)}")
+
+
+class _Stream:
+    """Цепочка курсоров чтения (вся база или один диапазон) и ее необработанные пачки"""
+
+    __slots__ = ("shard", "batches")
+
+    def __init__(self, shard: Optional[int]):
+        self.shard = shard
+        self.batches: Deque[_Batch] = deque()
+
+
+class _Batch:
+    """
+    Прочитанная пачка страниц и число ее еще не обработанных страниц
+
+    Сами страницы в пачке не хранятся, поэтому данные обработанной
+    страницы освобождаются сразу, не дожидаясь всей пачки.
+    """
+
+    __slots__ = ("size", "next_cursor", "pending", "stream")
+
+    def __init__(self, results: List[Dict[str, Any]], next_cursor: Optional[str], stream: _Stream):
+        self.size = len(results)
+        self.next_cursor = next_cursor
+        self.pending = self.size
+        self.stream = stream
+
+
+def _parse_time(value: str) -> datetime:
+    """Время из формата API (ISO 8601 с суффиксом Z)"""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _format_time(value: datetime) -> str:
+    """Время в формате фильтров API"""
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _plain_text(prop: Optional[Dict[str, Any]]) -> str:
+    """Текст свойства rich_text или title без форматирования"""
+    if not prop:
+        return ""
+    return plain_text(prop.get(prop.get("type", "rich_text")))
+
+
+async def _run_from_settings(sync: bool, read_shards: int) -> None:
+    """Перенос между базами из переменных окружения (для запуска по расписанию)"""
+    for warning in check_environment(transfer=True):
+        logger.warning(warning)
+    transfer = NotionTransfer(
+        origin_token=ORIGIN_NOTION_TOKEN,
+        dest_token=DEST_NOTION_TOKEN,
+        origin_db=ORIGIN_DATABASE_ID,
+        dest_db=DEST_DATABASE_ID,
+        sync=sync,
+        read_shards=read_shards
+    )
+    try:
+        await transfer.run()
+    finally:
+        await close_session()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Перенос базы Notion между аккаунтами из ORIGIN_*/DEST_* переменных окружения"
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="перенести только изменения с последнего успешного прохода"
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=READ_SHARDS,
+        help="число диапазонов created_time, читаемых параллельно"
+    )
+    args = parser.parse_args()
+    asyncio.run(_run_from_settings(args.sync, args.shards))
@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+# Мок-сервер не ограничивает запросы: лимитер не должен замедлять тесты.
+# Настройки читаются при импорте config.settings, поэтому задаются до него
+os.environ["NOTION_RATE_LIMIT"] = "100000"
+os.environ["NOTION_RATE_BURST"] = "100000"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from utils import cache as cache_module
+from utils.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache_module, "time", fake)
+    return fake
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(maxsize=10, ttl=30)
+    cache.set("db", {"id": "db"})
+    clock.now += 29
+    assert cache.get("db") == {"id": "db"}
+    clock.now += 1
+    assert cache.get("db") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(maxsize=2, ttl=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_invalidate_and_clear(clock):
+    cache = TTLCache(maxsize=10, ttl=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_concurrent_loads_of_one_key_are_coalesced():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": "db"}
+
+    async def scenario():
+        cache = TTLCache(maxsize=10, ttl=30)
+        results = await asyncio.gather(*(cache.get_or_load("db", load) for _ in range(5)))
+        results.append(await cache.get_or_load("db", load))
+        return results
+
+    results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(result == {"id": "db"} for result in results)
+
+
+def test_load_errors_reach_waiters_and_are_not_cached():
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("HTTP 503")
+
+    async def scenario():
+        cache = TTLCache(maxsize=10, ttl=30)
+        results = await asyncio.gather(
+            cache.get_or_load("db", failing),
+            cache.get_or_load("db", failing),
+            return_exceptions=True
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert calls == 1
+        assert await cache.get_or_load("db", lambda: asyncio.sleep(0, result="ok")) == "ok"
+
+    asyncio.run(scenario())
@@ -0,0 +1,109 @@
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+import pytest
+from utils.jobs import JobConflictError, JobLimitError, JobManager
+
+
+def transfer(name: str) -> SimpleNamespace:
+    """Заглушка переноса: JobManager использует только progress_file"""
+    return SimpleNamespace(progress_file=Path(f"/tmp/{name}.json"))
+
+
+async def wait_forever() -> None:
+    await asyncio.Event().wait()
+
+
+class FakeStore:
+    """Хранилище переносов в памяти с тем же интерфейсом, что SQLitePersistence"""
+
+    def __init__(self):
+        self.cipher = SimpleNamespace(enabled=True)
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.released: List[Optional[List[str]]] = []
+
+    async def save_job(self, job_id, user_id, chat_id, params, owner) -> None:
+        self.jobs[job_id] = {"id": job_id, "user_id": user_id, "owner": owner, "params": params}
+
+    async def delete_job(self, job_id) -> None:
+        self.jobs.pop(job_id, None)
+
+    async def release_jobs(self, owner, job_ids=None) -> None:
+        self.released.append(job_ids)
+
+
+def test_limits_per_user_and_global():
+    async def scenario() -> None:
+        manager = JobManager(max_active=2, max_per_user=1)
+        await manager.start(1, 1, transfer("a"), wait_forever())
+
+        with pytest.raises(JobLimitError, match="user"):
+            await manager.start(1, 1, transfer("b"), wait_forever())
+        await manager.start(2, 2, transfer("c"), wait_forever())
+        with pytest.raises(JobLimitError, match="global"):
+            await manager.start(3, 3, transfer("d"), wait_forever())
+
+        assert [job.user_id for job in manager.active()] == [1, 2]
+        await manager.shutdown()
+        assert manager.active() == []
+
+    asyncio.run(scenario())
+
+
+def test_same_progress_file_conflicts_across_users():
+    async def scenario() -> None:
+        manager = JobManager(max_active=5, max_per_user=5)
+        await manager.start(1, 1, transfer("a"), wait_forever())
+        with pytest.raises(JobConflictError):
+            await manager.start(2, 2, transfer("a"), wait_forever())
+        await manager.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_finished_job_leaves_registry_and_cancel_is_per_user():
+    async def scenario() -> None:
+        manager = JobManager(max_active=5, max_per_user=5)
+        done = await manager.start(1, 1, transfer("a"), asyncio.sleep(0))
+        mine = await manager.start(1, 1, transfer("b"), wait_forever())
+        other = await manager.start(2, 2, transfer("c"), wait_forever())
+        await done.task
+        await asyncio.sleep(0)
+        assert done not in manager.active()
+        assert done.status == "done"
+
+        cancelled = await manager.cancel(1)
+        assert cancelled == [mine]
+        assert mine.status == "cancelled"
+        assert manager.active() == [other]
+        await manager.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_store_record_is_deleted_when_done_and_kept_on_shutdown():
+    async def scenario() -> None:
+        store = FakeStore()
+        manager = JobManager(max_active=5, max_per_user=5, store=store)
+        finished = asyncio.Event()
+
+        async def short() -> None:
+            await finished.wait()
+
+        done = await manager.start(1, 1, transfer("a"), short(), params={"origin_db": "a"})
+        running = await manager.start(1, 1, transfer("b"), wait_forever(), params={"origin_db": "b"})
+        assert set(store.jobs) == {done.id, running.id}
+
+        finished.set()
+        await done.task
+        await asyncio.sleep(0)
+        await asyncio.gather(*manager._store_tasks)
+        assert set(store.jobs) == {running.id}
+
+        await manager.shutdown()
+        # Запись остается: перенос возобновит этот или другой экземпляр
+        assert set(store.jobs) == {running.id}
+        assert store.released == [None]
+
+    asyncio.run(scenario())
@@ -0,0 +1,108 @@
+import uuid
+import pytest
+from notion.models import TransferProgress
+from utils.helpers import save_progress
+from utils import journal as journal_module
+from utils.journal import JournalLockedError, ProgressJournal
+
+
+def page_id(i: int) -> str:
+    return str(uuid.UUID(int=i + 1))
+
+
+def replay(snapshot, records) -> TransferProgress:
+    progress = TransferProgress(**snapshot)
+    for record in records:
+        progress.apply_record(record)
+    return progress
+
+
+RECORDS = [
+    {"op": "ok", "id": page_id(0), "dest": page_id(100)},
+    {"op": "created", "id": page_id(1), "dest": page_id(101)},
+    {"op": "fail", "id": page_id(2), "error": "HTTP 400"},
+    {"op": "batch", "cursor": "cursor-1", "read": 3},
+    {"op": "ok", "id": page_id(1), "dest": page_id(101)},
+]
+
+
+def test_records_are_read_back_in_order(tmp_path):
+    journal = ProgressJournal(tmp_path / "progress.json", fsync_every=2)
+    for record in RECORDS:
+        journal.append(record)
+    journal.close()
+
+    snapshot, records = ProgressJournal(tmp_path / "progress.json").load()
+    assert snapshot == {}
+    assert records == RECORDS
+
+
+def test_compaction_writes_snapshot_and_empties_journal(tmp_path):
+    journal = ProgressJournal(tmp_path / "progress.json")
+    progress = TransferProgress()
+    for record in RECORDS:
+        progress.apply_record(record)
+        journal.append(record)
+    journal.compact(progress.model_dump())
+    journal.append({"op": "ok", "id": page_id(3), "dest": page_id(103)})
+    journal.close()
+
+    snapshot, records = ProgressJournal(tmp_path / "progress.json").load()
+    assert records == [{"op": "ok", "id": page_id(3), "dest": page_id(103)}]
+    restored = replay(snapshot, records)
+    assert restored.dest_page_id(page_id(1)) == page_id(101)
+    assert restored.is_transferred(page_id(3))
+    assert restored.current_cursor == "cursor-1"
+    assert page_id(2) in restored.failed_pages
+
+
+def test_replay_after_crash_between_snapshot_and_truncation_is_idempotent(tmp_path):
+    path = tmp_path / "progress.json"
+    journal = ProgressJournal(path)
+    progress = TransferProgress()
+    for record in RECORDS:
+        progress.apply_record(record)
+        journal.append(record)
+    journal.sync()
+    # Снимок уже заменен, а журнал очистить не успели: записи применяются повторно
+    save_progress(path, progress.model_dump())
+    journal._file.close()
+
+    snapshot, records = ProgressJournal(path).load()
+    assert records == RECORDS
+    assert replay(snapshot, records).model_dump() == progress.model_dump()
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    path = tmp_path / "progress.json"
+    journal = ProgressJournal(path)
+    for record in RECORDS[:2]:
+        journal.append(record)
+    journal.close()
+    with open(path.with_suffix(".jsonl"), "a", encoding="utf-8") as f:
+        f.write('{"op":"ok","id":"')
+
+    _, records = ProgressJournal(path).load()
+    assert records == RECORDS[:2]
+
+
+def test_compaction_threshold_grows_with_state(tmp_path):
+    journal = ProgressJournal(tmp_path / "progress.json", compact_every=3)
+    for record in RECORDS[:3]:
+        journal.append(record)
+    assert journal.needs_compaction(state_size=0)
+    assert not journal.needs_compaction(state_size=10)
+    journal.close()
+
+
+@pytest.mark.skipif(journal_module.fcntl is None, reason="flock недоступен")
+def test_second_writer_is_locked_out(tmp_path):
+    first = ProgressJournal(tmp_path / "progress.json")
+    first.lock()
+    with pytest.raises(JournalLockedError):
+        ProgressJournal(tmp_path / "progress.json").lock()
+    first.close()
+
+    second = ProgressJournal(tmp_path / "progress.json")
+    second.lock()
+    second.close()
@@ -0,0 +1,95 @@
+import random
+import uuid
+import pytest
+from notion import models
+from notion.models import (
+    PageIdMap,
+    PageIdSet,
+    TransferProgress,
+    int_to_page_id,
+    page_id_to_int,
+)
+
+
+@pytest.fixture
+def small_merges(monkeypatch):
+    """Слияние в массивы после нескольких добавлений, а не после тысяч"""
+    monkeypatch.setattr(models, "_MERGE_MIN", 4)
+
+
+def random_ids(count: int, seed: int = 0):
+    rnd = random.Random(seed)
+    return [rnd.getrandbits(128) for _ in range(count)]
+
+
+def test_page_id_round_trip():
+    page_id = str(uuid.UUID(int=random.Random(1).getrandbits(128)))
+    value = page_id_to_int(page_id)
+    assert int_to_page_id(value) == page_id
+    assert page_id_to_int(page_id.replace("-", "")) == value
+
+
+def test_set_membership_across_merges(small_merges):
+    ids = random_ids(100)
+    page_ids = PageIdSet()
+    for value in ids:
+        page_ids.add(value)
+        page_ids.add(value)
+    assert len(page_ids) == len(ids)
+    assert all(value in page_ids for value in ids)
+    assert not any(value in page_ids for value in random_ids(50, seed=1))
+    assert sorted(page_ids) == sorted(ids)
+
+
+def test_set_pack_round_trip(small_merges):
+    ids = random_ids(37)
+    page_ids = PageIdSet(ids[:20])
+    for value in ids[20:]:
+        page_ids.add(value)
+
+    restored = PageIdSet.unpack(page_ids.pack())
+    assert sorted(restored) == sorted(ids)
+    assert len(PageIdSet.unpack(PageIdSet().pack())) == 0
+
+
+def test_set_keeps_ids_sharing_high_half(small_merges):
+    base = 7 << 64
+    page_ids = PageIdSet(base | low for low in range(10))
+    assert all((base | low) in page_ids for low in range(10))
+    assert (base | 10) not in page_ids
+
+
+def test_map_get_update_and_pack(small_merges):
+    keys = random_ids(60)
+    values = random_ids(60, seed=2)
+    id_map = PageIdMap()
+    for key, value in zip(keys, values):
+        id_map[key] = value
+    # Перезапись ключа и в массивах, и среди недавних
+    id_map[keys[0]] = 1
+    id_map[keys[-1]] = 2
+    expected = dict(zip(keys, values))
+    expected[keys[0]] = 1
+    expected[keys[-1]] = 2
+
+    assert len(id_map) == len(keys)
+    assert all(id_map.get(key) == value for key, value in expected.items())
+    assert id_map.get(12345) is None
+
+    restored = PageIdMap.unpack(id_map.pack())
+    assert dict(restored.items()) == expected
+
+
+def test_progress_serializes_packed_ids_and_reads_legacy_lists():
+    progress = TransferProgress()
+    source, dest = str(uuid.UUID(int=1)), str(uuid.UUID(int=2))
+    progress.add_transferred_page(source, dest)
+
+    data = progress.model_dump()
+    assert isinstance(data["transferred_pages"], str)
+    restored = TransferProgress(**data)
+    assert restored.is_transferred(source)
+    assert restored.dest_page_id(source) == dest
+
+    legacy = TransferProgress(transferred_pages=[source])
+    assert legacy.is_transferred(source)
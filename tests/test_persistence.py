@@ -0,0 +1,113 @@
+import asyncio
+import sqlite3
+from cryptography.fernet import Fernet
+from utils.crypto import TokenCipher
+from utils.persistence import SQLitePersistence
+
+KEY = Fernet.generate_key().decode()
+TOKEN = "secret_origin_token_value"
+
+
+def raw_rows(path, sql):
+    with sqlite3.connect(str(path)) as conn:
+        return conn.execute(sql).fetchall()
+
+
+def test_user_data_round_trip_encrypts_tokens(tmp_path):
+    path = tmp_path / "state.db"
+    data = {"language": "en", "origin_token": TOKEN, "origin_db": "abc"}
+
+    async def scenario():
+        await SQLitePersistence(path, TokenCipher(KEY)).update_user_data(1, data)
+        return await SQLitePersistence(path, TokenCipher(KEY)).get_user_data()
+
+    assert asyncio.run(scenario()) == {1: data}
+    stored = raw_rows(path, "SELECT data FROM user_data")[0][0]
+    assert TOKEN not in stored
+    assert '"language": "en"' in stored
+
+
+def test_tokens_are_not_stored_without_key_and_dropped_with_wrong_key(tmp_path):
+    async def scenario():
+        await SQLitePersistence(tmp_path / "plain.db", TokenCipher(None)).update_user_data(
+            1, {"origin_token": TOKEN, "language": "ru"}
+        )
+        await SQLitePersistence(tmp_path / "keyed.db", TokenCipher(KEY)).update_user_data(
+            1, {"origin_token": TOKEN, "language": "ru"}
+        )
+        other_key = TokenCipher(Fernet.generate_key().decode())
+        return await SQLitePersistence(tmp_path / "keyed.db", other_key).get_user_data()
+
+    assert asyncio.run(scenario()) == {1: {"language": "ru"}}
+    assert TOKEN not in raw_rows(tmp_path / "plain.db", "SELECT data FROM user_data")[0][0]
+
+
+def test_unchanged_user_data_is_not_rewritten(tmp_path):
+    path = tmp_path / "state.db"
+
+    async def scenario():
+        store = SQLitePersistence(path, TokenCipher(KEY))
+        await store.update_user_data(1, {"origin_token": TOKEN})
+        await store.update_user_data(1, {"origin_token": TOKEN})
+        first = raw_rows(path, "SELECT version FROM user_data")[0][0]
+        await store.update_user_data(1, {"origin_token": TOKEN, "language": "en"})
+        return first, raw_rows(path, "SELECT version FROM user_data")[0][0]
+
+    assert asyncio.run(scenario()) == (1, 2)
+
+
+def test_refresh_picks_up_changes_from_another_replica_only(tmp_path):
+    path = tmp_path / "state.db"
+
+    async def scenario():
+        first = SQLitePersistence(path, TokenCipher(KEY))
+        second = SQLitePersistence(path, TokenCipher(KEY))
+        await first.update_user_data(1, {"language": "ru"})
+        local = (await second.get_user_data())[1]
+
+        # Без изменений в базе несохраненные локальные правки остаются
+        local["origin_db"] = "draft"
+        await second.refresh_user_data(1, local)
+        assert local == {"language": "ru", "origin_db": "draft"}
+
+        await first.update_user_data(1, {"language": "en"})
+        await second.refresh_user_data(1, local)
+        return local
+
+    assert asyncio.run(scenario()) == {"language": "en"}
+
+
+def test_conversation_states_round_trip(tmp_path):
+    path = tmp_path / "state.db"
+
+    async def scenario():
+        store = SQLitePersistence(path, TokenCipher(KEY))
+        await store.update_conversation("transfer", (1, 1), 5)
+        await store.update_conversation("transfer", (2, 2), 3)
+        await store.update_conversation("transfer", (2, 2), None)
+        return await SQLitePersistence(path, TokenCipher(KEY)).get_conversations("transfer")
+
+    assert asyncio.run(scenario()) == {(1, 1): 5}
+
+
+def test_only_stale_jobs_are_claimed_with_decrypted_params(tmp_path):
+    path = tmp_path / "state.db"
+    params = {"origin_token": TOKEN, "origin_db": "abc"}
+
+    async def scenario():
+        store = SQLitePersistence(path, TokenCipher(KEY))
+        await store.save_job("live", 1, 10, params, owner="a")
+        await store.save_job("left", 2, 20, params, owner="b")
+        await store.release_jobs("b")
+
+        claimed = await store.claim_jobs("c", stale_after=60)
+        assert [job["id"] for job in claimed] == ["left"]
+        assert claimed[0]["params"] == params
+        # Захваченный перенос отмечен новым владельцем и повторно не выдается
+        assert await store.claim_jobs("d", stale_after=60) == []
+
+        await store.delete_job("left")
+        return raw_rows(path, "SELECT id, owner FROM jobs")
+
+    assert asyncio.run(scenario()) == [("live", "a")]
+    assert TOKEN not in str(raw_rows(path, "SELECT params FROM jobs"))
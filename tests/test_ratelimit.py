@@ -0,0 +1,85 @@
+import asyncio
+import time
+import pytest
+from notion import ratelimit
+from notion.ratelimit import TokenBucket, get_rate_limiter
+
+
+class FakeClock:
+    """Подмена модуля time в notion.ratelimit: время идет только по advance()"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ratelimit, "time", fake)
+    return fake
+
+
+def test_rate_limited_lowers_rate_and_blocks(clock):
+    bucket = TokenBucket(rate=10, capacity=10, min_rate=1, recovery=2)
+    bucket.on_rate_limited(retry_after=3)
+
+    assert bucket.rate == pytest.approx(10 * ratelimit.NOTION_RATE_BACKOFF)
+    assert bucket.tokens == 0
+    assert bucket.blocked_until == pytest.approx(clock.now + 3)
+
+
+def test_repeated_rate_limits_stop_at_min_rate(clock):
+    bucket = TokenBucket(rate=10, capacity=10, min_rate=1, recovery=2)
+    for _ in range(20):
+        bucket.on_rate_limited(retry_after=0)
+    assert bucket.rate == pytest.approx(1)
+
+
+def test_rate_recovers_linearly_up_to_max(clock):
+    bucket = TokenBucket(rate=10, capacity=10, min_rate=1, recovery=2)
+    bucket.on_rate_limited(retry_after=0)
+    lowered = bucket.rate
+
+    clock.advance(1)
+    bucket._refill(clock.now)
+    assert bucket.rate == pytest.approx(lowered + 2)
+
+    clock.advance(60)
+    bucket._refill(clock.now)
+    assert bucket.rate == pytest.approx(10)
+    assert bucket.tokens == pytest.approx(10)
+
+
+def test_acquire_waits_for_retry_after():
+    async def scenario() -> float:
+        bucket = TokenBucket(rate=1000, capacity=1)
+        bucket.on_rate_limited(retry_after=0.2)
+        started = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.2
+
+
+def test_acquire_spends_burst_then_paces_at_rate():
+    async def scenario() -> float:
+        bucket = TokenBucket(rate=50, capacity=5)
+        started = time.monotonic()
+        for _ in range(15):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # 5 запросов из запаса, еще 10 со скоростью 50 в секунду
+    assert asyncio.run(scenario()) >= 10 / 50 * 0.9
+
+
+def test_limiter_is_shared_per_token(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_buckets", {})
+    assert get_rate_limiter("secret_a") is get_rate_limiter("secret_a")
+    assert get_rate_limiter("secret_a") is not get_rate_limiter("secret_b")
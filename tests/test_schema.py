@@ -0,0 +1,132 @@
+from typing import Any, Dict
+from notion.models import normalize_id
+from notion.schema import compile_plan
+
+ORIGIN_DB = "0f1e2d3c-4b5a-6978-8796-a5b4c3d2e1f0"
+DEST_DB = "11111111-2222-3333-4444-555555555555"
+
+
+def prop(prop_type: str, **config: Any) -> Dict[str, Any]:
+    """Свойство схемы базы"""
+    return {"id": prop_type[:4], "type": prop_type, prop_type: config}
+
+
+def value(prop_type: str, data: Any) -> Dict[str, Any]:
+    """Значение свойства страницы"""
+    return {"type": prop_type, prop_type: data}
+
+
+def text(content: str) -> Dict[str, Any]:
+    return {"type": "text", "text": {"content": content}, "plain_text": content}
+
+
+def test_title_goes_to_destination_title_and_mentions_become_text():
+    plan = compile_plan({"Name": prop("title")}, {"Task": prop("title")})
+    mention = {"type": "mention", "mention": {"user": {"id": "u1"}}, "plain_text": "@Anna"}
+
+    result = plan.apply({"Name": value("title", [text("Call "), mention])})
+
+    assert result == {"Task": {"title": [
+        {"type": "text", "text": {"content": "Call "}},
+        {"type": "text", "text": {"content": "@Anna"}}
+    ]}}
+
+
+def test_unwritable_properties_are_dropped_with_reason():
+    plan = compile_plan(
+        {
+            "Name": prop("title"),
+            "Missing": prop("rich_text"),
+            "Total": prop("number"),
+            "Owner": prop("people"),
+            "Other": prop("relation", database_id="ffffffff-0000-0000-0000-000000000000")
+        },
+        {
+            "Name": prop("title"),
+            "Total": prop("formula"),
+            "Owner": prop("people"),
+            "Other": prop("relation", database_id="eeeeeeee-0000-0000-0000-000000000000")
+        }
+    )
+    assert set(plan.dropped) == {"Missing", "Total", "Owner", "Other"}
+    assert [step.source for step in plan.steps] == ["Name"]
+
+
+def test_options_match_case_insensitively_and_unknown_status_is_skipped():
+    plan = compile_plan(
+        {"Tags": prop("multi_select"), "Stage": prop("select"), "State": prop("select")},
+        {
+            "Tags": prop("select", options=[{"name": "Urgent"}]),
+            "Stage": prop("multi_select", options=[]),
+            "State": prop("status", options=[{"name": "Done"}])
+        }
+    )
+    result = plan.apply({
+        "Tags": value("multi_select", [{"name": "urgent"}, {"name": "later"}]),
+        "Stage": value("select", {"name": "Draft"}),
+        "State": value("select", {"name": "Unknown"})
+    })
+    assert result == {
+        "Tags": {"select": {"name": "Urgent"}},
+        "Stage": {"multi_select": [{"name": "Draft"}]}
+    }
+
+    done = plan.apply({"State": value("select", {"name": "done"})})
+    assert done == {"State": {"status": {"name": "Done"}}}
+
+
+def test_text_converts_to_number_and_checkbox():
+    plan = compile_plan(
+        {"Amount": prop("rich_text"), "Flag": prop("rich_text")},
+        {"Amount": prop("number"), "Flag": prop("checkbox")}
+    )
+    assert plan.apply({
+        "Amount": value("rich_text", [text("1 234,5")]),
+        "Flag": value("rich_text", [text("Да")])
+    }) == {"Amount": {"number": 1234.5}, "Flag": {"checkbox": True}}
+    # Нечисловой текст не передается, а не обнуляет число
+    assert plan.apply({"Amount": value("rich_text", [text("n/a")])}) == {}
+
+
+def test_computed_values_are_written_as_plain_values():
+    plan = compile_plan(
+        {"Score": prop("formula"), "Due": prop("formula"), "Key": prop("unique_id")},
+        {"Score": prop("number"), "Due": prop("date"), "Key": prop("rich_text")}
+    )
+    result = plan.apply({
+        "Score": value("formula", {"type": "number", "number": 42}),
+        "Due": value("formula", {"type": "date", "date": {"start": "2024-05-01"}}),
+        "Key": value("unique_id", {"prefix": "TASK", "number": 7})
+    })
+    assert result == {
+        "Score": {"number": 42},
+        "Due": {"date": {"start": "2024-05-01"}},
+        "Key": {"rich_text": [{"type": "text", "text": {"content": "TASK-7"}}]}
+    }
+
+
+def test_rename_maps_property_to_another_name():
+    plan = compile_plan(
+        {"Notes": prop("rich_text")},
+        {"Comments": prop("rich_text")},
+        rename={"Notes": "Comments"}
+    )
+    assert plan.apply({"Notes": value("rich_text", [text("hi")])}) == {
+        "Comments": {"rich_text": [{"type": "text", "text": {"content": "hi"}}]}
+    }
+
+
+def test_self_relation_is_deferred_regardless_of_id_format():
+    plan = compile_plan(
+        {"Parent": prop("relation", database_id=ORIGIN_DB.replace("-", "").upper())},
+        {"Parent": prop("relation", database_id=DEST_DB)},
+        self_relation=(ORIGIN_DB, DEST_DB.replace("-", ""))
+    )
+    assert plan.steps == []
+    assert [step.source for step in plan.relations] == ["Parent"]
+    relation = [{"id": "a"}, {"id": "b"}]
+    assert plan.relations[0].convert(relation) == ["a", "b"]
+
+
+def test_normalize_id_ignores_dashes_and_case():
+    assert normalize_id(ORIGIN_DB.upper()) == normalize_id(ORIGIN_DB.replace("-", ""))
@@ -0,0 +1,164 @@
+import asyncio
+import random
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List
+import pytest
+import notion.api
+import notion.ratelimit
+from benchmarks.mock_notion import MockNotion, start_mock_server, base_url
+from config.settings import SOURCE_ID_PROPERTY
+from notion.transfer import NotionTransfer
+
+RELATION_SCHEMA = {
+    "origin": {
+        "Name": {"id": "title", "type": "title", "title": {}},
+        "Related": {"id": "rel1", "type": "relation", "relation": {"database_id": "origin"}}
+    },
+    "dest": {
+        "Name": {"id": "title", "type": "title", "title": {}},
+        "Related": {"id": "rel1", "type": "relation", "relation": {"database_id": "dest"}}
+    }
+}
+
+
+@asynccontextmanager
+async def mock_api(mock: MockNotion, monkeypatch: pytest.MonkeyPatch) -> AsyncIterator[None]:
+    """Запуск мок-сервера и переключение клиента Notion на него"""
+    runner = await start_mock_server(mock)
+    monkeypatch.setattr(notion.api, "NOTION_BASE_URL", base_url(runner))
+    # Лимитеры и сессия привязаны к циклу событий предыдущего теста
+    monkeypatch.setattr(notion.ratelimit, "_buckets", {})
+    notion.api._metadata_cache.clear()
+    try:
+        yield
+    finally:
+        await notion.api.close_session()
+        await runner.cleanup()
+
+
+class SlowAckNotion(MockNotion):
+    """Мок, который отвечает на создание страницы с задержкой после ее создания"""
+
+    async def create_page(self, request):
+        response = await super().create_page(request)
+        # Отмена в этот момент оставляет в целевой базе страницы, о которых клиент не узнал
+        await asyncio.sleep(0.02)
+        return response
+
+
+def source_ids(mock: MockNotion) -> List[str]:
+    """Метки исходных страниц у всех страниц целевой базы"""
+    return [
+        page["properties"][SOURCE_ID_PROPERTY]["rich_text"][0]["plain_text"]
+        for page in mock.databases["dest"]
+    ]
+
+
+def title(page: Dict[str, Any]) -> str:
+    return "".join(part["plain_text"] for part in page["properties"]["Name"]["title"])
+
+
+def test_resume_after_cancel_creates_no_duplicates(tmp_path, monkeypatch):
+    async def scenario() -> None:
+        mock = SlowAckNotion(pages=300, latency=0.002, blocks_per_page=2)
+        async with mock_api(mock, monkeypatch):
+            transfer = NotionTransfer("origin-token", "dest-token", "origin", "dest", progress_file=tmp_path / "progress.json")
+            task = asyncio.create_task(transfer.run())
+            while len(mock.databases["dest"]) < 50:
+                await asyncio.sleep(0.005)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert len(mock.databases["dest"]) < 300
+
+            notion.api._metadata_cache.clear()
+            transfer = NotionTransfer("origin-token", "dest-token", "origin", "dest", progress_file=tmp_path / "progress.json")
+            await transfer.run()
+
+        origin_ids = [page["id"] for page in mock.databases["origin"]]
+        copied = source_ids(mock)
+        assert sorted(copied) == sorted(origin_ids)
+        assert not transfer.progress.failed_pages
+        for page in mock.databases["dest"]:
+            assert len(mock.blocks[page["id"]]) == 2
+
+    asyncio.run(scenario())
+
+
+def test_sync_updates_pages_in_place(tmp_path, monkeypatch):
+    async def scenario() -> None:
+        mock = MockNotion(pages=120, latency=0)
+        async with mock_api(mock, monkeypatch):
+            transfer = NotionTransfer("origin-token", "dest-token", "origin", "dest", progress_file=tmp_path / "progress.json", sync=True)
+            await transfer.run()
+            dest_ids = {page["id"] for page in mock.databases["dest"]}
+            assert len(dest_ids) == 120
+
+            edited = mock.databases["origin"][7]
+            edited["properties"]["Name"]["title"] = [
+                {"type": "text", "text": {"content": "Edited"}, "plain_text": "Edited"}
+            ]
+            edited["last_edited_time"] = "2100-01-01T00:00:00.000Z"
+
+            notion.api._metadata_cache.clear()
+            transfer = NotionTransfer("origin-token", "dest-token", "origin", "dest", progress_file=tmp_path / "progress.json", sync=True)
+            await transfer.run()
+
+        assert {page["id"] for page in mock.databases["dest"]} == dest_ids
+        assert transfer._stats["created"] == 0
+        assert transfer._stats["updated"] == 1
+        copy = mock.pages[transfer.progress.dest_page_id(edited["id"])]
+        assert title(copy) == "Edited"
+
+    asyncio.run(scenario())
+
+
+def test_relations_are_remapped_to_destination_pages(tmp_path, monkeypatch):
+    async def scenario() -> None:
+        mock = MockNotion(pages=0, latency=0)
+        mock.add_database("origin", 0, schema=RELATION_SCHEMA["origin"])
+        mock.add_database("dest", 0, schema=RELATION_SCHEMA["dest"])
+        pages = [
+            mock._add_page("origin", {"Name": {"title": [{"type": "text", "text": {"content": f"Page {i}"}}]}})
+            for i in range(150)
+        ]
+        rnd = random.Random(1)
+        expected = {}
+        for i, page in enumerate(pages):
+            # Больше 25 связей: API отдает их в странице не целиком
+            targets = rnd.sample(pages, 40 if i == 0 else rnd.randint(0, 3))
+            page["properties"]["Related"] = {
+                "id": "rel1",
+                "type": "relation",
+                "relation": [{"id": target["id"]} for target in targets]
+            }
+            expected[page["id"]] = [target["id"] for target in targets]
+
+        async with mock_api(mock, monkeypatch):
+            transfer = NotionTransfer("origin-token", "dest-token", "origin", "dest", progress_file=tmp_path / "progress.json")
+            await transfer.run()
+
+        assert not transfer.progress.failed_pages
+        source_of = dict(zip((page["id"] for page in mock.databases["dest"]), source_ids(mock)))
+        assert len(source_of) == len(pages)
+        for page in mock.databases["dest"]:
+            related = page["properties"].get("Related", {}).get("relation", [])
+            assert [source_of[target["id"]] for target in related] == expected[source_of[page["id"]]]
+
+    asyncio.run(scenario())
+
+
+def test_pass_progress_counts_the_current_pass_only(tmp_path):
+    full = NotionTransfer("a", "b", "origin", "dest", expected_pages=200, progress_file=tmp_path / "progress.json")
+    # Страницы прошлых запусков не входят в ход текущего прохода
+    full.progress.add_transferred_page(str(uuid.UUID(int=1)))
+    full._pass_done = 50
+    assert full.pass_progress() == (50, 200)
+
+    full.progress.phase = "relations"
+    assert full.pass_progress() == (50, None)
+
+    sync = NotionTransfer("a", "b", "origin", "dest", sync=True, progress_file=tmp_path / "progress.json")
+    sync._pass_done = 1
+    assert sync.pass_progress() == (1, None)
@@ -0,0 +1,109 @@
+import asyncio
+from types import SimpleNamespace
+from typing import List, Optional
+from utils.updates import UpdateDispatcher
+
+
+def update(update_id: int, chat_id: Optional[int]) -> SimpleNamespace:
+    """Обновление Telegram с теми полями, которые читает очередь"""
+    chat = SimpleNamespace(id=chat_id) if chat_id is not None else None
+    return SimpleNamespace(update_id=update_id, effective_chat=chat, effective_user=None)
+
+
+class FakeApp:
+    """Приложение, записывающее порядок обработки; чаты из blocked ждут release"""
+
+    def __init__(self, blocked=()):
+        self.processed: List[int] = []
+        self.blocked = set(blocked)
+        self.release = asyncio.Event()
+
+    async def process_update(self, item) -> None:
+        if item.effective_chat and item.effective_chat.id in self.blocked:
+            await self.release.wait()
+        self.processed.append(item.update_id)
+
+
+def test_redelivered_updates_are_processed_once():
+    async def scenario() -> List[int]:
+        app = FakeApp()
+        dispatcher = UpdateDispatcher(app, workers=2, queue_size=10, dedupe_size=2)
+        await dispatcher.start()
+        for update_id in (1, 2, 1, 2, 3):
+            assert dispatcher.submit(update(update_id, chat_id=5))
+        # Окно повторов - два последних update_id: 1 из него уже вытеснен
+        assert dispatcher.submit(update(1, chat_id=5))
+        await dispatcher.stop()
+        return app.processed
+
+    assert asyncio.run(scenario()) == [1, 2, 3, 1]
+
+
+def test_chat_is_ordered_and_other_chats_are_not_blocked():
+    async def scenario() -> None:
+        app = FakeApp(blocked={1})
+        dispatcher = UpdateDispatcher(app, workers=2, queue_size=10)
+        # Чаты 1 и 2 попадают в разные шарды
+        assert dispatcher._shard(update(0, 1)) != dispatcher._shard(update(0, 2))
+        await dispatcher.start()
+        for update_id, chat_id in ((1, 1), (2, 1), (3, 2), (4, 2)):
+            dispatcher.submit(update(update_id, chat_id))
+
+        await asyncio.sleep(0.05)
+        assert app.processed == [3, 4]
+        app.release.set()
+        await dispatcher.stop()
+        assert app.processed == [3, 4, 1, 2]
+
+    asyncio.run(scenario())
+
+
+def test_full_shard_rejects_without_remembering_the_update():
+    async def scenario() -> None:
+        app = FakeApp(blocked={1})
+        dispatcher = UpdateDispatcher(app, workers=1, queue_size=1)
+        await dispatcher.start()
+        assert dispatcher.submit(update(1, 1))
+        await asyncio.sleep(0)  # обработчик забрал обновление 1 и ждет
+        assert dispatcher.submit(update(2, 1))
+        assert not dispatcher.submit(update(3, 1))
+        assert dispatcher.depth == 1
+
+        app.release.set()
+        await asyncio.sleep(0.01)
+        # Отклоненное обновление не считается принятым и принимается при повторной доставке
+        assert dispatcher.submit(update(3, 1))
+        await dispatcher.stop()
+        assert app.processed == [1, 2, 3]
+
+    asyncio.run(scenario())
+
+
+def test_put_waits_for_space_instead_of_dropping():
+    async def scenario() -> None:
+        app = FakeApp(blocked={1})
+        dispatcher = UpdateDispatcher(app, workers=1, queue_size=1)
+        await dispatcher.start()
+
+        async def flush() -> None:
+            for update_id in range(1, 5):
+                await dispatcher.put(update(update_id, 1))
+
+        put = asyncio.create_task(flush())
+        await asyncio.sleep(0.01)
+        assert not put.done()
+
+        app.release.set()
+        await put
+        await dispatcher.stop()
+        assert app.processed == [1, 2, 3, 4]
+
+    asyncio.run(scenario())
+
+
+def test_updates_without_chat_use_user_or_update_id():
+    dispatcher = UpdateDispatcher(FakeApp(), workers=4, queue_size=8)
+    no_chat = update(7, chat_id=None)
+    assert 0 <= dispatcher._shard(no_chat) < 4
+    with_user = SimpleNamespace(update_id=8, effective_chat=None, effective_user=SimpleNamespace(id=3))
+    assert dispatcher._shard(with_user) == dispatcher._shard(update(9, chat_id=3))
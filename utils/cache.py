@@ -0,0 +1,91 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from utils.metrics import NOTION_CACHE
+
+
+class TTLCache:
+    """
+    Кэш ответов с временем жизни записей и вытеснением давно не использованных (LRU)
+
+    Одновременные запросы одного ключа объединяются: загрузка выполняется
+    один раз, остальные вызовы ждут ее результата. Ошибки загрузки
+    не кэшируются.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, name: str = "cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        # Ключ -> (момент устаревания, значение); порядок - от давно использованных к недавним
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Значение по ключу или None, если его нет или оно устарело"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Удаление записи (например, после изменения ресурса)"""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    async def get_or_load(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Значение из кэша или результат загрузки, сохраненный в кэш
+
+        Args:
+            key: Ключ записи
+            load: Функция загрузки значения при промахе
+
+        Returns:
+            Any: Значение
+        """
+        value = self.get(key)
+        if value is not None:
+            NOTION_CACHE.inc(cache=self.name, result="hit")
+            return value
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            NOTION_CACHE.inc(cache=self.name, result="hit")
+            return await asyncio.shield(pending)
+
+        NOTION_CACHE.inc(cache=self.name, result="miss")
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await load()
+        except Exception as e:
+            future.set_exception(e)
+            # Ошибка передана ожидающим; без них она не должна попасть в лог цикла событий
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            del self._loading[key]
@@ -0,0 +1,66 @@
+from typing import Any, Dict, Optional
+from cryptography.fernet import Fernet, InvalidToken
+from config.settings import STATE_ENCRYPTION_KEY
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Поля с секретами в сохраняемых словарях
+SECRET_SUFFIX = "_token"
+
+
+class TokenCipher:
+    """
+    Шифрование токенов Notion перед записью в хранилище состояния
+
+    Без ключа токены в хранилище не попадают: после перезапуска их нужно
+    ввести заново, но открытым текстом они нигде не лежат.
+    """
+
+    def __init__(self, key: Optional[str] = STATE_ENCRYPTION_KEY):
+        self._fernet = Fernet(key.encode()) if key else None
+        if self._fernet is None:
+            logger.warning("STATE_ENCRYPTION_KEY не задан: токены не сохраняются в хранилище состояния")
+
+    @property
+    def enabled(self) -> bool:
+        return self._fernet is not None
+
+    def seal(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Копия словаря с зашифрованными (или удаленными без ключа) токенами
+
+        Args:
+            data: Данные пользователя или параметры переноса
+
+        Returns:
+            Dict[str, Any]: Данные для записи в хранилище
+        """
+        sealed = {}
+        for key, value in data.items():
+            if key.endswith(SECRET_SUFFIX) and isinstance(value, str):
+                if self._fernet is None:
+                    continue
+                value = {"enc": self._fernet.encrypt(value.encode()).decode()}
+            sealed[key] = value
+        return sealed
+
+    def open(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Расшифровка токенов, сохраненных seal()
+
+        Токены, которые не удалось расшифровать (например, после смены ключа),
+        пропускаются.
+        """
+        opened = {}
+        for key, value in data.items():
+            if key.endswith(SECRET_SUFFIX) and isinstance(value, dict) and "enc" in value:
+                if self._fernet is None:
+                    continue
+                try:
+                    value = self._fernet.decrypt(value["enc"].encode()).decode()
+                except InvalidToken:
+                    logger.warning(f"Не удалось расшифровать {key}: ключ шифрования изменился")
+                    continue
+            opened[key] = value
+        return opened
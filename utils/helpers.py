@@ -1,17 +1,26 @@
+import hashlib
 import json
+import os
 from pathlib import Path
 from typing import Dict, Any
 
 def save_progress(file_path: Path, data: Dict[str, Any]) -> None:
     """
-    Сохранение прогресса переноса в JSON файл
+    Атомарное сохранение прогресса переноса в JSON файл
+
+    Данные пишутся во временный файл, который затем заменяет основной,
+    поэтому сбой во время записи не повреждает сохраненный прогресс.
     
     Args:
         file_path: Путь к файлу для сохранения
         data: Данные для сохранения
     """
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    tmp_path = file_path.with_name(file_path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
 
 def load_progress(file_path: Path) -> Dict[str, Any]:
     """
@@ -26,4 +35,17 @@ def load_progress(file_path: Path) -> Dict[str, Any]:
     if file_path.exists():
         with open(file_path, 'r', encoding='utf-8') as f:
             return json.load(f)
-    return {} 
\ No newline at end of file
+    return {}
+
+
+def token_fingerprint(token: str) -> str:
+    """
+    Отпечаток токена для использования в качестве ключа без хранения самого токена
+
+    Args:
+        token: Токен интеграции
+
+    Returns:
+        str: Первые 16 символов SHA-256 от токена
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,261 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from config.settings import (
+    MAX_ACTIVE_JOBS,
+    MAX_JOBS_PER_USER,
+    JOB_HEARTBEAT_INTERVAL,
+    JOB_LEASE_TIMEOUT
+)
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class JobLimitError(Exception):
+    """Превышен лимит одновременно выполняющихся переносов"""
+
+
+class JobConflictError(Exception):
+    """Перенос между теми же базами (с тем же файлом прогресса) уже выполняется"""
+
+
+class Job:
+    """Перенос, выполняющийся в фоновой задаче"""
+
+    __slots__ = ("id", "user_id", "chat_id", "transfer", "task", "started_at")
+
+    def __init__(
+        self,
+        user_id: int,
+        chat_id: int,
+        transfer: Any,
+        task: asyncio.Task,
+        job_id: Optional[str] = None
+    ):
+        self.id = job_id or uuid.uuid4().hex[:8]
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.transfer = transfer
+        self.task = task
+        self.started_at = datetime.now(timezone.utc)
+
+    @property
+    def status(self) -> str:
+        """Состояние задачи: running, cancelled, failed или done"""
+        if not self.task.done():
+            return "running"
+        if self.task.cancelled():
+            return "cancelled"
+        return "failed" if self.task.exception() else "done"
+
+
+class ChatReply:
+    """
+    Замена сообщения Telegram для переноса, возобновленного после перезапуска
+
+    NotionTransfer отправляет прогресс через message.reply_text, а исходного
+    сообщения после перезапуска нет - есть только ID чата.
+    """
+
+    def __init__(self, bot: Any, chat_id: int):
+        self.bot = bot
+        self.chat_id = chat_id
+
+    async def reply_text(self, text: str, **kwargs: Any) -> Any:
+        return await self.bot.send_message(self.chat_id, text, **kwargs)
+
+
+class JobManager:
+    """
+    Реестр фоновых переносов
+
+    Каждый перенос запускается отдельной задачей asyncio, поэтому обработчик
+    обновления Telegram завершается сразу. Число одновременных переносов
+    ограничено глобально и для каждого пользователя.
+
+    Если задано хранилище (store, см. utils.persistence.SQLitePersistence),
+    параметры переносов сохраняются в нем, а экземпляр бота периодически
+    отмечает свои переносы. Переносы без отметки дольше JOB_LEASE_TIMEOUT
+    (остановленный или упавший экземпляр) подхватываются и возобновляются
+    через resume.
+    """
+
+    def __init__(
+        self,
+        max_active: int = MAX_ACTIVE_JOBS,
+        max_per_user: int = MAX_JOBS_PER_USER,
+        store: Optional[Any] = None
+    ):
+        self.max_active = max_active
+        self.max_per_user = max_per_user
+        self.store = store
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        # Запуск переноса по сохраненной записи (задается приложением)
+        self.resume: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+        self._jobs: Dict[str, Job] = {}
+        self._persisted: Set[str] = set()
+        # Запросы к хранилищу, запущенные из обратных вызовов завершения задач
+        self._store_tasks: Set[asyncio.Task] = set()
+        self._supervisor: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def active(self) -> List[Job]:
+        """Выполняющиеся переносы"""
+        return list(self._jobs.values())
+
+    def user_jobs(self, user_id: int) -> List[Job]:
+        """Выполняющиеся переносы пользователя"""
+        return [job for job in self._jobs.values() if job.user_id == user_id]
+
+    async def start(
+        self,
+        user_id: int,
+        chat_id: int,
+        transfer: Any,
+        run: Awaitable,
+        params: Optional[Dict[str, Any]] = None,
+        job_id: Optional[str] = None
+    ) -> Job:
+        """
+        Запуск переноса в фоновой задаче
+
+        Запись о переносе сохраняется в хранилище в отдельном потоке
+        (см. SQLitePersistence), задача переноса к этому моменту уже запущена.
+
+        Args:
+            user_id: ID пользователя Telegram
+            chat_id: ID чата, в который отправляется прогресс
+            transfer: Экземпляр NotionTransfer
+            run: Корутина переноса (например, transfer.run(message))
+            params: Параметры для возобновления после перезапуска (токены и ID баз)
+            job_id: ID переноса (для возобновляемого переноса - прежний)
+
+        Returns:
+            Job: Запущенный перенос
+
+        Raises:
+            JobLimitError: Превышен глобальный лимит или лимит пользователя
+            JobConflictError: Уже выполняется перенос с тем же файлом прогресса
+        """
+        progress_file = getattr(transfer, "progress_file", None)
+        if progress_file is not None and any(
+            job.transfer.progress_file == progress_file for job in self._jobs.values()
+        ):
+            run.close()
+            raise JobConflictError(f"Job for {progress_file.name} is already running")
+        if len(self._jobs) >= self.max_active or len(self.user_jobs(user_id)) >= self.max_per_user:
+            run.close()  # корутина не будет запущена
+            limit = "global" if len(self._jobs) >= self.max_active else "user"
+            raise JobLimitError(f"Job limit reached ({limit})")
+
+        task = asyncio.create_task(run)
+        job = Job(user_id, chat_id, transfer, task, job_id)
+        self._jobs[job.id] = job
+        task.add_done_callback(lambda _: self._on_done(job))
+        logger.info(f"Запущен перенос {job.id} пользователя {user_id} ({len(self._jobs)} активных)")
+        if self.store is not None and params is not None and self.store.cipher.enabled:
+            # Без ключа шифрования токены не сохраняются и возобновить перенос нельзя
+            try:
+                await self.store.save_job(job.id, user_id, chat_id, params, self.owner)
+                if not task.done():
+                    self._persisted.add(job.id)
+                elif not self._stopping:
+                    # Перенос завершился, пока сохранялась запись
+                    await self.store.delete_job(job.id)
+            except Exception as e:
+                # Перенос продолжается, но после перезапуска не возобновится
+                logger.error(f"Не удалось сохранить перенос {job.id} в хранилище: {str(e)}")
+        return job
+
+    def _on_done(self, job: Job) -> None:
+        """Удаление завершенного переноса из реестра и запись результата в лог"""
+        self._jobs.pop(job.id, None)
+        if job.id in self._persisted and not self._stopping:
+            # При остановке бота запись остается, перенос возобновится после запуска
+            self._persisted.discard(job.id)
+            self._store_call(self.store.delete_job(job.id))
+        status = job.status
+        if status == "failed":
+            logger.error(f"Перенос {job.id} завершился ошибкой: {job.task.exception()}")
+        else:
+            logger.info(f"Перенос {job.id} завершен: {status}")
+
+    def _store_call(self, request: Awaitable) -> None:
+        """Запрос к хранилищу в фоне (из обратного вызова, где await недоступен)"""
+        task = asyncio.ensure_future(request)
+        self._store_tasks.add(task)
+        task.add_done_callback(self._store_done)
+
+    def _store_done(self, task: asyncio.Task) -> None:
+        self._store_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Ошибка записи фонового переноса в хранилище: {task.exception()}")
+
+    async def cancel(self, user_id: int, job_id: Optional[str] = None) -> List[Job]:
+        """
+        Отмена переносов пользователя
+
+        Задача переноса при отмене сохраняет прогресс, поэтому перенос можно
+        продолжить, запустив его заново с теми же базами.
+
+        Args:
+            user_id: ID пользователя Telegram
+            job_id: ID конкретного переноса (None - все переносы пользователя)
+
+        Returns:
+            List[Job]: Отмененные переносы
+        """
+        jobs = [job for job in self.user_jobs(user_id) if job_id is None or job.id == job_id]
+        await self._cancel(jobs)
+        return jobs
+
+    async def start_supervision(self) -> None:
+        """Возобновление брошенных переносов и запуск периодической отметки своих"""
+        if self.store is None:
+            return
+        await self._claim()
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    async def _supervise(self) -> None:
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+            try:
+                await self.store.touch_jobs(self.owner)
+                await self._claim()
+            except Exception as e:
+                logger.error(f"Ошибка отметки фоновых переносов: {str(e)}")
+
+    async def _claim(self) -> None:
+        """Захват и возобновление переносов без отметки"""
+        for record in await self.store.claim_jobs(self.owner, JOB_LEASE_TIMEOUT):
+            if self.resume is None or record["id"] in self._jobs:
+                continue
+            try:
+                await self.resume(record)
+                logger.info(f"Возобновлен перенос {record['id']} пользователя {record['user_id']}")
+            except JobLimitError:
+                # Перенос подхватит этот или другой экземпляр, когда освободится место
+                await self.store.release_jobs(self.owner, [record["id"]])
+            except Exception as e:
+                logger.error(f"Не удалось возобновить перенос {record['id']}: {str(e)}")
+                await self.store.delete_job(record["id"])
+
+    async def shutdown(self) -> None:
+        """Отмена всех переносов при остановке приложения"""
+        self._stopping = True
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+        await self._cancel(self.active())
+        await asyncio.gather(*self._store_tasks, return_exceptions=True)
+        if self.store is not None:
+            await self.store.release_jobs(self.owner)
+
+    @staticmethod
+    async def _cancel(jobs: List[Job]) -> None:
+        for job in jobs:
+            job.task.cancel()
+        await asyncio.gather(*(job.task for job in jobs), return_exceptions=True)
@@ -0,0 +1,151 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, TextIO
+from config.settings import JOURNAL_FSYNC_EVERY, JOURNAL_COMPACT_EVERY
+from utils.helpers import save_progress, load_progress
+from utils.logger import setup_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка между процессами недоступна
+    fcntl = None
+
+logger = setup_logger(__name__)
+
+
+class JournalLockedError(Exception):
+    """Журнал прогресса уже открыт другим переносом"""
+
+
+class ProgressJournal:
+    """
+    Журнал прогресса переноса: снимок JSON и append-only журнал JSONL
+
+    Каждое изменение прогресса дописывается в журнал одной строкой, fsync
+    выполняется пачками. Периодически состояние целиком записывается в
+    снимок, а журнал очищается. Записи журнала идемпотентны, поэтому
+    повторное применение записей, уже попавших в снимок, безопасно.
+
+    Пока журнал используется, на файл .lock рядом со снимком держится
+    блокировка flock, поэтому два переноса (в том числе в разных
+    процессах) не пишут в один журнал. Блокировка снимается при close()
+    и автоматически при завершении процесса.
+    """
+
+    def __init__(
+        self,
+        snapshot_path: Path,
+        fsync_every: int = JOURNAL_FSYNC_EVERY,
+        compact_every: int = JOURNAL_COMPACT_EVERY
+    ):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path.with_suffix(".jsonl")
+        self.lock_path = snapshot_path.with_suffix(".lock")
+        self._lock: Optional[TextIO] = None
+        self.fsync_every = fsync_every
+        self.compact_every = compact_every
+        self._file: Optional[TextIO] = None
+        self._unsynced = 0
+        self._records = 0
+
+    def lock(self) -> None:
+        """
+        Захват журнала для записи
+
+        Raises:
+            JournalLockedError: Журнал используется другим переносом
+        """
+        if self._lock is not None:
+            return
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.lock_path, 'a', encoding='utf-8')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError as e:
+                lock_file.close()
+                raise JournalLockedError(f"Журнал {self.snapshot_path.name} уже используется") from e
+        self._lock = lock_file
+
+    def load(self) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Чтение снимка и записей журнала после него
+
+        Returns:
+            Tuple[Dict[str, Any], List[Dict[str, Any]]]: Снимок (или пустой
+            словарь) и записи журнала в порядке добавления
+        """
+        snapshot = load_progress(self.snapshot_path)
+        records = []
+        if self.journal_path.exists():
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Недописанная при сбое последняя строка
+                        logger.warning(f"Журнал {self.journal_path.name} обрезан после {len(records)} записей")
+                        break
+        return snapshot, records
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """
+        Добавление записи в журнал
+
+        Args:
+            record: Запись об изменении прогресса
+        """
+        if self._file is None:
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
+        self._unsynced += 1
+        self._records += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        """Сброс записей журнала на диск"""
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def needs_compaction(self, state_size: int = 0) -> bool:
+        """
+        Пора ли переписать снимок
+
+        Порог растет вместе с размером состояния, поэтому суммарная стоимость
+        переписывания снимков остается линейной от числа страниц.
+
+        Args:
+            state_size: Размер состояния (например, число перенесенных страниц)
+        """
+        return self._records >= max(self.compact_every, state_size)
+
+    def compact(self, data: Dict[str, Any]) -> None:
+        """
+        Запись снимка и очистка журнала
+
+        Args:
+            data: Полное состояние прогресса
+        """
+        self.sync()
+        save_progress(self.snapshot_path, data)
+        if self._file is not None:
+            self._file.close()
+        # Снимок уже на диске: журнал можно начинать заново
+        self._file = open(self.journal_path, 'w', encoding='utf-8')
+        self._unsynced = 0
+        self._records = 0
+
+    def close(self) -> None:
+        """Сброс журнала на диск, закрытие файла и снятие блокировки"""
+        self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._lock is not None:
+            # Закрытие файла снимает flock
+            self._lock.close()
+            self._lock = None
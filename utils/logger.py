@@ -1,32 +1,123 @@
+import atexit
+import copy
+import json
 import logging
-from rich.logging import RichHandler
-from config.settings import LOG_FORMAT, LOG_FILE, LOG_LEVEL
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import List, Optional
+from config.settings import LOG_FORMAT, LOG_FILE, LOG_LEVEL, LOG_JSON, LOG_MAX_BYTES, LOG_BACKUP_COUNT
+
+# Общая для процесса очередь записей и фоновый поток, который пишет их в файл и консоль
+_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_queue_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON (для сборщиков логов)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc_info"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class _QueueHandler(QueueHandler):
+    """
+    Передача записей в очередь без форматирования
+
+    Стандартный QueueHandler форматирует сообщение в потоке вызова; здесь
+    подставляются только аргументы сообщения и текст исключения, а формат
+    (текст или JSON) применяют обработчики в фоновом потоке.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Объект трассировки держит кадры стека: в очередь уходит только текст
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _handlers() -> List[logging.Handler]:
+    """Обработчики фонового потока: файл с ротацией и консоль"""
+    file_handler = RotatingFileHandler(
+        LOG_FILE,
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding='utf-8'
+    )
+    if LOG_JSON:
+        file_handler.setFormatter(JsonFormatter())
+        console_handler: logging.Handler = logging.StreamHandler(sys.stderr)
+        console_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        if sys.stderr.isatty():
+            # Консоль с rich форматированием (rich загружается только для терминала)
+            from rich.logging import RichHandler
+            console_handler = RichHandler()
+            console_handler.setFormatter(logging.Formatter('%(message)s'))
+        else:
+            # Вывод сервиса собирает платформа: обычные строки формата файла
+            console_handler = logging.StreamHandler(sys.stderr)
+            console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return [file_handler, console_handler]
+
+
+def _start() -> QueueHandler:
+    global _queue_handler, _listener
+    if _queue_handler is None:
+        _queue_handler = _QueueHandler(_queue)
+        atexit.register(stop_logging)
+    if _listener is None:
+        _listener = QueueListener(_queue, *_handlers(), respect_handler_level=True)
+        _listener.start()
+    return _queue_handler
+
+
+def stop_logging() -> None:
+    """Запись оставшихся в очереди сообщений и остановка фонового потока"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
 
 def setup_logger(name: str) -> logging.Logger:
     """
     Настройка логгера с выводом в файл и консоль
-    
+
+    Логгер только кладет записи в общую очередь, а файл и консоль пишет
+    фоновый поток, поэтому вызов логирования не ждет диска или терминала.
+    Повторный вызов с тем же именем возвращает уже настроенный логгер.
+
     Args:
         name: Имя логгера
-        
+
     Returns:
         logging.Logger: Настроенный логгер
     """
-    # Создаем логгер
     logger = logging.getLogger(name)
-    logger.setLevel(LOG_LEVEL)
-    
-    # Форматтер для логов
-    formatter = logging.Formatter(LOG_FORMAT)
-    
-    # Обработчик для файла
-    file_handler = logging.FileHandler(LOG_FILE, encoding='utf-8')
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
-    # Обработчик для консоли с rich форматированием
-    console_handler = RichHandler(rich_tracebacks=True)
-    console_handler.setFormatter(logging.Formatter('%(message)s'))
-    logger.addHandler(console_handler)
-    
-    return logger 
\ No newline at end of file
+    handler = _start()
+    if handler not in logger.handlers:
+        logger.setLevel(LOG_LEVEL)
+        logger.addHandler(handler)
+        # Корневой логгер не должен выводить те же записи второй раз
+        logger.propagate = False
+    return logger
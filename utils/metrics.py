@@ -0,0 +1,231 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from config.settings import LOOP_LAG_INTERVAL
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Границы корзин гистограмм по умолчанию, в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric(ABC):
+    """
+    Базовый класс метрики в формате Prometheus
+
+    Значения хранятся в словаре по кортежу меток. Метрики изменяются только
+    из цикла событий, поэтому блокировки не нужны и запись стоит одну
+    операцию со словарем.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Строки значений метрики в текстовом формате Prometheus"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self._labels(key)} {value}" for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    """Текущее значение; может вычисляться при каждом чтении метрик"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Значение без меток, вычисляемое при выдаче метрик"""
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                self._values[()] = float(self._function())
+            except Exception as e:
+                logger.warning(f"Не удалось вычислить метрику {self.name}: {str(e)}")
+        return [f"{self.name}{self._labels(key)} {value}" for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам (например, длительности запросов)"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Для каждого набора меток: счетчики корзин (последняя - +Inf) и сумма
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                bucket = self._labels(key, 'le="' + str(bound) + '"')
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            cumulative += counts[-1]
+            bucket = self._labels(key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {self._sums[key]}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[Metric] = []
+
+NOTION_REQUEST_SECONDS = Histogram(
+    "notion_request_duration_seconds",
+    "Notion API request latency (without rate limiter wait)",
+    ("method", "endpoint", "status")
+)
+NOTION_RATE_LIMITED = Counter(
+    "notion_rate_limited_total",
+    "Notion API responses with status 429"
+)
+NOTION_RETRIES = Counter(
+    "notion_retries_total",
+    "Retried Notion API requests",
+    ("reason",)
+)
+NOTION_CACHE = Counter(
+    "notion_cache_requests_total",
+    "Notion metadata cache lookups",
+    ("cache", "result")
+)
+PAGES = Counter(
+    "transfer_pages_total",
+    "Pages processed by transfers",
+    ("outcome",)
+)
+ACTIVE_JOBS = Gauge("transfer_active_jobs", "Transfers running in this process")
+UPDATE_QUEUE_DEPTH = Gauge("webhook_update_queue_depth", "Telegram updates waiting for processing")
+LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds",
+    "Delay of event loop wakeups relative to schedule",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+
+# Идентификаторы в пути запроса заменяются шаблоном, чтобы число рядов не росло
+_ID_PARENTS = {"databases", "pages", "blocks", "properties", "users"}
+_FIXED_SEGMENTS = {"me"}
+
+
+def endpoint_label(endpoint: str) -> str:
+    """
+    Шаблон эндпоинта для метки (databases/<id>/query -> databases/{id}/query)
+
+    Args:
+        endpoint: Путь запроса относительно базового URL API
+
+    Returns:
+        str: Путь без идентификаторов
+    """
+    parts = endpoint.split("/")
+    for i in range(1, len(parts)):
+        if parts[i - 1] in _ID_PARENTS and parts[i] not in _FIXED_SEGMENTS:
+            parts[i] = "{id}"
+    return "/".join(parts)
+
+
+def render_metrics() -> str:
+    """Все метрики процесса в текстовом формате Prometheus"""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+class LoopLagMonitor:
+    """
+    Замер задержки цикла событий
+
+    Задача засыпает на interval секунд и записывает, насколько позже
+    запланированного она проснулась. Большая задержка означает, что цикл
+    занят синхронной работой и обработчики отвечают медленно.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            LOOP_LAG_SECONDS.observe(max(0.0, time.perf_counter() - started - self.interval))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
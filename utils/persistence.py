@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from telegram.ext import BasePersistence, PersistenceInput
+from config.settings import STATE_DB_PATH, PERSISTENCE_UPDATE_INTERVAL
+from utils.crypto import TokenCipher
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (name, key)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    params TEXT NOT NULL,
+    owner TEXT,
+    heartbeat REAL NOT NULL
+);
+"""
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Хранилище состояния бота в SQLite
+
+    Хранит данные пользователей (context.user_data), состояния диалогов
+    ConversationHandler и записи фоновых переносов. Запись отложенная:
+    Application копит измененные данные и сбрасывает их раз в
+    update_interval секунд и при остановке, поэтому обработчики не ждут
+    записи на диск. Токены шифруются TokenCipher.
+
+    Данные пользователя перечитываются перед обработкой обновления, только
+    если их изменил другой экземпляр бота (по номеру версии записи), поэтому
+    несколько экземпляров с общей базой видят данные друг друга. Состояния
+    диалогов читаются при запуске.
+
+    Другое хранилище подключается так же - подклассом BasePersistence.
+    """
+
+    def __init__(
+        self,
+        path: Path = STATE_DB_PATH,
+        cipher: Optional[TokenCipher] = None,
+        update_interval: float = PERSISTENCE_UPDATE_INTERVAL
+    ):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, callback_data=False),
+            update_interval=update_interval
+        )
+        self.cipher = cipher or TokenCipher()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        # Версия записи данных пользователя, известная этому экземпляру
+        self._versions: Dict[int, int] = {}
+        # Хэш последних записанных (незашифрованных) данных, чтобы не перезаписывать
+        # неизмененные: шифротекст Fernet при каждом шифровании разный
+        self._written: Dict[int, bytes] = {}
+
+    def _execute(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def _run(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        """Выполнение запроса в отдельном потоке, чтобы не блокировать цикл событий"""
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    # Данные пользователей
+
+    async def get_user_data(self) -> Dict[int, Dict[str, Any]]:
+        rows = await self._run("SELECT user_id, data, version FROM user_data")
+        result = {}
+        for user_id, data, version in rows:
+            result[user_id] = self.cipher.open(json.loads(data))
+            self._versions[user_id] = version
+            self._written[user_id] = _digest(result[user_id])
+        return result
+
+    async def update_user_data(self, user_id: int, data: Dict[str, Any]) -> None:
+        digest = _digest(data)
+        if self._written.get(user_id) == digest:
+            return
+        serialized = json.dumps(self.cipher.seal(data), ensure_ascii=False)
+        rows = await self._run(
+            "INSERT INTO user_data (user_id, data) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, version = version + 1 "
+            "RETURNING version",
+            (user_id, serialized)
+        )
+        self._versions[user_id] = rows[0][0]
+        self._written[user_id] = digest
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[str, Any]) -> None:
+        rows = await self._run("SELECT data, version FROM user_data WHERE user_id = ?", (user_id,))
+        if not rows or rows[0][1] == self._versions.get(user_id):
+            # Изменений от других экземпляров нет, локальные (еще не записанные) сохраняются
+            return
+        data, version = rows[0]
+        user_data.clear()
+        user_data.update(self.cipher.open(json.loads(data)))
+        self._versions[user_id] = version
+        self._written[user_id] = _digest(user_data)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        await self._run("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+        self._versions.pop(user_id, None)
+        self._written.pop(user_id, None)
+
+    # Состояния диалогов
+
+    async def get_conversations(self, name: str) -> Dict[Tuple[int, ...], object]:
+        rows = await self._run("SELECT key, state FROM conversations WHERE name = ?", (name,))
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    async def update_conversation(
+        self,
+        name: str,
+        key: Tuple[int, ...],
+        new_state: Optional[object]
+    ) -> None:
+        if new_state is None:
+            await self._run(
+                "DELETE FROM conversations WHERE name = ? AND key = ?",
+                (name, json.dumps(list(key)))
+            )
+            return
+        await self._run(
+            "INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)",
+            (name, json.dumps(list(key)), json.dumps(new_state))
+        )
+
+    # Данные чатов, бота и callback_data не используются
+
+    async def get_chat_data(self) -> Dict[int, Any]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: Any) -> None:
+        pass
+
+    async def update_bot_data(self, data: Any) -> None:
+        pass
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Any) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Any) -> None:
+        pass
+
+    async def flush(self) -> None:
+        await asyncio.to_thread(self._execute, "PRAGMA wal_checkpoint(PASSIVE)")
+
+    # Записи фоновых переносов (см. utils.jobs.JobManager)
+
+    async def save_job(self, job_id: str, user_id: int, chat_id: int, params: Dict[str, Any], owner: str) -> None:
+        """Сохранение параметров выполняющегося переноса"""
+        await self._run(
+            "INSERT OR REPLACE INTO jobs (id, user_id, chat_id, params, owner, heartbeat) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, user_id, chat_id, json.dumps(self.cipher.seal(params)), owner, time.time())
+        )
+
+    async def delete_job(self, job_id: str) -> None:
+        """Удаление записи завершенного переноса"""
+        await self._run("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    async def touch_jobs(self, owner: str) -> None:
+        """Отметка о том, что переносы экземпляра owner еще выполняются"""
+        await self._run("UPDATE jobs SET heartbeat = ? WHERE owner = ?", (time.time(), owner))
+
+    async def release_jobs(self, owner: str, job_ids: Optional[List[str]] = None) -> None:
+        """Освобождение переносов экземпляра, чтобы их сразу подхватил следующий запуск"""
+        if job_ids is None:
+            await self._run("UPDATE jobs SET owner = NULL, heartbeat = 0 WHERE owner = ?", (owner,))
+            return
+        for job_id in job_ids:
+            await self._run("UPDATE jobs SET owner = NULL, heartbeat = 0 WHERE id = ? AND owner = ?", (job_id, owner))
+
+    async def claim_jobs(self, owner: str, stale_after: float) -> List[Dict[str, Any]]:
+        """
+        Захват переносов, экземпляр которых перестал отмечаться (перезапуск или сбой)
+
+        Args:
+            owner: Идентификатор текущего экземпляра
+            stale_after: Сколько секунд без отметки перенос считается брошенным
+
+        Returns:
+            List[Dict[str, Any]]: Записи переносов (id, user_id, chat_id, params)
+        """
+        rows = await asyncio.to_thread(self._claim_rows, owner, stale_after)
+        return [
+            {"id": job_id, "user_id": user_id, "chat_id": chat_id,
+             "params": self.cipher.open(json.loads(params))}
+            for job_id, user_id, chat_id, params in rows
+        ]
+
+    def _claim_rows(self, owner: str, stale_after: float) -> List[Tuple]:
+        """Выборка и захват брошенных переносов одной транзакцией"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, user_id, chat_id, params FROM jobs WHERE heartbeat < ?",
+                    (now - stale_after,)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE jobs SET owner = ?, heartbeat = ? WHERE id = ?",
+                    [(owner, now, row[0]) for row in rows]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return rows
+
+
+def _digest(data: Dict[str, Any]) -> bytes:
+    """Хэш данных пользователя для сравнения с последними записанными"""
+    serialized = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).digest()
@@ -0,0 +1,137 @@
+import asyncio
+import time
+from typing import Any, Optional
+from telegram.error import BadRequest, RetryAfter
+from config.settings import PROGRESS_UPDATE_INTERVAL, PROGRESS_EMA_ALPHA
+from utils.logger import setup_logger
+from utils.tracing import span
+
+logger = setup_logger(__name__)
+
+
+class ProgressReporter:
+    """
+    Прогресс переноса в одном сообщении чата
+
+    update() только запоминает состояние и сразу возвращает управление;
+    фоновая задача отправляет сообщение и затем редактирует его не чаще
+    раза в interval секунд, поэтому перенос не ждет Telegram, а ограничения
+    на частоту сообщений не срабатывают. Скорость сглаживается
+    экспоненциальным скользящим средним, по ней считается оставшееся время
+    (если известно общее число страниц).
+    """
+
+    def __init__(
+        self,
+        message: Optional[Any],
+        interval: float = PROGRESS_UPDATE_INTERVAL,
+        alpha: float = PROGRESS_EMA_ALPHA
+    ):
+        self.message = message
+        self.interval = interval
+        self.alpha = alpha
+        self.rate: Optional[float] = None  # страниц в секунду
+        self._status: Optional[Any] = None  # отправленное сообщение со статусом
+        self._text: Optional[str] = None
+        self._sent_text: Optional[str] = None
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._sample_done: Optional[int] = None
+        self._sample_time = 0.0
+
+    def update(self, done: int, total: Optional[int], details: str = "") -> None:
+        """
+        Новое состояние прогресса (не блокирует)
+
+        Args:
+            done: Обработано страниц
+            total: Всего страниц (None - неизвестно, тогда процент и
+                оставшееся время не показываются)
+            details: Дополнительные строки сообщения
+        """
+        self._measure(done)
+        if total:
+            lines = [f"✅ Прогресс: {done / total * 100:.1f}% ({done}/{total})"]
+        else:
+            lines = [f"✅ Обработано страниц: {done}"]
+        if self.rate and total:
+            eta = max(total - done, 0) / self.rate
+            lines.append(f"⚡ {self.rate:.1f} стр/с, осталось ~{_format_duration(eta)}")
+        elif self.rate:
+            lines.append(f"⚡ {self.rate:.1f} стр/с")
+        if details:
+            lines.append(details)
+        self._text = "\n".join(lines)
+        self._changed.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._publish())
+
+    def _measure(self, done: int) -> None:
+        """Обновление сглаженной скорости (не чаще раза в секунду)"""
+        now = time.monotonic()
+        if self._sample_done is None:
+            self._sample_done, self._sample_time = done, now
+            return
+        elapsed = now - self._sample_time
+        if elapsed < 1.0:
+            return
+        current = (done - self._sample_done) / elapsed
+        self.rate = current if self.rate is None else self.alpha * current + (1 - self.alpha) * self.rate
+        self._sample_done, self._sample_time = done, now
+
+    async def _publish(self) -> None:
+        """Фоновая отправка последнего состояния с ограничением частоты"""
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            try:
+                with span("telegram"):
+                    await self._send()
+            except RetryAfter as e:
+                logger.warning(f"Telegram просит подождать {e.retry_after} с перед обновлением прогресса")
+                self._changed.set()
+                await asyncio.sleep(float(e.retry_after))
+                continue
+            except Exception as e:
+                logger.warning(f"Не удалось обновить прогресс: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def _send(self) -> None:
+        text = self._text
+        if text is None or text == self._sent_text:
+            return
+        if self.message is None:
+            logger.info(text)
+        elif self._status is None:
+            self._status = await self.message.reply_text(text)
+        else:
+            try:
+                await self._status.edit_text(text)
+            except BadRequest as e:
+                if "not modified" not in str(e).lower():
+                    raise
+        self._sent_text = text
+
+    async def close(self) -> None:
+        """Остановка фоновой отправки с записью последнего состояния"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        try:
+            await self._send()
+        except Exception as e:
+            logger.warning(f"Не удалось обновить прогресс: {str(e)}")
+
+
+def _format_duration(seconds: float) -> str:
+    """Длительность в виде 1ч 05м, 4м 10с или 12с"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}ч {minutes:02d}м"
+    if minutes:
+        return f"{minutes}м {seconds:02d}с"
+    return f"{seconds}с"
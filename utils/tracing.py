@@ -0,0 +1,195 @@
+import os
+import time
+from contextvars import ContextVar, Token
+from typing import Any, Dict, List, Optional
+import aiohttp
+from config.settings import OTLP_ENDPOINT, TRACE_MAX_SPANS, TRACE_SERVICE_NAME
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Трассировщик переноса, выполняющегося в текущей задаче (наследуется дочерними задачами)
+_tracer: ContextVar[Optional["Tracer"]] = ContextVar("tracer", default=None)
+# ID текущего участка для связи вложенных участков при экспорте
+_parent: ContextVar[Optional[str]] = ContextVar("span_parent", default=None)
+
+
+class Tracer:
+    """
+    Замер времени этапов одного переноса
+
+    Участки (span) с одинаковым именем суммируются: число, общее и
+    максимальное время. Сами участки сохраняются, только если задан адрес
+    экспорта OTLP (не больше max_spans), поэтому без экспорта память не
+    растет с числом страниц.
+
+    Трассировщик активируется в задаче переноса и через contextvars
+    доступен всем дочерним задачам и общему клиенту API.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        export_endpoint: Optional[str] = OTLP_ENDPOINT,
+        max_spans: int = TRACE_MAX_SPANS
+    ):
+        self.name = name
+        self.export_endpoint = export_endpoint
+        self.max_spans = max_spans
+        self.trace_id = os.urandom(16).hex()
+        self.started = time.perf_counter()
+        self.started_ns = time.time_ns()
+        # Имя участка -> [число, суммарное время, максимальное время]
+        self.stages: Dict[str, List[float]] = {}
+        self.spans: List[Dict[str, Any]] = []
+        self.dropped = 0
+
+    @property
+    def exporting(self) -> bool:
+        return bool(self.export_endpoint)
+
+    def activate(self) -> Token:
+        """Назначение трассировщиком текущей задачи (и задач, созданных после)"""
+        return _tracer.set(self)
+
+    @staticmethod
+    def deactivate(token: Token) -> None:
+        _tracer.reset(token)
+
+    def record(self, name: str, duration: float) -> None:
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = [1, duration, duration]
+        else:
+            stage[0] += 1
+            stage[1] += duration
+            if duration > stage[2]:
+                stage[2] = duration
+
+    def report(self) -> str:
+        """
+        Краткий отчет по этапам
+
+        Этапы выполняются параллельно в нескольких задачах, поэтому сумма
+        времени этапов может превышать общее время переноса.
+        """
+        elapsed = time.perf_counter() - self.started
+        lines = [f"⏱ Время этапов (всего {elapsed:.1f} с, время суммируется по параллельным задачам):"]
+        for name, (count, total, longest) in sorted(self.stages.items(), key=lambda item: -item[1][1]):
+            lines.append(
+                f"{name}: {total:.1f} с, {int(count)} × {total / count * 1000:.0f} мс "
+                f"(макс. {longest * 1000:.0f} мс)"
+            )
+        return "\n".join(lines)
+
+    async def export(self) -> None:
+        """Отправка сохраненных участков в коллектор OpenTelemetry (OTLP/HTTP JSON)"""
+        if not self.exporting or not self.spans:
+            return
+        if self.dropped:
+            logger.warning(f"Трассировка {self.name}: не экспортировано {self.dropped} участков сверх лимита")
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": _attributes({"service.name": TRACE_SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": self.spans}]
+        }]}
+        url = self.export_endpoint.rstrip("/") + "/v1/traces"
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+            async with session.post(url, json=payload) as response:
+                response.raise_for_status()
+        logger.info(f"Трассировка {self.name} экспортирована: {len(self.spans)} участков")
+
+
+class _Span:
+    """Замер одного участка; при экспорте сохраняется вместе с атрибутами"""
+
+    __slots__ = ("tracer", "name", "attributes", "started", "started_ns", "span_id", "parent_id", "token")
+
+    def __init__(self, tracer: Tracer, name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self) -> "_Span":
+        if self.tracer.exporting:
+            self.span_id = os.urandom(8).hex()
+            self.parent_id = _parent.get()
+            self.token = _parent.set(self.span_id)
+            self.started_ns = time.time_ns()
+        self.started = time.perf_counter()
+        return self
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        duration = time.perf_counter() - self.started
+        tracer = self.tracer
+        tracer.record(self.name, duration)
+        if not tracer.exporting:
+            return
+        _parent.reset(self.token)
+        if len(tracer.spans) >= tracer.max_spans:
+            tracer.dropped += 1
+            return
+        span = {
+            "traceId": tracer.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.started_ns),
+            "endTimeUnixNano": str(self.started_ns + int(duration * 1e9)),
+            "attributes": _attributes(self.attributes),
+            "status": {"code": 2, "message": str(exc)} if exc_type else {}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        tracer.spans.append(span)
+
+
+class _NoopSpan:
+    """Участок вне переноса (трассировщик не активен) ничего не замеряет"""
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **attributes: Any):
+    """
+    Замер участка кода: with span("write"): ...
+
+    Args:
+        name: Имя этапа (по нему суммируется время в отчете)
+        **attributes: Атрибуты участка для экспорта
+
+    Returns:
+        Контекстный менеджер участка
+    """
+    tracer = _tracer.get()
+    if tracer is None:
+        return _NOOP
+    return _Span(tracer, name, attributes)
+
+
+def _attributes(values: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Атрибуты в формате OTLP JSON"""
+    result = []
+    for key, value in values.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        result.append({"key": key, "value": typed})
+    return result
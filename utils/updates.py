@@ -0,0 +1,142 @@
+import asyncio
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Optional
+from config.settings import UPDATE_QUEUE_SIZE, UPDATE_WORKERS, UPDATE_DEDUPE_SIZE
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+if TYPE_CHECKING:
+    # Модули Telegram загружаются вместе с ботом, а не при импорте очереди
+    from telegram import Update
+    from telegram.ext import Application
+
+
+class UpdateDispatcher:
+    """
+    Очередь обновлений Telegram между вебхуком и обработчиками
+
+    Вебхук только кладет обновление в очередь и сразу отвечает Telegram,
+    поэтому медленный обработчик не вызывает повторную доставку. Повторно
+    доставленные обновления отбрасываются по update_id.
+
+    Очередь разбита на шарды по чату: обновления одного чата обрабатываются
+    одним обработчиком по порядку, разные чаты - параллельно.
+    """
+
+    def __init__(
+        self,
+        app: "Application",
+        workers: int = UPDATE_WORKERS,
+        queue_size: int = UPDATE_QUEUE_SIZE,
+        dedupe_size: int = UPDATE_DEDUPE_SIZE
+    ):
+        self.app = app
+        self.dedupe_size = dedupe_size
+        workers = max(1, workers)
+        self._queues: List[asyncio.Queue] = [
+            asyncio.Queue(maxsize=max(1, queue_size // workers)) for _ in range(workers)
+        ]
+        self._seen: "OrderedDict[int, None]" = OrderedDict()
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        """Число обновлений, ожидающих обработки"""
+        return sum(queue.qsize() for queue in self._queues)
+
+    def submit(self, update: "Update") -> bool:
+        """
+        Постановка обновления в очередь
+
+        Args:
+            update: Обновление Telegram
+
+        Returns:
+            bool: False, если очередь шарда заполнена (обновление нужно доставить повторно)
+        """
+        if self._is_duplicate(update):
+            return True
+
+        queue = self._queues[self._shard(update)]
+        try:
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            logger.warning(f"Очередь обновлений заполнена ({self.depth}), обновление {update.update_id} отклонено")
+            return False
+
+        self._remember(update)
+        return True
+
+    async def put(self, update: "Update") -> None:
+        """
+        Постановка обновления в очередь с ожиданием места в шарде
+
+        Для обновлений, получение которых уже подтверждено Telegram
+        (например, принятых до запуска бота): повторно они не придут.
+
+        Args:
+            update: Обновление Telegram
+        """
+        if self._is_duplicate(update):
+            return
+        await self._queues[self._shard(update)].put(update)
+        self._remember(update)
+
+    def _is_duplicate(self, update: "Update") -> bool:
+        """Повторная доставка уже принятого обновления"""
+        if update.update_id not in self._seen:
+            return False
+        self._seen.move_to_end(update.update_id)
+        logger.debug(f"Повторная доставка обновления {update.update_id} пропущена")
+        return True
+
+    def _remember(self, update: "Update") -> None:
+        self._seen[update.update_id] = None
+        if len(self._seen) > self.dedupe_size:
+            self._seen.popitem(last=False)
+
+    def _shard(self, update: "Update") -> int:
+        """Номер шарда: все обновления одного чата попадают в один шард"""
+        if update.effective_chat:
+            key = update.effective_chat.id
+        elif update.effective_user:
+            key = update.effective_user.id
+        else:
+            key = update.update_id
+        return hash(key) % len(self._queues)
+
+    async def start(self) -> None:
+        """Запуск обработчиков очереди"""
+        self._workers = [asyncio.create_task(self._work(queue)) for queue in self._queues]
+
+    async def stop(self, timeout: Optional[float] = 10) -> None:
+        """
+        Остановка обработчиков
+
+        Args:
+            timeout: Сколько ждать обработки уже принятых обновлений (None - без ожидания)
+        """
+        if timeout:
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(queue.join() for queue in self._queues)),
+                    timeout
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"Остановка с необработанными обновлениями: {self.depth}")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _work(self, queue: asyncio.Queue) -> None:
+        """Обработчик шарда: обновления обрабатываются строго по очереди"""
+        while True:
+            update = await queue.get()
+            try:
+                await self.app.process_update(update)
+            except Exception as e:
+                logger.error(f"Ошибка обработки обновления {update.update_id}: {str(e)}", exc_info=True)
+            finally:
+                queue.task_done()